@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark: recorrido completo con difflib vs índice de trigramas para el matching
+contra las apps detectables de Discord.
+
+Uso:
+    python bench/bench_discord_match.py                  # usa la caché de config/
+    python bench/bench_discord_match.py --synthetic 50000
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+
+import geforce_presence as gp  # noqa: E402
+
+
+def synthetic_apps(n: int, seed: int = 1) -> list:
+    """Apps sintéticas a partir de los nombres del catálogo (con alias y ruido)."""
+    rnd = random.Random(seed)
+    names = [v.get("name") or k for k, v in
+             json.loads((ROOT / "config" / "games_config_merged.json").read_text(encoding="utf-8")).items()]
+    names = [n for n in names if n]
+    apps = []
+    for i in range(n):
+        base = names[i % len(names)]
+        name = base if i < len(names) else f"{base} {rnd.choice(['II', 'Remastered', 'Demo', 'Online', str(i)])}"
+        aliases = [name.replace(":", ""), name.upper()] if rnd.random() < 0.3 else []
+        apps.append(gp.DiscordApp(str(100000 + i), name, aliases, f"{name.lower().replace(' ', '')}.exe"))
+    return apps
+
+
+def load_apps(args) -> list:
+    if args.synthetic:
+        return synthetic_apps(args.synthetic)
+    data = gp.load_discord_apps(Path(args.apps)) or {}
+    apps = data.get("apps", [])
+    if not apps:
+        sys.exit(f"No hay apps en {args.apps}; usa --synthetic N")
+    return apps
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--apps", default=str(gp.DISCORD_COMPACT_CACHE_PATH))
+    parser.add_argument("--synthetic", type=int, default=0)
+    parser.add_argument("--queries", type=int, default=40)
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--tolerance", type=float, default=0.05,
+                        help="diferencia de score admitida en el top-k")
+    args = parser.parse_args()
+
+    apps = load_apps(args)
+    rnd = random.Random(7)
+    queries = [rnd.choice(apps).name for _ in range(args.queries)]
+    # variantes con typos/recortes, como los títulos de ventana reales
+    queries += [q[:-2] if len(q) > 6 else q for q in queries[: args.queries // 2]]
+
+    t0 = time.perf_counter()
+    index = gp.DiscordMatchIndex.build(apps)
+    build_s = time.perf_counter() - t0
+
+    full_t, idx_t, mismatches, top1_misses = [], [], 0, 0
+    for q in queries:
+        t0 = time.perf_counter()
+        ref = gp.find_discord_matches_full(apps, q, args.k)
+        full_t.append(time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        got = index.search(apps, q, args.k)
+        idx_t.append(time.perf_counter() - t0)
+        if ref and (not got or got[0]["id"] != ref[0]["id"]):
+            top1_misses += 1
+        ref_scores = [c["score"] for c in ref]
+        got_scores = [c["score"] for c in got]
+        if len(ref_scores) != len(got_scores) or any(
+                abs(a - b) > args.tolerance for a, b in zip(ref_scores, got_scores)):
+            mismatches += 1
+
+    result = {
+        "apps": len(apps),
+        "queries": len(queries),
+        "index_build_s": round(build_s, 4),
+        "full_scan_ms_median": round(statistics.median(full_t) * 1000, 2),
+        "index_ms_median": round(statistics.median(idx_t) * 1000, 2),
+        "speedup": round(statistics.median(full_t) / max(statistics.median(idx_t), 1e-9), 1),
+        "top1_misses": top1_misses,
+        "topk_out_of_tolerance": mismatches,
+    }
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
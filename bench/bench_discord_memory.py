@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Benchmark de memoria y tamaño en disco de la caché de apps detectables de Discord:
+payload completo (json.loads) frente a registros DiscordApp proyectados y guardados
+en msgpack/zstd.
+
+Uso:
+    python bench/bench_discord_memory.py --payload detectable.json   # respuesta real guardada
+    python bench/bench_discord_memory.py --synthetic 50000
+"""
+import argparse
+import gc
+import json
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+
+import geforce_presence as gp  # noqa: E402
+
+
+def synthetic_payload(n: int, seed: int = 1) -> str:
+    """JSON con la forma de /applications/detectable (descripciones, hashes, flags...)."""
+    rnd = random.Random(seed)
+    apps = []
+    for i in range(n):
+        name = f"Game {i} {rnd.choice(['Online', 'Remastered', 'Legends', 'Simulator'])}"
+        apps.append({
+            "id": str(10 ** 17 + i),
+            "name": name,
+            "icon": f"{rnd.getrandbits(128):032x}",
+            "description": "Lorem ipsum dolor sit amet " * rnd.randint(0, 6),
+            "summary": "",
+            "type": None,
+            "hook": True,
+            "overlay": rnd.random() < 0.5,
+            "overlay_compatibility_hook": False,
+            "flags": rnd.getrandbits(16),
+            "aliases": [name.upper()] if rnd.random() < 0.3 else [],
+            "executables": [
+                {"is_launcher": False, "name": f"game{i}/bin/game{i}.exe", "os": "win32"},
+                {"is_launcher": False, "name": f"game{i}", "os": "linux"},
+            ],
+            "third_party_skus": [{"distributor": "steam", "id": str(rnd.randint(1, 2_000_000)), "sku": None}],
+            "hashes": [f"{rnd.getrandbits(64):016x}" for _ in range(rnd.randint(0, 3))],
+        })
+    return json.dumps(apps)
+
+
+def measure(fn):
+    gc.collect()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    obj = fn()
+    elapsed = time.perf_counter() - t0
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, current, peak, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--payload", help="respuesta JSON de /applications/detectable guardada")
+    parser.add_argument("--synthetic", type=int, default=30000)
+    args = parser.parse_args()
+
+    text = Path(args.payload).read_text(encoding="utf-8") if args.payload else synthetic_payload(args.synthetic)
+
+    full, full_mem, full_peak, full_s = measure(lambda: json.loads(text))
+
+    def projected():
+        return [gp.DiscordApp.from_payload(a) for a in gp.iter_json_array(
+            text[i:i + 65536] for i in range(0, len(text), 65536))]
+    apps, proj_mem, proj_peak, proj_s = measure(projected)
+    del full
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy = Path(tmp) / "discord_apps_cache.json"
+        legacy.write_text(json.dumps({"_ts": 0, "apps": json.loads(text)}), encoding="utf-8")
+        compact = Path(tmp) / "discord_apps_cache.msgpack"
+        gp.save_discord_apps(compact, apps, {"_ts": 0})
+        compact_file = compact if compact.exists() else compact.with_suffix(".json")
+        _, load_mem, _, load_s = measure(lambda: gp.load_discord_apps(compact))
+        result = {
+            "apps": len(apps),
+            "full_resident_bytes": full_mem,
+            "full_peak_bytes": full_peak,
+            "full_parse_s": round(full_s, 3),
+            "projected_resident_bytes": proj_mem,
+            "projected_peak_bytes": proj_peak,
+            "projected_parse_s": round(proj_s, 3),
+            "legacy_cache_file_bytes": legacy.stat().st_size,
+            "compact_cache_file_bytes": compact_file.stat().st_size,
+            "compact_load_resident_bytes": load_mem,
+            "compact_load_s": round(load_s, 3),
+            "zstd": gp.ZSTD_AVAILABLE,
+        }
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
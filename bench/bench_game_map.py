@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga concurrente de GameStore (games_map con versiones inmutables):
+varios hilos escritores (como el tick, los matches de Discord del pool y el
+tray) y varios lectores en el camino caliente (lookup + entrada) a la vez,
+sobre un catálogo sintético en un sandbox con journal real.
+
+Escritores, en bucle:
+- contador propio sobre una entrada compartida (update con delta): al final
+  cada contador debe tener su último valor (ninguna actualización perdida)
+- alta de juegos nuevos
+- match de Discord con keep_existing sobre entradas del catálogo
+Cada escritura se registra con ConfigManager.persist_game.
+
+Lectores: toman la versión vigente, resuelven un título y leen su entrada de
+esa misma versión; comprueban que nunca falte la entrada, que las versiones
+no retrocedan y que los contadores no retrocedan.
+
+Al final se recarga el catálogo desde disco (JSON + journal) y se compara con
+la última versión. --legacy repite los escritores con el patrón anterior
+(dict compartido, leer-copiar-escribir sin lock) y cuenta las pérdidas.
+Sale con código 1 si algo falla.
+
+Uso:
+    python bench/bench_game_map.py [--seconds 3] [--writers 4] [--readers 4] [--catalog 20000]
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR))
+
+import fakes  # noqa: E402
+
+HOT_KEY = "Shared Hot Entry"
+
+
+def writer(gp, cm, i: int, keys: list, stop: threading.Event, out: dict):
+    rnd = random.Random(i)
+    store = cm.store
+    n = 0
+    while not stop.is_set():
+        n += 1
+        op = rnd.random()
+        if op < 0.5:
+            key = HOT_KEY
+            store.update(key, {f"w{i}": n})
+        elif op < 0.7:
+            key = f"New Game {i}-{n}"
+            store.update(key, {"name": key, "steam_appid": None, "image": "steam"})
+        else:
+            key = rnd.choice(keys)
+            store.update(key, {"client_id": f"{i}{n}", "executable_path": f"w{i}/{n}.exe"}, keep_existing=True)
+        cm.persist_game(key)
+        if key == HOT_KEY:
+            out[i] = n
+    out.setdefault(i, 0)
+
+
+def reader(gp, store, titles: list, stop: threading.Event, out: list, rid: int):
+    rnd = random.Random(1000 + rid)
+    reads = errors = 0
+    last_version = -1
+    last_counters = {}
+    samples = []
+    while not stop.is_set():
+        t0 = time.perf_counter() if reads % 16 == 0 else None
+        games = store.snapshot
+        title = rnd.choice(titles)
+        key = games.lookup(title)
+        try:
+            entry = games[key] if key is not None else None
+            if key is None or not isinstance(entry, dict):
+                errors += 1
+            hot = games.get(HOT_KEY) or {}
+        except Exception:
+            errors += 1
+            hot = {}
+        if t0 is not None:
+            samples.append(time.perf_counter() - t0)
+        if games.version < last_version:
+            errors += 1
+        last_version = games.version
+        for field, value in hot.items():
+            if field.startswith("w") and value < last_counters.get(field, 0):
+                errors += 1
+            last_counters[field] = value
+        reads += 1
+    out.append({"reads": reads, "errors": errors, "samples": samples})
+
+
+def legacy_lost_updates(writers: int, seconds: float) -> dict:
+    """Patrón anterior: dict compartido, leer-copiar-escribir sin lock."""
+    games = {HOT_KEY: {"name": HOT_KEY}}
+    stop = threading.Event()
+    last = {}
+
+    def work(i):
+        n = 0
+        while not stop.is_set():
+            n += 1
+            entry = dict(games.get(HOT_KEY) or {})
+            entry[f"w{i}"] = n
+            games[HOT_KEY] = entry
+            last[i] = n
+
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(writers)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    final = games[HOT_KEY]
+    return {
+        "writes": sum(last.values()),
+        "lost_counters": sum(1 for i, n in last.items() if final.get(f"w{i}") != n),
+        "writers": writers,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--seconds", type=float, default=3.0)
+    ap.add_argument("--writers", type=int, default=4)
+    ap.add_argument("--readers", type=int, default=4)
+    ap.add_argument("--catalog", type=int, default=20000, help="entradas del catálogo sintético")
+    ap.add_argument("--switch-interval", type=float, default=1e-5,
+                    help="sys.setswitchinterval: más cambios de hilo, más carreras")
+    ap.add_argument("--legacy", action="store_true", help="medir también el patrón sin snapshots")
+    args = ap.parse_args()
+
+    catalog = fakes.synthetic_catalog(args.catalog)
+    catalog[HOT_KEY] = {"name": HOT_KEY}
+    src = fakes.write_catalog(catalog, Path(fakes.tempfile.mkdtemp()) / "catalog.json")
+    sandbox = fakes.make_sandbox(src)
+    fakes.install_platform_stubs()
+    gp = fakes.import_module(sandbox)
+
+    cm = gp.ConfigManager(gp.CONFIG_PATH_FILE)
+    cm.JOURNAL_COMPACT_THRESHOLD = 10 ** 9  # el journal entero se reproduce al recargar
+    keys = [k for k in catalog if k != HOT_KEY]
+    titles = [catalog[k]["name"] for k in keys[:2000]] + [catalog[k]["shortName"] for k in keys[:500]]
+
+    sys.setswitchinterval(args.switch_interval)
+    stop = threading.Event()
+    last_written, reads = {}, []
+    threads = [threading.Thread(target=writer, args=(gp, cm, i, keys, stop, last_written))
+               for i in range(args.writers)]
+    threads += [threading.Thread(target=reader, args=(gp, cm.store, titles, stop, reads, r))
+                for r in range(args.readers)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    sys.setswitchinterval(0.005)
+
+    final = cm.store.snapshot
+    hot = final[HOT_KEY]
+    lost = [i for i, n in last_written.items() if n and hot.get(f"w{i}") != n]
+    reloaded = gp.ConfigManager(gp.CONFIG_PATH_FILE).games_config
+    touched = [k for k in final._delta]
+    mismatched = [k for k in touched if reloaded.get(k) != final.get(k)]
+    samples = sorted(s for r in reads for s in r["samples"])
+    read_errors = sum(r["errors"] for r in reads)
+
+    failures = []
+    if lost:
+        failures.append(f"actualizaciones perdidas en la entrada compartida: escritores {lost}")
+    if read_errors:
+        failures.append(f"{read_errors} lecturas inconsistentes")
+    if mismatched:
+        failures.append(f"{len(mismatched)} entradas distintas tras recargar (p. ej. {mismatched[:3]})")
+
+    out = {
+        "seconds": round(elapsed, 2),
+        "catalog": len(catalog),
+        "writers": args.writers,
+        "readers": args.readers,
+        "versions_published": final.version,
+        "changed_entries": final.changed,
+        "reads": sum(r["reads"] for r in reads),
+        "reads_per_s": round(sum(r["reads"] for r in reads) / elapsed),
+        "read_us": {
+            "p50": round(statistics.median(samples) * 1e6, 2) if samples else None,
+            "p99": round(samples[int(len(samples) * 0.99)] * 1e6, 2) if samples else None,
+        },
+        "journal_entries": cm._journal_entries,
+        "failures": failures,
+    }
+    if args.legacy:
+        sys.setswitchinterval(args.switch_interval)
+        out["legacy"] = legacy_lost_updates(args.writers, args.seconds)
+        sys.setswitchinterval(0.005)
+    print(json.dumps(out, indent=2))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Compara, contra un servidor HTTP local que sirve la página de rich presence de
+bench/fixtures:
+- fresh: una requests.Session nueva por petición (como validar_cookie antes)
+- shared: HttpClient compartido (pool keep-alive por host)
+
+El servidor espera --handshake-ms en cada conexión nueva para imitar el coste
+de TCP + TLS contra steamcommunity.com. También informa de los bytes servidos
+con cada Content-Encoding que negocia el cliente.
+
+Uso:
+    python bench/bench_http_client.py [--requests 50] [--handshake-ms 40]
+"""
+import argparse
+import gzip
+import json
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import requests  # noqa: E402
+
+import geforce_presence as gp  # noqa: E402
+from fakes import FIXTURES  # noqa: E402
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+def encoders():
+    out = {"gzip": gzip.compress}
+    if brotli is not None:
+        out["br"] = brotli.compress
+    if zstandard is not None:
+        out["zstd"] = zstandard.ZstdCompressor().compress
+    return out
+
+
+def make_server(page: bytes, handshake: float):
+    stats = {"connections": 0, "bytes": 0, "encodings": {}}
+    bodies = {name: encode(page) for name, encode in encoders().items()}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # cabeceras y cuerpo en un solo envío: sin Nagle ni ACK retrasado entre medias
+        wbufsize = 1 << 16
+        disable_nagle_algorithm = True
+
+        def setup(self):
+            super().setup()
+            stats["connections"] += 1
+            time.sleep(handshake)
+
+        def do_GET(self):
+            accepted = [e.strip() for e in (self.headers.get("Accept-Encoding") or "").split(",")]
+            encoding = next((e for e in ("zstd", "br", "gzip") if e in accepted and e in bodies), None)
+            body = bodies[encoding] if encoding else page
+            stats["bytes"] += len(body)
+            stats["encodings"][encoding or "identity"] = stats["encodings"].get(encoding or "identity", 0) + 1
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            if encoding:
+                self.send_header("Content-Encoding", encoding)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, fmt, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, stats
+
+
+def run(mode: str, url: str, n: int, page: bytes):
+    client = gp.HttpClient()
+    times = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        if mode == "fresh":
+            with requests.Session() as s:
+                resp = s.get(url, timeout=10)
+        else:
+            resp = client.get(url, timeout=10)
+        assert resp.content == page
+        times.append(time.perf_counter() - t0)
+    times.sort()
+    return {
+        "p50_ms": round(statistics.median(times) * 1000, 3),
+        "max_ms": round(times[-1] * 1000, 3),
+        "total_ms": round(sum(times) * 1000, 1),
+        "client_stats": client.stats() if mode == "shared" else None,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=50)
+    ap.add_argument("--handshake-ms", type=float, default=40.0)
+    args = ap.parse_args()
+
+    page = sorted(FIXTURES.glob("rp_*.html"))[0].read_bytes()
+    results = {"page_bytes": len(page)}
+    for mode in ("fresh", "shared"):
+        server, stats = make_server(page, args.handshake_ms / 1000)
+        url = f"http://127.0.0.1:{server.server_address[1]}/dev/testrichpresence"
+        results[mode] = run(mode, url, args.requests, page)
+        results[mode]["server"] = dict(stats)
+        server.shutdown()
+        server.server_close()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
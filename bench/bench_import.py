@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Presupuesto de tiempo de import de geforce_presence.
+
+Importa el módulo N veces, cada una en un intérprete nuevo y sin
+install_platform_stubs(): fuera de Windows el import tiene que funcionar solo
+con las dependencias del núcleo (psutil, pypresence, python-dotenv). Comprueba:
+- la mediana del import no supera --budget-ms
+- ningún módulo pesado o de plataforma (tkinter, selenium, browser_cookie3,
+  pystray, PIL, requests, winreg, win32*) queda cargado tras el import
+- msedgedriver no se copia a temp al importar, y al pedir el Service dos
+  veces (procesos distintos) solo se copia la primera
+
+Sale con código 1 si algo falla; imprime el resultado en JSON.
+
+Uso:
+    python bench/bench_import.py [--runs 7] [--budget-ms 400]
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(BENCH_DIR))
+
+import fakes  # noqa: E402
+
+HEAVY_MODULES = ("tkinter", "selenium", "browser_cookie3", "pystray", "PIL", "requests",
+                 "winreg", "win32gui", "win32process", "bs4")
+
+# se ejecuta en el intérprete hijo, con el sandbox como cwd
+CHILD = r"""
+import importlib.util, json, sys, time
+t0 = time.perf_counter()
+spec = importlib.util.spec_from_file_location("geforce_presence", "src/geforce_presence.py")
+gp = importlib.util.module_from_spec(spec)
+sys.modules["geforce_presence"] = gp
+spec.loader.exec_module(gp)
+elapsed = time.perf_counter() - t0
+heavy = sorted({m.split(".")[0] for m in sys.modules} & set(HEAVY))
+staged = gp.Path(gp.tempfile.gettempdir(), "geforce_driver").exists()
+print(json.dumps({"import_s": elapsed, "heavy": heavy, "driver_staged_at_import": staged}))
+"""
+
+# pide el Service de Edge con selenium de mentira y dice si copió msedgedriver
+STAGE = r"""
+import importlib.util, json, sys, types
+from unittest import mock
+for name in ("selenium", "selenium.webdriver", "selenium.webdriver.edge", "selenium.webdriver.edge.service"):
+    sys.modules[name] = mock.MagicMock(name=name)
+spec = importlib.util.spec_from_file_location("geforce_presence", "src/geforce_presence.py")
+gp = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(gp)
+dest = gp.Path(gp.tempfile.gettempdir(), "geforce_driver", "msedgedriver.exe")
+existed = dest.exists()
+gp.edge_driver_service()
+gp.edge_driver_service()
+after = dest.stat().st_ino if dest.exists() else None
+print(json.dumps({"existed": existed, "inode": after}))
+"""
+
+
+def run_child(sandbox: Path, code: str) -> dict:
+    env = dict(os.environ, TMPDIR=str(sandbox / "tmp"), PYTHONDONTWRITEBYTECODE="1")
+    proc = subprocess.run([sys.executable, "-c", code], cwd=sandbox, env=env,
+                          capture_output=True, text=True)
+    if proc.returncode != 0:
+        sys.stderr.write(proc.stderr[-4000:])
+        raise SystemExit(f"el import falló con código {proc.returncode}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=7)
+    ap.add_argument("--budget-ms", type=float, default=400.0)
+    args = ap.parse_args()
+
+    sandbox = fakes.make_sandbox(ROOT / "config" / "games_config_merged.json")
+    (sandbox / "tools" / "msedgedriver.exe").write_bytes(b"MZ" + os.urandom(1 << 20))
+    try:
+        # el primer import crea .env, logs/ y demás: no cuenta
+        run_child(sandbox, "HEAVY = ()\n" + CHILD)
+        runs = [run_child(sandbox, f"HEAVY = {HEAVY_MODULES!r}\n" + CHILD) for _ in range(args.runs)]
+        first = run_child(sandbox, STAGE)
+        second = run_child(sandbox, STAGE)
+    finally:
+        shutil.rmtree(sandbox, ignore_errors=True)
+
+    times = sorted(r["import_s"] * 1000 for r in runs)
+    heavy = sorted({m for r in runs for m in r["heavy"]})
+    median = statistics.median(times)
+    failures = []
+    if median > args.budget_ms:
+        failures.append(f"import mediano {median:.1f} ms > presupuesto {args.budget_ms:.0f} ms")
+    if heavy:
+        failures.append(f"módulos pesados cargados al importar: {', '.join(heavy)}")
+    if any(r["driver_staged_at_import"] for r in runs):
+        failures.append("msedgedriver se copió a temp durante el import")
+    if first["existed"] or not second["existed"] or first["inode"] != second["inode"]:
+        failures.append("msedgedriver se volvió a copiar sin haber cambiado")
+
+    print(json.dumps({
+        "runs": len(times),
+        "import_ms": {"min": round(times[0], 2), "median": round(median, 2), "max": round(times[-1], 2)},
+        "budget_ms": args.budget_ms,
+        "heavy_modules_loaded": heavy,
+        "driver_staging": {"first": first, "second": second},
+        "failures": failures,
+    }, indent=2))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Reproduce una secuencia de ticks contra el IPC de Discord de mentira
+(bench/fake_discord_ipc.py, con el mismo rate limit que Discord escalado en el
+tiempo) y compara:
+- naive: rpc.update() en cada tick, como antes
+- coalescer: PresenceUpdateCoalescer
+
+Informa cuántos SET_ACTIVITY llegaron, cuántos descartó el rate limit y si la
+actividad final que ve Discord es la última deseada. Solo Linux (socket Unix).
+
+Uso:
+    python bench/bench_presence_updates.py [--scale 0.1] [--ticks 120]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from pypresence import Presence  # noqa: E402
+
+import geforce_presence as gp  # noqa: E402
+from fake_discord_ipc import FakeDiscordIPC  # noqa: E402
+
+CLIENT_ID = "1095416975028650046"
+
+
+def scenario(ticks: int):
+    """
+    Payload deseado por tick: menú de la biblioteca, cambio de juego con el
+    rich presence de Steam llegando en varios pasos, grupo que cambia y
+    largos tramos sin cambios.
+    """
+    game = {"large_image": "steam", "large_text": "Cyberpunk 2077"}
+    steps = [
+        {"large_image": "lib", "large_text": "Games", "details": "Idling..."},
+        {**game},
+        {**game, "details": "Night City"},
+        {**game, "details": "Night City", "state": "Playing solo"},
+        {**game, "details": "Watson", "state": "Playing solo"},
+        {**game, "details": "Watson", "state": "On a Group", "party_size": [2, 4]},
+        {**game, "details": "Watson", "state": "On a Group", "party_size": [3, 4]},
+    ]
+    # ráfaga al principio (cambio de juego) y luego cambios espaciados
+    changes = {0: 0, 2: 1, 3: 2, 4: 3, 5: 4, 6: 5, 7: 6, 8: 5, 60: 4, 90: 3}
+    current = steps[0]
+    out = []
+    for i in range(ticks):
+        if i in changes:
+            current = steps[changes[i]]
+        out.append(dict(current))
+    return out
+
+
+def run(mode: str, payloads, tick: float, burst: int, period: float):
+    with FakeDiscordIPC(rate_limit=(burst, period)) as server:
+        os.environ["XDG_RUNTIME_DIR"] = server.runtime_dir
+        rpc = Presence(CLIENT_ID)
+        rpc.connect()
+        coalescer = gp.PresenceUpdateCoalescer(lambda p: rpc.update(**p), burst=burst, period=period)
+        t0 = time.perf_counter()
+        for payload in payloads:
+            if mode == "naive":
+                rpc.update(**{k: v for k, v in payload.items() if v})
+            else:
+                coalescer.submit(payload)
+            time.sleep(tick)
+        # el coalescer puede tener un pendiente: esperar a que salga
+        if mode == "coalescer":
+            wait = coalescer.seconds_until_flush()
+            while wait is not None:
+                time.sleep(wait)
+                coalescer.flush()
+                wait = coalescer.seconds_until_flush()
+        elapsed = time.perf_counter() - t0
+        time.sleep(0.05)
+        final = server.current_activity or {}
+        wanted = {k: v for k, v in payloads[-1].items() if v}
+        rpc.close()
+        result = {
+            "mode": mode,
+            "elapsed_s": round(elapsed, 3),
+            "server": server.stats(),
+            "final_matches": (
+                final.get("details") == wanted.get("details")
+                and final.get("state") == wanted.get("state")
+                and (final.get("assets") or {}).get("large_text") == wanted.get("large_text")
+            ),
+        }
+        if mode == "coalescer":
+            result["coalescer"] = coalescer.stats()
+        return result
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--ticks", type=int, default=120)
+    ap.add_argument("--scale", type=float, default=0.1,
+                    help="factor de tiempo: 1.0 = UPDATE_INTERVAL de 1 s y límite 5/20 s reales")
+    args = ap.parse_args()
+
+    tick = 1.0 * args.scale
+    burst, period = 5, 20.0 * args.scale
+    payloads = scenario(args.ticks)
+    results = [run(mode, payloads, tick, burst, period) for mode in ("naive", "coalescer")]
+    print(json.dumps({"ticks": args.ticks, "tick_s": tick, "limit": [burst, period], "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Ejercita RpcConnectionManager contra el IPC de Discord de mentira
+(bench/fake_discord_ipc.py) inyectando caídas:
+1. Discord rechaza los handshakes durante un rato: reintentos con backoff.
+2. Discord corta todas las conexiones: call() falla una vez y la reconexión
+   ocurre en segundo plano.
+3. Cambio de client_id con prepare() previo: corte inmediato desde la espera,
+   comparado con el connect() bloqueante de antes.
+Todos los tiempos en ms. Solo Linux (socket Unix).
+
+Uso:
+    python bench/bench_rpc_connections.py [--rounds 20]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from pypresence import Presence  # noqa: E402
+
+import geforce_presence as gp  # noqa: E402
+from fake_discord_ipc import FakeDiscordIPC  # noqa: E402
+
+CLIENT_A = "1095416975028650046"
+CLIENT_B = "1158877933042143272"
+
+
+def ms(seconds: float) -> float:
+    return round(seconds * 1000, 3)
+
+
+def summary(values):
+    values = sorted(values)
+    if not values:
+        return {}
+    return {
+        "n": len(values),
+        "p50": ms(statistics.median(values)),
+        "max": ms(values[-1]),
+    }
+
+
+def wait_until(predicate, timeout: float = 10.0) -> float:
+    t0 = time.perf_counter()
+    while not predicate():
+        if time.perf_counter() - t0 > timeout:
+            raise TimeoutError("condición no alcanzada")
+        time.sleep(0.001)
+    return time.perf_counter() - t0
+
+
+def refused_start(server, refuse_for: float):
+    server.refuse_handshake = True
+    manager = gp.RpcConnectionManager(backoff_base=0.05, backoff_max=0.4)
+    manager.start()
+    t0 = time.perf_counter()
+    use_t = time.perf_counter()
+    manager.use(CLIENT_A)
+    use_cost = time.perf_counter() - use_t
+    time.sleep(refuse_for)
+    server.refuse_handshake = False
+    wait_until(lambda: manager.connected)
+    result = {
+        "use_call_ms": ms(use_cost),
+        "refused_for_ms": ms(refuse_for),
+        "connected_after_ms": ms(time.perf_counter() - t0),
+        "stats": manager.stats(),
+    }
+    manager.stop()
+    return result
+
+
+def drops(server, rounds: int):
+    manager = gp.RpcConnectionManager(backoff_base=0.05, backoff_max=0.4)
+    manager.start()
+    manager.use(CLIENT_A)
+    wait_until(lambda: manager.connected)
+    failing_calls, recoveries = [], []
+    for i in range(rounds):
+        manager.call(lambda rpc: rpc.update(details=f"tick {i}"))
+        server.drop_connections()
+        time.sleep(0.01)
+        t0 = time.perf_counter()
+        try:
+            manager.call(lambda rpc: rpc.update(details=f"tick {i} (después del corte)"))
+        except Exception:
+            pass
+        failing_calls.append(time.perf_counter() - t0)
+        recoveries.append(wait_until(lambda: manager.connected))
+    manager.call(lambda rpc: rpc.update(details="final"))
+    result = {
+        "failing_call": summary(failing_calls),
+        "reconnect": summary(recoveries),
+        "final_activity_ok": (server.current_activity or {}).get("details") == "final",
+        "stats": manager.stats(),
+    }
+    manager.stop()
+    return result
+
+
+def cutovers(server, rounds: int):
+    blocking = []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        rpc = Presence(CLIENT_B)
+        rpc.connect()
+        blocking.append(time.perf_counter() - t0)
+        rpc.close()
+
+    manager = gp.RpcConnectionManager()
+    manager.start()
+    manager.use(CLIENT_A)
+    wait_until(lambda: manager.connected)
+    warm, cold = [], []
+    for i in range(rounds):
+        target = CLIENT_B if manager.client_id == CLIENT_A else CLIENT_A
+        manager.prepare(target)
+        wait_until(lambda: manager.stats()["standby"] == target)
+        t0 = time.perf_counter()
+        assert manager.use(target)
+        warm.append(time.perf_counter() - t0)
+        manager.call(lambda rpc: rpc.update(details=f"cutover {i}"))
+    # sin prepare(): use() vuelve enseguida y el corte llega en segundo plano
+    for i in range(rounds):
+        other = f"9{i:017d}"
+        t0 = time.perf_counter()
+        manager.use(other)
+        cold.append(time.perf_counter() - t0)
+        wait_until(lambda: manager.client_id == other)
+    result = {
+        "blocking_connect": summary(blocking),
+        "use_with_standby": summary(warm),
+        "use_without_standby": summary(cold),
+        "stats": manager.stats(),
+    }
+    manager.stop()
+    return result
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rounds", type=int, default=20)
+    ap.add_argument("--refuse-for", type=float, default=0.5, help="segundos rechazando handshakes")
+    args = ap.parse_args()
+
+    with FakeDiscordIPC() as server:
+        os.environ["XDG_RUNTIME_DIR"] = server.runtime_dir
+        out = {
+            "refused_start": refused_start(server, args.refuse_for),
+            "drops": drops(server, args.rounds),
+            "cutovers": cutovers(server, args.rounds),
+            "server": server.stats(),
+        }
+    print(json.dumps(out, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Compara el parser incremental de SteamScraper con el camino anterior basado en
+BeautifulSoup (html.parser) sobre las páginas de bench/fixtures: mismo resultado
+y tiempo por página. Las rp_*.html de bench/fixtures son sintéticas (marcado
+escrito con la forma de la página); las de bench/fixtures/captured son páginas
+reales saneadas, grabadas con bench/capture_rp_fixture.py. El repo aún no trae
+ninguna capturada (hace falta una sesión de Steam con el juego abierto): hasta
+que se grabe alguna, el bench avisa de que solo cubre marcado sintético.
+
+Uso:
+    python bench/bench_steam_parser.py [--repeat 50] [fixture.html ...]
+"""
+import argparse
+import json
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+
+import geforce_presence as gp  # noqa: E402
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+CAPTURED = FIXTURES / "captured"
+
+
+def soup_parse(html: str):
+    """Camino anterior de SteamScraper.get_rich_presence (sin logging)."""
+    soup = BeautifulSoup(html, 'html.parser')
+    b = soup.find('b', string=re.compile(r'Localized Rich Presence Result', re.IGNORECASE))
+    rich_presence_text = None
+    if b:
+        text = (b.next_sibling or "").strip()
+        if text and "No rich presence keys set" not in text and '#' not in text:
+            rich_presence_text = text
+
+    for row in soup.find_all('tr'):
+        cells = row.find_all('td')
+        if len(cells) >= 2 and 'steam_player_group_size' in cells[0].get_text().strip():
+            group_size_text = cells[1].get_text().strip()
+            if group_size_text.isdigit():
+                return rich_presence_text, int(group_size_text)
+
+    cells = soup.find_all('td')
+    for cell in cells:
+        text = cell.get_text().strip()
+        if '/' in text and text.replace('/', '').isdigit():
+            parts = text.split('/')
+            if len(parts) == 2 and parts[0].isdigit():
+                return rich_presence_text, int(parts[0])
+    for cell in cells:
+        text = cell.get_text().strip()
+        if text.isdigit() and 1 <= int(text) <= 16:
+            return rich_presence_text, int(text)
+    return rich_presence_text, None
+
+
+def timed(fn, html, repeat):
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(html)
+        samples.append(time.perf_counter() - t0)
+    return statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("fixtures", nargs="*")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    paths = [Path(p) for p in args.fixtures] or sorted(FIXTURES.glob("*.html")) + sorted(CAPTURED.glob("*.html"))
+    scraper = gp.SteamScraper(None, "")
+    results, mismatches = [], 0
+    for path in paths:
+        html = path.read_text(encoding="utf-8")
+        expected = soup_parse(html)
+        got = scraper.parse(html)
+        if got != expected:
+            mismatches += 1
+        results.append({
+            "fixture": path.name,
+            "source": "captured" if path.parent.name == CAPTURED.name else "synthetic",
+            "bytes": len(html),
+            "expected": expected,
+            "got": got,
+            "soup_ms": round(timed(soup_parse, html, args.repeat), 3),
+            "stream_ms": round(timed(scraper.parse, html, args.repeat), 3),
+        })
+    captured = sum(1 for r in results if r["source"] == "captured")
+    if not captured:
+        print("⚠️ Sin páginas capturadas en bench/fixtures/captured: solo se comprueba marcado sintético "
+              "(grábalas con bench/capture_rp_fixture.py)", file=sys.stderr)
+    print(json.dumps({"mismatches": mismatches, "captured": captured, "pages": results},
+                     indent=2, ensure_ascii=False))
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+Benchmark de extremo a extremo de una iteración de run_loop.
+
+Cada catálogo se mide en un subproceso propio con PresenceManager y backends
+de mentira (bench/fakes.py): ventana (FakeWindowSource), tabla de procesos,
+HTTP de Steam con las páginas de bench/fixtures, IPC de Discord
+(fake_discord_ipc + pypresence) y Popen de dumb.exe. El módulo se carga desde
+una copia en un directorio temporal, así que el checkout no se toca.
+
+Se informa en JSON:
+- startup: import, carga de config en frío (compila el catálogo) y en
+  caliente (mmap), construcción de PresenceManager y primer tick
+- stages: distribución de latencias (ms) por etapa: process_check,
+  title_resolution, update_presence, rpc_submit, rpc_send, config_persistence,
+  steam_fetch, steam_parse y el tick completo
+- memory: pico de RSS (y de tracemalloc con --tracemalloc)
+- metrics (con --metrics): el mismo recorrido con MetricsRegistry activo y su
+  endpoint en un puerto efímero; se informa el coste de un scrape de /metrics.
+  Comparar stages con y sin --metrics da la sobrecarga de la instrumentación
+
+Solo necesita Linux y las dependencias no Windows de requirements.txt.
+
+Uso:
+    python bench/bench_tick.py [--catalog real synthetic] [--entries 100000]
+                               [--ticks 400] [--out bench_tick.json]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import urllib.request
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(BENCH_DIR))
+
+import fakes  # noqa: E402
+
+REAL_CATALOG = ROOT / "config" / "games_config_merged.json"
+GAME_SUFFIX = "® en GeForce NOW"
+
+# cadencias del bench: el poller de Steam y el rate limit de Discord no deben
+# esconder el coste de cada etapa detrás de esperas
+BENCH_ENV = {
+    "STEAM_POLL_INTERVAL": "0.02",
+    "RPC_UPDATE_PERIOD": "0.001",
+    "UPDATE_INTERVAL": "10",
+    "TEST_RICH_URL": "https://steamcommunity.com/dev/testrichpresence",
+}
+
+
+class StageTimer:
+    """Envuelve callables y acumula su duración por etapa (seguro entre hilos con el GIL)."""
+
+    def __init__(self):
+        self.samples = {}
+
+    def wrap(self, stage: str, fn):
+        bucket = self.samples.setdefault(stage, [])
+
+        def timed(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                bucket.append(time.perf_counter() - t0)
+        return timed
+
+    def add(self, stage: str, seconds: float):
+        self.samples.setdefault(stage, []).append(seconds)
+
+    def summary(self) -> dict:
+        return {stage: distribution(values) for stage, values in sorted(self.samples.items())}
+
+
+def distribution(values) -> dict:
+    if not values:
+        return {"n": 0}
+    values = sorted(values)
+
+    def pct(p):
+        return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+    return {
+        "n": len(values),
+        "mean_ms": round(statistics.fmean(values) * 1000, 4),
+        "p50_ms": round(pct(50) * 1000, 4),
+        "p90_ms": round(pct(90) * 1000, 4),
+        "p99_ms": round(pct(99) * 1000, 4),
+        "max_ms": round(values[-1] * 1000, 4),
+    }
+
+
+def title_script(catalog: dict, ticks: int, dwell: int, seed: int = 7) -> list:
+    """
+    Título de ventana por tick: juegos del catálogo (por name o por clave),
+    algunos desconocidos y la biblioteca; cambia cada `dwell` ticks.
+    """
+    rng = random.Random(seed)
+    keys = list(catalog.keys())
+    titles = []
+    current = None
+    for i in range(ticks):
+        if i % dwell == 0:
+            roll = rng.random()
+            if roll < 0.70:
+                key = rng.choice(keys)
+                name = (catalog[key] or {}).get("name") or key
+                current = f"{name}{GAME_SUFFIX}"
+            elif roll < 0.85:
+                current = f"Unlisted Game {rng.randint(0, 10 ** 6)} on GeForce NOW"
+            else:
+                current = "Games en GeForce NOW"
+        titles.append(current)
+    return titles
+
+
+def peak_rss_mb() -> float:
+    """Pico de RSS del proceso. VmHWM (Linux) no hereda el pico del padre tras exec como ru_maxrss."""
+    try:
+        with open("/proc/self/status", "r", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def prepare_scenario(args, catalog_kind: str, work: Path) -> Path:
+    """
+    En el proceso padre: catálogo en disco, títulos por tick, apps detectables y
+    AppIDs de Steam. El worker solo lee estos ficheros pequeños, así su pico de
+    memoria es el del módulo y no el de tener el catálogo cargado dos veces.
+    """
+    if catalog_kind == "real":
+        catalog_path = REAL_CATALOG
+        with catalog_path.open("r", encoding="utf-8") as f:
+            catalog = json.load(f)
+    else:
+        catalog = fakes.synthetic_catalog(args.entries)
+        catalog_path = fakes.write_catalog(catalog, work / "synthetic.json")
+    items = list(catalog.items())
+    titles = title_script(catalog, args.ticks, args.dwell)
+    shown = {t[: -len(GAME_SUFFIX)] for t in set(titles) if t.endswith(GAME_SUFFIX)}
+    scenario = {
+        "catalog": catalog_kind,
+        "catalog_path": str(catalog_path),
+        "entries": len(catalog),
+        "titles": titles,
+        "discord_apps": [[str(10 ** 17 + i), (e or {}).get("name") or k, [], (e or {}).get("executable_path")]
+                         for i, (k, e) in enumerate(items[: args.discord_apps])],
+        "steam_appids": {(e or {}).get("name") or k: str((e or {}).get("steam_appid") or "")
+                         for k, e in items if (e or {}).get("steam_appid") and ((e or {}).get("name") or k) in shown},
+    }
+    path = work / f"scenario_{catalog_kind}.json"
+    path.write_text(json.dumps(scenario, ensure_ascii=False), encoding="utf-8")
+    return path
+
+
+def run_worker(args) -> dict:
+    t_process = time.perf_counter()
+    if args.tracemalloc:
+        tracemalloc.start()
+
+    scenario = json.loads(Path(args.scenario).read_text(encoding="utf-8"))
+    rss_before_mb = peak_rss_mb()
+    sandbox = fakes.make_sandbox(Path(scenario["catalog_path"]), env=BENCH_ENV)
+    stubbed = fakes.install_platform_stubs()
+    from fake_discord_ipc import FakeDiscordIPC
+
+    ipc_dir = sandbox / "ipc"
+    ipc_dir.mkdir()
+    server = FakeDiscordIPC(runtime_dir=str(ipc_dir)).start()
+    os.environ["XDG_RUNTIME_DIR"] = str(ipc_dir)
+
+    startup = {}
+    t0 = time.perf_counter()
+    gp = fakes.import_module(sandbox)
+    startup["import_s"] = time.perf_counter() - t0
+    metrics_server = None
+    if args.metrics:
+        gp.enable_metrics(port=0)
+        metrics_server = gp.MetricsServer(gp.METRICS, 0).start()
+
+    timer = StageTimer()
+    t0 = time.perf_counter()
+    cold = gp.ConfigManager(gp.CONFIG_PATH_FILE)
+    startup["config_cold_s"] = time.perf_counter() - t0
+    del cold
+    t0 = time.perf_counter()
+    config_manager = gp.ConfigManager(gp.CONFIG_PATH_FILE)
+    startup["config_warm_s"] = time.perf_counter() - t0
+    config_manager.persist_game = timer.wrap("journal_write", config_manager.persist_game)
+
+    # apps detectables de Discord ya en memoria: sin red en los hilos de match
+    gp.DISCORD_APPS_CACHE.apps = [gp.DiscordApp.from_row(row) for row in scenario.pop("discord_apps")]
+    gp.DISCORD_APPS_CACHE._disk_checked = True
+    gp.DISCORD_APPS_CACHE.validated_at = time.time()
+    gp.DISCORD_APPS_CACHE.version = int(time.time())
+
+    table = fakes.FakeProcessTable(n=args.processes)
+    processes = gp.ProcessSnapshot(iter_processes=table.iter_processes, pid_exists=table.pid_exists,
+                                   process_info=table.process_info)
+    window = gp.FakeWindowSource()
+    steam_names = scenario.pop("steam_appids")
+    appids = gp.SteamAppIdResolver(path=sandbox / "config" / "steam_appids.json",
+                                   search=lambda name: steam_names.get(name) or None)
+    fake_execs = gp.FakeExecutableManager(source=sandbox / "tools" / "dumb.exe", root=sandbox / "tmp" / "fake_game",
+                                          state_path=sandbox / "config" / "fake_executables.json",
+                                          popen=fakes.FakePopen, process_info=lambda pid: ("dumb.exe", 0.0))
+
+    t0 = time.perf_counter()
+    pm = gp.PresenceManager(gp.CLIENT_ID or "1095416975028650046", config_manager.store,
+                            _NoCookies(), gp.TEST_RICH_URL,
+                            config_manager=config_manager, window_source=window, processes=processes,
+                            fake_executables=fake_execs, appid_resolver=appids,
+                            # los títulos cambian cada pocos ms: sin histéresis, para medir el cambio de juego completo
+                            transitions=gp.TransitionDebouncer(0, 0, 0))
+    pm.connections.wait_connected(timeout=5.0)
+    startup["presence_manager_s"] = time.perf_counter() - t0
+
+    steam = fakes.FakeSteamSession(dwell=args.steam_dwell)
+    pm.scraper.http = steam
+    pm.steam_poller.start()  # sin PresenceEngine: el poller en su hilo
+    pm.scraper.get_rich_presence = timer.wrap("steam_fetch", pm.scraper.get_rich_presence)
+    pm.scraper.parse = timer.wrap("steam_parse", pm.scraper.parse)
+    pm._show_match_dialog = lambda *a, **k: None  # sin tkinter: el candidato dudoso se ignora
+    pm.is_geforce_running = timer.wrap("process_check", pm.is_geforce_running)
+    pm.find_active_game = timer.wrap("title_resolution", pm.find_active_game)
+    pm._save_game = timer.wrap("config_persistence", pm._save_game)
+    pm.presence_updates.submit = timer.wrap("rpc_submit", pm.presence_updates.submit)
+    pm.presence_updates._send = timer.wrap("rpc_send", pm.presence_updates._send)
+    pm.update_presence = timer.wrap("update_presence", pm.update_presence)
+
+    titles = scenario["titles"]
+    last_title = object()
+    for i, title in enumerate(titles):
+        if title != last_title:
+            window.push(title)
+            last_title = title
+        t0 = time.perf_counter()
+        pm._tick()
+        elapsed = time.perf_counter() - t0
+        if i == 0:
+            startup["first_tick_s"] = elapsed
+        else:
+            timer.add("tick", elapsed)
+        if args.tick_sleep:
+            time.sleep(args.tick_sleep)
+
+    metrics = None
+    if metrics_server is not None:
+        url = f"http://127.0.0.1:{metrics_server.port}/metrics"
+        scrapes = []
+        for _ in range(20):
+            t0 = time.perf_counter()
+            with urllib.request.urlopen(url, timeout=5) as resp:
+                body = resp.read().decode("utf-8")
+            scrapes.append(time.perf_counter() - t0)
+        samples = [line for line in body.splitlines() if line and not line.startswith("#")]
+        metrics = {
+            "scrape": distribution(scrapes),
+            "bytes": len(body),
+            "samples": len(samples),
+            "registry": gp.METRICS.snapshot(),
+        }
+        metrics_server.stop()
+
+    memory = {
+        "max_rss_mb": round(peak_rss_mb(), 2),
+        "rss_before_import_mb": round(rss_before_mb, 2),
+    }
+    if args.tracemalloc:
+        memory["tracemalloc_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 2)
+        tracemalloc.stop()
+
+    result = {
+        "catalog": scenario["catalog"],
+        "entries": scenario["entries"],
+        "ticks": len(titles),
+        "startup": {k: round(v, 4) for k, v in startup.items()},
+        "stages": timer.summary(),
+        "memory": memory,
+        "counters": {
+            "steam_requests": steam.requests,
+            "steam_not_modified": steam.not_modified,
+            "steam_cache": pm.scraper.cache_stats(),
+            "rpc": pm.presence_updates.stats(),
+            "ipc_server": server.stats(),
+            "process_snapshots": processes.snapshots_taken,
+            "scheduler": pm.scheduler.stats(),
+            "appids": appids.stats(),
+        },
+        "metrics": metrics,
+        "stubbed_modules": stubbed,
+        "wall_s": round(time.perf_counter() - t_process, 3),
+    }
+    pm.close()
+    server.stop()
+    shutil.rmtree(sandbox, ignore_errors=True)
+    return result
+
+
+class _NoCookies:
+    env_cookie = None
+
+
+def run_parent(args) -> dict:
+    runs = []
+    work = Path(tempfile.mkdtemp(prefix="gfn-bench-scenario-"))
+    try:
+        for catalog in args.catalog:
+            scenario = prepare_scenario(args, catalog, work)
+            cmd = [sys.executable, str(Path(__file__).resolve()), "--scenario", str(scenario),
+                   "--tick-sleep", str(args.tick_sleep), "--processes", str(args.processes),
+                   "--steam-dwell", str(args.steam_dwell)]
+            if args.tracemalloc:
+                cmd.append("--tracemalloc")
+            if args.metrics:
+                cmd.append("--metrics")
+            proc = subprocess.run(cmd, capture_output=True, text=True)
+            if proc.returncode != 0:
+                sys.stderr.write(proc.stderr[-4000:])
+                raise SystemExit(f"worker '{catalog}' terminó con código {proc.returncode}")
+            if args.verbose:
+                sys.stderr.write(proc.stderr)
+            runs.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+    try:
+        commit = subprocess.run(["git", "-C", str(ROOT), "rev-parse", "--short", "HEAD"],
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "commit": commit,
+            "env": BENCH_ENV,
+        },
+        "runs": runs,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark de un tick de run_loop con backends de mentira")
+    ap.add_argument("--catalog", nargs="+", choices=("real", "synthetic"), default=["real", "synthetic"])
+    ap.add_argument("--entries", type=int, default=100_000, help="entradas del catálogo sintético")
+    ap.add_argument("--ticks", type=int, default=400)
+    ap.add_argument("--dwell", type=int, default=5, help="ticks con el mismo título")
+    ap.add_argument("--tick-sleep", type=float, default=0.005, help="pausa entre ticks (deja correr al poller)")
+    ap.add_argument("--processes", type=int, default=300, help="procesos en la tabla de mentira")
+    ap.add_argument("--steam-dwell", type=int, default=4, help="peticiones con la misma página de Steam")
+    ap.add_argument("--discord-apps", type=int, default=5000, help="apps detectables de Discord en memoria")
+    ap.add_argument("--tracemalloc", action="store_true", help="medir también el pico de tracemalloc (más lento)")
+    ap.add_argument("--metrics", action="store_true", help="activar MetricsRegistry y medir su endpoint")
+    ap.add_argument("--out", type=Path, default=None, help="escribir el JSON aquí además de stdout")
+    ap.add_argument("--verbose", action="store_true", help="mostrar los logs de los workers")
+    ap.add_argument("--scenario", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.scenario:
+        print(json.dumps(run_worker(args)))
+        return
+
+    report = run_parent(args)
+    text = json.dumps(report, indent=2)
+    if args.out:
+        args.out.write_text(text + "\n", encoding="utf-8")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Reproduce una sesión de títulos de ventana de GeForce NOW con parpadeos
+(pantallas de carga, vuelta a la biblioteca unos segundos, títulos de otros
+juegos al pasar por la tienda) contra PresenceManager con backends de
+mentira, sin TransitionDebouncer (plazos a 0) y con los plazos configurados.
+
+El tiempo es virtual para el debouncer: cada paso avanza el reloj y ejecuta
+un tick (en cada cambio de título y cada --step segundos). Cuenta:
+- rpc_switches: cambios de client_id pedidos (cortes de conexión RPC)
+- fake_launches / fake_closed: ejecutables falsos lanzados y cerrados
+- games_added / match_jobs: títulos dados de alta en el catálogo y matches de
+  Discord encolados (los títulos de paso no deberían llegar a ninguno)
+- accuracy: % de ticks en los que la presencia muestra el juego que de verdad
+  se está jugando (en la biblioteca: nada o la biblioteca)
+- commit_lag_s: retraso medio entre que empieza una partida y la presencia
+  la muestra
+
+Uso:
+    python bench/bench_transitions.py [--sessions 8] [--step 0.5] [--seed 5]
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR))
+
+import fakes  # noqa: E402
+
+SUFFIX = " on GeForce NOW"
+LIBRARY = ("Games on GeForce NOW", "GeForce NOW")
+
+
+def timeline(games: list, sessions: int, seed: int, store: list = ()) -> list:
+    """
+    [(instante, título, juego real o None)] con los parpadeos de una sesión real.
+    store: títulos que no están en el catálogo y solo aparecen de paso (tienda).
+    """
+    rnd = random.Random(seed)
+    out = []
+    t = 0.0
+
+    def show(title, truth, seconds):
+        nonlocal t
+        out.append((t, title, truth))
+        t += seconds
+
+    for _ in range(sessions):
+        game = rnd.choice(games)
+        show(LIBRARY[0], None, rnd.uniform(10, 30))
+        loading_until = t + rnd.uniform(6, 15)
+        while t < loading_until:
+            show(LIBRARY[1], game, rnd.uniform(0.5, 2))
+            show(game + SUFFIX, game, rnd.uniform(0.5, 2))
+        playing_until = t + rnd.uniform(120, 400)
+        while t < playing_until:
+            show(game + SUFFIX, game, rnd.uniform(20, 60))
+            roll = rnd.random()
+            if roll < 0.6:
+                show(rnd.choice(LIBRARY), game, rnd.uniform(1, 8))
+            elif roll < 0.8:
+                passing = rnd.choice(store) if store and rnd.random() < 0.5 else rnd.choice(games)
+                show(passing + SUFFIX, game, rnd.uniform(0.5, 2))
+    show(LIBRARY[0], None, 10)
+    out.append((t, LIBRARY[0], None))
+    return out
+
+
+def replay(gp, sandbox: Path, events: list, delays: tuple, step: float) -> dict:
+    from fake_discord_ipc import FakeDiscordIPC
+
+    # cada pasada parte del mismo catálogo: lo que una dé de alta no lo ve la otra
+    config_backup = Path(fakes.tempfile.mkdtemp(dir=sandbox)) / "config"
+    shutil.copytree(gp.CONFIG_DIR, config_backup)
+    ipc_dir = Path(fakes.tempfile.mkdtemp(dir=sandbox))
+    server = FakeDiscordIPC(runtime_dir=str(ipc_dir)).start()
+    os.environ["XDG_RUNTIME_DIR"] = str(ipc_dir)
+
+    now = [0.0]
+    enter, switch, grace = delays
+    transitions = gp.TransitionDebouncer(enter, switch, grace, clock=lambda: now[0])
+    table = fakes.FakeProcessTable(n=50)
+    processes = gp.ProcessSnapshot(iter_processes=table.iter_processes, pid_exists=table.pid_exists,
+                                   process_info=table.process_info)
+    window = gp.FakeWindowSource()
+    work = Path(fakes.tempfile.mkdtemp(dir=sandbox))
+    fake_execs = gp.FakeExecutableManager(source=sandbox / "tools" / "dumb.exe", root=work / "fake_game",
+                                          state_path=work / "fake_executables.json",
+                                          popen=fakes.FakePopen, process_info=lambda pid: ("dumb.exe", 0.0))
+    appids = gp.SteamAppIdResolver(path=work / "steam_appids.json", search=lambda name: None)
+
+    class NoCookies:
+        env_cookie = None
+
+    pm = gp.PresenceManager(gp.CLIENT_ID or "1095416975028650046", gp.ConfigManager(gp.CONFIG_PATH_FILE).store,
+                            NoCookies(), gp.TEST_RICH_URL, window_source=window, processes=processes,
+                            fake_executables=fake_execs, appid_resolver=appids, transitions=transitions)
+    pm.connections.wait_connected(timeout=5.0)
+    pm._show_match_dialog = lambda *a, **k: None
+
+    counts = {"rpc_switches": 0, "fake_closed": 0, "match_jobs": 0}
+    connect_rpc, stop_execs, submit = pm._connect_rpc, fake_execs.stop, pm.workers.submit
+    catalog_size = len(pm.games_map)
+
+    def counting_connect(client_id=None):
+        counts["rpc_switches"] += 1
+        return connect_rpc(client_id)
+
+    def counting_stop(*args, **kwargs):
+        closed = stop_execs(*args, **kwargs)
+        counts["fake_closed"] += closed or 0
+        return closed
+
+    def counting_submit(key, *args):
+        if key[0] == "discord-match":
+            counts["match_jobs"] += 1
+        return submit(key, *args)
+
+    pm._connect_rpc, fake_execs.stop, pm.workers.submit = counting_connect, counting_stop, counting_submit
+
+    ticks = matched = 0
+    lags, started_at = [], None
+    end = events[-1][0]
+    i = 0
+    truth = None
+    while now[0] <= end:
+        # cambios de título hasta el instante actual
+        while i < len(events) and events[i][0] <= now[0]:
+            _, title, truth_now = events[i]
+            if truth_now != truth:
+                started_at = events[i][0] if truth_now else None
+                truth = truth_now
+            window.push(title)
+            i += 1
+        pm._tick()
+        ticks += 1
+        current = (pm.last_game or {}).get("name")
+        shown_game = current if current and not gp.is_library_title(current) else None
+        if shown_game == truth:
+            matched += 1
+            if truth and started_at is not None:
+                lags.append(now[0] - started_at)
+                started_at = None  # solo la primera vez en cada partida
+        nxt = events[i][0] if i < len(events) else end + 1
+        now[0] = min(now[0] + step, nxt) if nxt > now[0] else now[0] + step
+
+    result = {
+        "delays": {"enter": enter, "switch": switch, "library_grace": grace},
+        "ticks": ticks,
+        **counts,
+        "fake_launches": fake_execs.launches,
+        "games_added": len(pm.games_map) - catalog_size,
+        "accuracy_pct": round(100 * matched / ticks, 1),
+        "commit_lag_s": round(statistics.mean(lags), 2) if lags else None,
+        "transitions": transitions.stats(),
+    }
+    pm.close()
+    server.stop()
+    shutil.rmtree(gp.CONFIG_DIR, ignore_errors=True)
+    shutil.copytree(config_backup, gp.CONFIG_DIR)
+    return result
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sessions", type=int, default=8)
+    ap.add_argument("--step", type=float, default=0.5, help="segundos virtuales entre ticks")
+    ap.add_argument("--seed", type=int, default=5)
+    ap.add_argument("--enter", type=float, default=None)
+    ap.add_argument("--switch", type=float, default=None)
+    ap.add_argument("--grace", type=float, default=None)
+    args = ap.parse_args()
+
+    synthetic = fakes.synthetic_catalog(3400)
+    catalog = {k: v for k, v in list(synthetic.items())[:3000] if v["client_id"] and v["executable_path"]}
+    store = [v["name"] for v in list(synthetic.values())[3000:]]
+    work = Path(fakes.tempfile.mkdtemp(prefix="gfn-transitions-"))
+    sandbox = fakes.make_sandbox(fakes.write_catalog(catalog, work / "catalog.json"))
+    fakes.install_platform_stubs()
+    gp = fakes.import_module(sandbox)
+
+    configured = (
+        gp.TRANSITION_ENTER_DELAY if args.enter is None else args.enter,
+        gp.TRANSITION_SWITCH_DELAY if args.switch is None else args.switch,
+        gp.TRANSITION_LIBRARY_GRACE if args.grace is None else args.grace,
+    )
+    events = timeline(list(catalog), args.sessions, args.seed, store)
+    t0 = time.perf_counter()
+    out = {
+        "sessions": args.sessions,
+        "title_changes": len(events),
+        "virtual_s": round(events[-1][0], 1),
+        "off": replay(gp, sandbox, events, (0.0, 0.0, 0.0), args.step),
+        "debounced": replay(gp, sandbox, events, configured, args.step),
+    }
+    out["wall_s"] = round(time.perf_counter() - t0, 2)
+    off, on = out["off"], out["debounced"]
+    out["reduction"] = {
+        key: f"{off[key]} -> {on[key]}" for key in ("rpc_switches", "fake_launches", "fake_closed",
+                                                         "games_added", "match_jobs")
+    }
+    failures = []
+    for key in ("rpc_switches", "fake_launches"):
+        if on[key] >= off[key]:
+            failures.append(f"{key} no baja con debounce ({off[key]} -> {on[key]})")
+    if on["games_added"]:
+        failures.append(f"{on['games_added']} títulos transitorios guardados como juegos")
+    if on["accuracy_pct"] < off["accuracy_pct"]:
+        failures.append(f"precisión menor con debounce ({off['accuracy_pct']} -> {on['accuracy_pct']})")
+    out["failures"] = failures
+    print(json.dumps(out, indent=2))
+    shutil.rmtree(work, ignore_errors=True)
+    shutil.rmtree(sandbox, ignore_errors=True)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
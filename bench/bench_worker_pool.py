@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Ráfaga de títulos nuevos (como al saltar entre juegos en la biblioteca de
+GeForce NOW) con dos formas de lanzar el trabajo de fondo:
+- threads: un hilo por evento (como antes el match de Discord y el staging)
+- pool: WorkerPool acotado con de-duplicación por clave
+
+Cada título nuevo encola un match de Discord (recorrido difflib sobre apps
+sintéticas, CPU) y cada cambio de ventana encola el staging de un ejecutable
+(pocas rutas que se repiten). Informa de lo que tarda el hilo que emite los
+eventos en recorrer la ráfaga, la concurrencia máxima, cuántos trabajos
+llegaron a ejecutarse, descartes y latencia de los matches.
+
+Uso:
+    python bench/bench_worker_pool.py [--titles 60] [--interval-ms 20] [--apps 3000]
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import geforce_presence as gp  # noqa: E402
+from fakes import synthetic_catalog  # noqa: E402
+
+
+class Probe:
+    """Cuenta trabajos en curso y su máximo."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+        self.peak_threads = 0
+        self.runs = {"match": 0, "stage": 0}
+        self.latency = []
+
+    def wrap(self, kind, fn):
+        def job(submitted, *args):
+            with self.lock:
+                self.active += 1
+                self.peak = max(self.peak, self.active)
+                self.peak_threads = max(self.peak_threads, threading.active_count())
+                self.runs[kind] += 1
+            try:
+                fn(*args)
+            finally:
+                with self.lock:
+                    self.active -= 1
+                    if kind == "match":
+                        self.latency.append(time.perf_counter() - submitted)
+        return job
+
+
+def events(titles: int, seed: int = 3):
+    """(tipo, clave) por cambio de ventana: título nuevo + staging de una de 4 rutas."""
+    rnd = random.Random(seed)
+    names = list(synthetic_catalog(titles, seed=seed))
+    paths = [f"game_{i}/bin/game.exe" for i in range(4)]
+    for name in names:
+        yield "match", name
+        yield "stage", rnd.choice(paths)
+
+
+def run(mode: str, args, apps) -> dict:
+    probe = Probe()
+    match = probe.wrap("match", lambda name: gp.find_discord_matches_full(apps, name, 6))
+    stage = probe.wrap("stage", lambda path: time.sleep(args.stage_ms / 1000))
+    pool = gp.WorkerPool(workers=args.workers, max_queue=args.max_queue, policy=args.policy, name="bench")
+    threads = []
+    t0 = time.perf_counter()
+    for kind, key in events(args.titles):
+        fn = match if kind == "match" else stage
+        if mode == "threads":
+            t = threading.Thread(target=fn, args=(time.perf_counter(), key), daemon=True)
+            t.start()
+            threads.append(t)
+        else:
+            pool.submit((kind, key), fn, time.perf_counter(), key)
+        time.sleep(args.interval_ms / 2000)
+    # lo que tarda el "loop principal" en recorrer la ráfaga (compite por el GIL con los trabajos)
+    burst = time.perf_counter() - t0
+    if mode == "threads":
+        for t in threads:
+            t.join()
+    else:
+        pool.join()
+    lat = sorted(probe.latency)
+    return {
+        "loop_s": round(burst, 3),
+        "drain_s": round(time.perf_counter() - t0, 3),
+        "peak_concurrent_jobs": probe.peak,
+        "peak_threads": probe.peak_threads,
+        "runs": probe.runs,
+        "match_latency_ms": {
+            "p50": round(statistics.median(lat) * 1000, 1) if lat else None,
+            "max": round(lat[-1] * 1000, 1) if lat else None,
+        },
+        "pool": pool.stats() if mode == "pool" else None,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--titles", type=int, default=60)
+    ap.add_argument("--interval-ms", type=float, default=20.0, help="tiempo entre títulos")
+    ap.add_argument("--apps", type=int, default=3000, help="apps de Discord sintéticas")
+    ap.add_argument("--stage-ms", type=float, default=5.0)
+    ap.add_argument("--workers", type=int, default=gp.WORKER_POOL_SIZE)
+    ap.add_argument("--max-queue", type=int, default=gp.WORKER_QUEUE_MAX)
+    ap.add_argument("--policy", default=gp.WORKER_DROP_POLICY, choices=gp.WorkerPool.POLICIES)
+    args = ap.parse_args()
+
+    apps = [gp.DiscordApp(str(100000 + i), name, [], None)
+            for i, name in enumerate(synthetic_catalog(args.apps, seed=11))]
+    out = {"titles": args.titles, "apps": len(apps)}
+    for mode in ("threads", "pool"):
+        out[mode] = run(mode, args, apps)
+    print(json.dumps(out, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Graba una página real de testrichpresence de Steam como fixture, saneada, en
+bench/fixtures/captured/. Las rp_*.html de bench/fixtures están escritas a mano
+con la forma de la página; las capturadas son las que de verdad comprueban el
+parser contra el marcado de Steam.
+
+La página solo tiene datos con sesión iniciada: se descarga con la cookie
+steamLoginSecure (--cookie o STEAM_COOKIE del .env) mientras el juego está
+abierto, o se sanea una copia guardada desde el navegador (--from-file).
+
+Saneado: ids de sesión y de cuenta (SteamID64, accountid, miniperfiles),
+rutas de perfil, avatares, tokens, nonces y el nombre de la cuenta se
+sustituyen por valores fijos. El bloque del resultado y la tabla de claves
+no se tocan. Revisa el archivo antes de subirlo.
+
+Uso:
+    python bench/capture_rp_fixture.py NOMBRE [--cookie ...] [--from-file pagina.html]
+    (guarda bench/fixtures/captured/rp_NOMBRE.html e imprime lo que lee el parser)
+"""
+import argparse
+import json
+import os
+import re
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+
+import geforce_presence as gp  # noqa: E402
+
+CAPTURED = Path(__file__).resolve().parent / "fixtures" / "captured"
+
+STEAM_ID = "76561198000000000"
+ACCOUNT_ID = "39734272"  # STEAM_ID - 76561197960265728
+
+# (patrón, reemplazo); se aplican en orden
+SANITIZE = [
+    (re.compile(r'(g_sessionID\s*=\s*")[^"]*(")'), r'\g<1>0123456789abcdef01234567\g<2>'),
+    (re.compile(r'(g_steamID\s*=\s*")[^"]*(")'), rf'\g<1>{STEAM_ID}\g<2>'),
+    (re.compile(r'(g_AccountID\s*=\s*)\d+'), rf'\g<1>{ACCOUNT_ID}'),
+    (re.compile(r'7656119\d{10}'), STEAM_ID),
+    (re.compile(r'(data-miniprofile=")\d+(")'), rf'\g<1>{ACCOUNT_ID}\g<2>'),
+    (re.compile(r'(steamcommunity\.com/id/)[^/"\'?#\s]+'), r'\g<1>sanitized'),
+    (re.compile(r'(avatars\.[a-z.]*steamstatic\.com/)[0-9a-f]{40}'), r'\g<1>' + "0" * 40),
+    # "clave":"valor" en JSON, también escapado como &quot; dentro de atributos
+    (re.compile(r'((?:webapi_token|access_token|sessionid|wallet_balance)(?:&quot;|["\'])?\s*[:=]\s*'
+                r'(?:&quot;|["\'])?)[^"\'&,}\s<]+', re.IGNORECASE), r'\g<1>SANITIZED'),
+    (re.compile(r'(data-(?:userinfo|loyalty_webapi_token|store_user_config)=")[^"]*(")'), r'\g<1>{}\g<2>'),
+    (re.compile(r'(nonce=")[^"]*(")'), r'\g<1>SANITIZED\g<2>'),
+    (re.compile(r'[\w.+-]+@[\w-]+\.[\w.-]+'), 'user@example.com'),
+]
+PERSONA_RE = re.compile(r'class="persona[^"]*"[^>]*>([^<]+)<', re.IGNORECASE)
+
+
+def sanitize(html: str) -> str:
+    # el nombre de la cuenta aparece en varios sitios: se sustituye en todos
+    names = {m.group(1).strip() for m in PERSONA_RE.finditer(html) if m.group(1).strip()}
+    for name in sorted(names, key=len, reverse=True):
+        html = html.replace(name, "SanitizedUser")
+    for pattern, repl in SANITIZE:
+        html = pattern.sub(repl, html)
+    return html
+
+
+def fetch(cookie: str) -> str:
+    client = gp.HttpClient()
+    client.set_cookie('steamLoginSecure', cookie)
+    resp = client.get(gp.TEST_RICH_URL, timeout=15)
+    if resp.status_code != 200 or "login" in resp.url.lower():
+        raise SystemExit(f"Steam respondió {resp.status_code} ({resp.url}): ¿cookie caducada?")
+    return resp.text
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("name", help="caso que muestra la página (p. ej. group, solo, none)")
+    ap.add_argument("--cookie", default=None, help="steamLoginSecure (por defecto STEAM_COOKIE)")
+    ap.add_argument("--from-file", type=Path, default=None, help="página guardada desde el navegador")
+    args = ap.parse_args()
+
+    if args.from_file:
+        html = args.from_file.read_text(encoding="utf-8", errors="replace")
+    else:
+        cookie = args.cookie or os.getenv("STEAM_COOKIE")
+        if not cookie:
+            raise SystemExit("Falta la cookie: --cookie o STEAM_COOKIE en el .env")
+        html = fetch(cookie)
+
+    clean = sanitize(html)
+    if not gp.SteamPresenceParser.RESULT_RE.search(clean):
+        raise SystemExit("La página no tiene 'Localized Rich Presence Result': ¿sesión iniciada?")
+    CAPTURED.mkdir(parents=True, exist_ok=True)
+    out = CAPTURED / f"rp_{args.name}.html"
+    out.write_text(clean, encoding="utf-8")
+    rich, group = gp.SteamScraper(None, "").parse(clean)
+    print(json.dumps({"fixture": str(out.relative_to(ROOT)), "bytes": len(clean),
+                      "rich_presence": rich, "group_size": group}, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Servidor IPC de Discord de mentira (socket Unix) para benchmarks y pruebas
+manuales en Linux. Habla el mismo framing que pypresence (cabecera '<II'
+op/longitud + JSON), responde al handshake con READY y a SET_ACTIVITY con el
+mismo nonce, y registra cada actividad recibida.
+
+Con rate_limit=(n, segundos) imita el límite de Discord: las actividades que
+superan n por ventana se responden igual pero se marcan como descartadas
+(Discord las ignora sin avisar).
+
+Uso (servidor suelto):
+    python bench/fake_discord_ipc.py [--dir /tmp/fake-discord]
+
+Desde código:
+    with FakeDiscordIPC() as server:
+        os.environ["XDG_RUNTIME_DIR"] = server.runtime_dir
+        ...
+"""
+import argparse
+import json
+import os
+import socket
+import struct
+import tempfile
+import threading
+import time
+from collections import deque
+
+OP_HANDSHAKE, OP_FRAME, OP_CLOSE = 0, 1, 2
+
+
+class FakeDiscordIPC:
+    def __init__(self, runtime_dir=None, pipe: int = 0, rate_limit=None, clock=time.monotonic):
+        self._owns_dir = runtime_dir is None
+        self.runtime_dir = runtime_dir or tempfile.mkdtemp(prefix="fake-discord-")
+        self.path = os.path.join(self.runtime_dir, f"discord-ipc-{pipe}")
+        self.rate_limit = rate_limit
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._sock = None
+        self._thread = None
+        self._conns = set()
+        self._window = deque()
+        self.handshakes = []
+        self.activities = []
+        self.dropped = []
+        self.clears = 0
+        self.refuse_handshake = False
+
+    # ---- ciclo de vida ----
+    def start(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.bind(self.path)
+        self._sock.listen(8)
+        self._thread = threading.Thread(target=self._accept_loop, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        sock, self._sock = self._sock, None
+        if sock:
+            try:
+                sock.close()
+            except OSError:
+                pass
+        self.drop_connections()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+        if self._owns_dir:
+            try:
+                os.rmdir(self.runtime_dir)
+            except OSError:
+                pass
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def drop_connections(self) -> int:
+        """Cierra todas las conexiones abiertas (simula reinicio de Discord)."""
+        with self._lock:
+            conns, self._conns = list(self._conns), set()
+        for conn in conns:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            try:
+                conn.close()
+            except OSError:
+                pass
+        return len(conns)
+
+    # ---- estado ----
+    @property
+    def current_activity(self):
+        with self._lock:
+            return self.activities[-1]["activity"] if self.activities else None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "handshakes": len(self.handshakes),
+                "activities": len(self.activities),
+                "clears": self.clears,
+                "rate_dropped": len(self.dropped),
+                "open_connections": len(self._conns),
+            }
+
+    # ---- protocolo ----
+    def _accept_loop(self):
+        while self._sock is not None:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    @staticmethod
+    def _recv_exact(conn, n: int) -> bytes:
+        buf = b""
+        while len(buf) < n:
+            chunk = conn.recv(n - len(buf))
+            if not chunk:
+                raise ConnectionError("closed")
+            buf += chunk
+        return buf
+
+    @staticmethod
+    def _send(conn, op: int, payload: dict):
+        body = json.dumps(payload).encode("utf-8")
+        conn.sendall(struct.pack("<II", op, len(body)) + body)
+
+    def _serve(self, conn):
+        client_id = None
+        try:
+            while True:
+                op, length = struct.unpack("<II", self._recv_exact(conn, 8))
+                data = json.loads(self._recv_exact(conn, length) or b"{}")
+                if op == OP_HANDSHAKE:
+                    if self.refuse_handshake:
+                        return
+                    client_id = data.get("client_id")
+                    with self._lock:
+                        self._conns.add(conn)
+                        self.handshakes.append({"at": self._clock(), "client_id": client_id})
+                    self._send(conn, OP_FRAME, {
+                        "cmd": "DISPATCH", "evt": "READY", "nonce": None,
+                        "data": {"v": 1, "user": {"id": "0", "username": "fake"}},
+                    })
+                elif op == OP_FRAME:
+                    self._on_frame(conn, client_id, data)
+                elif op == OP_CLOSE:
+                    return
+        except (ConnectionError, OSError, struct.error, ValueError):
+            return
+        finally:
+            with self._lock:
+                self._conns.discard(conn)
+            try:
+                conn.close()
+            except OSError:
+                pass
+
+    def _on_frame(self, conn, client_id, data: dict):
+        cmd = data.get("cmd")
+        nonce = data.get("nonce")
+        args = data.get("args") or {}
+        if cmd != "SET_ACTIVITY":
+            self._send(conn, OP_FRAME, {"cmd": cmd, "evt": None, "nonce": nonce, "data": {}})
+            return
+        activity = args.get("activity")
+        now = self._clock()
+        with self._lock:
+            entry = {"at": now, "client_id": client_id, "activity": activity}
+            if self._over_limit(now):
+                self.dropped.append(entry)
+            elif activity is None:
+                self.clears += 1
+                self.activities.append(entry)
+            else:
+                self.activities.append(entry)
+        self._send(conn, OP_FRAME, {"cmd": cmd, "evt": None, "nonce": nonce, "data": activity})
+
+    def _over_limit(self, now: float) -> bool:
+        if not self.rate_limit:
+            return False
+        count, per = self.rate_limit
+        while self._window and now - self._window[0] >= per:
+            self._window.popleft()
+        if len(self._window) >= count:
+            return True
+        self._window.append(now)
+        return False
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--dir", default=None, help="directorio donde crear discord-ipc-0")
+    ap.add_argument("--rate", default=None, help="límite n/segundos, p.ej. 5/20")
+    args = ap.parse_args()
+    rate = None
+    if args.rate:
+        n, per = args.rate.split("/")
+        rate = (int(n), float(per))
+    with FakeDiscordIPC(args.dir, rate_limit=rate) as server:
+        print(f"Escuchando en {server.path} (XDG_RUNTIME_DIR={server.runtime_dir})")
+        try:
+            while True:
+                time.sleep(5)
+                print(json.dumps(server.stats()))
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
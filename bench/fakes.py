@@ -0,0 +1,225 @@
+"""
+Dobles para ejecutar geforce_presence en un Linux cualquiera (benchmarks):
+- install_platform_stubs(): módulos de Windows / GUI que no se pueden importar
+  (winreg, pywin32, pystray, tkinter, selenium...) se sustituyen por módulos
+  vacíos con lo mínimo que toca el import; lo que sí se importa no se toca
+- make_sandbox(): copia del módulo en un directorio temporal con su propio
+  config/, logs/, .env y TMPDIR, para no ensuciar el checkout
+- FakeProcessTable, FakeSteamSession, FakePopen: tabla de procesos, HTTP de
+  Steam (páginas de bench/fixtures) y lanzamiento de dumb.exe
+El IPC de Discord es fake_discord_ipc.FakeDiscordIPC con pypresence real.
+"""
+import importlib.util
+import itertools
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from unittest import mock
+
+BENCH_DIR = Path(__file__).resolve().parent
+ROOT = BENCH_DIR.parent
+FIXTURES = BENCH_DIR / "fixtures"
+
+# módulos que geforce_presence usa (casi todos de forma diferida, ver LazyModule) y que solo
+# existen (o solo funcionan) en Windows/escritorio
+PLATFORM_MODULES = [
+    "winreg",
+    "win32gui", "win32process", "win32con", "win32api",
+    "tkinter", "tkinter.filedialog", "tkinter.messagebox",
+    "pystray",
+    "PIL", "PIL.Image", "PIL.ImageDraw",
+    "browser_cookie3",
+    "selenium", "selenium.webdriver", "selenium.common", "selenium.common.exceptions",
+    "selenium.webdriver.edge", "selenium.webdriver.edge.options", "selenium.webdriver.edge.service",
+    "dotenv",
+]
+
+
+def _stub(name: str):
+    module = mock.MagicMock(name=name)
+    module.__name__ = name
+    module.__spec__ = None
+    if name == "winreg":
+        def _missing(*args, **kwargs):
+            raise FileNotFoundError("winreg no disponible (stub)")
+        module.OpenKey.side_effect = _missing
+        module.CreateKey.side_effect = _missing
+    elif name == "selenium.common.exceptions":
+        module.WebDriverException = type("WebDriverException", (Exception,), {})
+    return module
+
+
+def install_platform_stubs() -> list:
+    """Sustituye los módulos de plataforma que no importan. Devuelve los sustituidos."""
+    stubbed = []
+    for name in PLATFORM_MODULES:
+        if name in sys.modules:
+            continue
+        try:
+            __import__(name)
+        except Exception:
+            sys.modules[name] = _stub(name)
+            parent, _, child = name.rpartition(".")
+            if parent and parent in sys.modules:
+                setattr(sys.modules[parent], child, sys.modules[name])
+            stubbed.append(name)
+    return stubbed
+
+
+def make_sandbox(catalog: Path, env: dict = None) -> Path:
+    """
+    Directorio temporal con src/geforce_presence.py, config/ con el catálogo
+    indicado y TMPDIR/XDG_RUNTIME_DIR propios. Debe llamarse antes del import.
+    """
+    base = Path(tempfile.mkdtemp(prefix="gfn-bench-"))
+    (base / "src").mkdir()
+    shutil.copy2(ROOT / "src" / "geforce_presence.py", base / "src" / "geforce_presence.py")
+    for name in ("lang", "assets"):
+        if (ROOT / name).exists():
+            shutil.copytree(ROOT / name, base / name)
+    (base / "config").mkdir()
+    shutil.copy2(catalog, base / "config" / "games_config_merged.json")
+    (base / "tools").mkdir()
+    (base / "tools" / "dumb.exe").write_bytes(b"MZ" + b"\0" * 4094)
+    tmp = base / "tmp"
+    tmp.mkdir()
+    os.environ["TMPDIR"] = str(tmp)
+    tempfile.tempdir = None
+    for key, value in (env or {}).items():
+        os.environ[key] = str(value)
+    return base
+
+
+def import_module(sandbox: Path):
+    spec = importlib.util.spec_from_file_location("geforce_presence", sandbox / "src" / "geforce_presence.py")
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["geforce_presence"] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+# ---------------- catálogos ----------------
+_WORDS = ("shadow", "legend", "empire", "star", "dungeon", "racing", "tactics", "blood", "frontier",
+          "kingdom", "hollow", "neon", "iron", "crystal", "storm", "rogue", "galaxy", "zero", "quest",
+          "dragon", "city", "night", "wild", "arena", "soul", "machine", "ocean", "tower", "forge", "echo")
+
+
+def synthetic_catalog(n: int, seed: int = 1) -> dict:
+    """n entradas con la forma de games_config_merged.json (nombres únicos)."""
+    rng = random.Random(seed)
+    out = {}
+    for i in range(n):
+        words = rng.sample(_WORDS, rng.randint(2, 4))
+        name = " ".join(w.capitalize() for w in words) + f" {i}"
+        out[name] = {
+            "name": name,
+            "steam_appid": 100000 + i if rng.random() < 0.8 else None,
+            "client_id": str(10 ** 17 + i) if rng.random() < 0.5 else None,
+            "executable_path": f"{'_'.join(words)}_{i}/bin/{words[0]}.exe" if rng.random() < 0.5 else None,
+            "cmsId": str(10 ** 8 + i),
+            "shortName": f"{'_'.join(words)}_{i}_gfn_pc",
+            "appStore": "steam",
+        }
+    return out
+
+
+def write_catalog(entries: dict, path: Path) -> Path:
+    with path.open("w", encoding="utf-8") as f:
+        json.dump(entries, f, ensure_ascii=False)
+    return path
+
+
+# ---------------- procesos ----------------
+class FakeProcessTable:
+    """Tabla de procesos fija (n procesos + GeForceNOW.exe) para ProcessSnapshot."""
+
+    def __init__(self, n: int = 300, gfn_running: bool = True):
+        self.created = {pid: 1_700_000_000.0 + pid for pid in range(1000, 1000 + n)}
+        self.names = {pid: f"proc{pid}.exe" for pid in self.created}
+        self.gfn_pid = 999
+        self.gfn_running = gfn_running
+        self.iterations = 0
+
+    def _table(self):
+        table = dict(self.names)
+        if self.gfn_running:
+            table[self.gfn_pid] = "GeForceNOW.exe"
+        return table
+
+    def iter_processes(self):
+        self.iterations += 1
+        for pid, name in self._table().items():
+            yield pid, name, self.created.get(pid, 1_700_000_000.0)
+
+    def pid_exists(self, pid: int) -> bool:
+        return pid in self._table()
+
+    def process_info(self, pid: int):
+        name = self._table().get(pid)
+        return None if name is None else (name, self.created.get(pid, 1_700_000_000.0))
+
+
+# ---------------- Steam HTTP ----------------
+class FakeResponse:
+    def __init__(self, status_code: int, text: str = "", url: str = "", headers: dict = None):
+        self.status_code = status_code
+        self.text = text
+        self.url = url
+        self.headers = headers or {}
+
+
+class FakeSteamSession:
+    """
+    Sustituye a SteamScraper.session: sirve las páginas de bench/fixtures en
+    rotación (cambiando cada `dwell` peticiones) y responde 304 cuando llegan
+    validadores de la página vigente.
+    """
+
+    def __init__(self, dwell: int = 4, latency: float = 0.0):
+        pages = sorted(FIXTURES.glob("rp_*.html"))
+        self.pages = [(p.name, p.read_text(encoding="utf-8")) for p in pages]
+        self.dwell = dwell
+        self.latency = latency
+        self.requests = 0
+        self.not_modified = 0
+        self.cookies = mock.MagicMock()
+
+    def get(self, url, headers=None, timeout=None):
+        idx = (self.requests // self.dwell) % len(self.pages)
+        self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+        name, html = self.pages[idx]
+        etag = f'"{name}"'
+        if headers and headers.get("If-None-Match") == etag:
+            self.not_modified += 1
+            return FakeResponse(304, url=url)
+        return FakeResponse(200, html, url=url, headers={"ETag": etag})
+
+
+# ---------------- ejecutables ----------------
+class FakePopen:
+    """Popen de mentira: no lanza nada, termina al primer terminate()/kill()."""
+    _pids = itertools.count(50000)
+
+    def __init__(self, args, cwd=None):
+        self.args = args
+        self.pid = next(self._pids)
+        self.returncode = None
+
+    def poll(self):
+        return self.returncode
+
+    def terminate(self):
+        self.returncode = 0
+
+    def kill(self):
+        self.returncode = -9
+
+    def wait(self, timeout=None):
+        return self.returncode
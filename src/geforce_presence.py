@@ -15,28 +15,100 @@ import subprocess
 import threading
 import time
 import stat
+import struct
+import mmap
+import unicodedata
+import heapq
+import bisect
+import random
+import queue
+import codecs
+import hashlib
 import asyncio
 import inspect
+import importlib
 from pathlib import Path
-import tkinter as tk
-from tkinter import filedialog, messagebox
-import winreg
+from urllib.parse import quote, urlsplit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
 import concurrent.futures
 import psutil
-import requests
-import browser_cookie3
 from dotenv import set_key
+from collections import Counter, deque
+from html.parser import HTMLParser
+from collections.abc import Mapping
 from logging.handlers import RotatingFileHandler
 from typing import Dict, Optional
-from bs4 import BeautifulSoup
-from pypresence import Presence
-from selenium import webdriver
-from selenium.common.exceptions import WebDriverException
-from selenium.webdriver.edge.options import Options
-from selenium.webdriver.edge.service import Service as EdgeService
-import pystray
-from PIL import Image, ImageDraw
+from pypresence import AioPresence, Presence
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    msgpack = None
+    MSGPACK_AVAILABLE = False
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    zstandard = None
+    ZSTD_AVAILABLE = False
+
+# ----------------- Platform layer -----------------
+class LazyModule:
+    """
+    Módulo pesado o de plataforma que se importa en el primer acceso a un atributo.
+    Si no existe (winreg fuera de Windows, tkinter sin Tk...) el acceso lanza
+    ImportError, que los llamadores ya tratan como cualquier otro fallo.
+    """
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+        self._error: Optional[BaseException] = None
+
+    def load(self):
+        if self._module is None:
+            if self._error is not None:
+                raise ImportError(f"{self._name} no disponible: {self._error}")
+            try:
+                self._module = importlib.import_module(self._name)
+            except Exception as e:
+                self._error = e
+                raise ImportError(f"{self._name} no disponible: {e}") from e
+        return self._module
+
+    def available(self) -> bool:
+        try:
+            self.load()
+            return True
+        except ImportError:
+            return False
+
+    @property
+    def loaded(self) -> bool:
+        return self._module is not None
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+    def __repr__(self):
+        state = "cargado" if self._module is not None else "diferido"
+        return f"<LazyModule {self._name} ({state})>"
+
+# GUI (tkinter / bandeja), registro de Windows, HTTP y lectura de cookies:
+# nada de esto hace falta para importar el módulo ni para el tick.
+# Selenium se importa solo dentro de CookieManager.get_cookie_with_selenium.
+tk = LazyModule("tkinter")
+filedialog = LazyModule("tkinter.filedialog")
+messagebox = LazyModule("tkinter.messagebox")
+winreg = LazyModule("winreg")
+requests = LazyModule("requests")
+browser_cookie3 = LazyModule("browser_cookie3")
+pystray = LazyModule("pystray")
+Image = LazyModule("PIL.Image")
+ImageDraw = LazyModule("PIL.ImageDraw")
+
+def tray_available() -> bool:
+    return pystray.available() and Image.available()
 
 logger = logging.getLogger("geforce_presence")
 logger.setLevel(logging.DEBUG)
@@ -47,7 +119,6 @@ LOCK_FILE = Path(tempfile.gettempdir()) / "geforce_presence.lock"
 # --- Globals para callbacks del tray ---
 PRESENCE_INSTANCE = None   # Se asigna en main() con PresenceManager
 COOKIE_MANAGER = None      # Se asigna en main() con CookieManager
-PYSTRAY_AVAILABLE = True
 _tray_icon = None
 _tray_thread = None
 _tray_stop_event = threading.Event()
@@ -60,7 +131,7 @@ def start_tray_icon(on_quit_callback, title="GeForceNOW Presence"):
         title = TEXTS.get('tray_title', title)
     except Exception:
         pass
-    if not PYSTRAY_AVAILABLE:
+    if not tray_available():
         logger.info("pystray/Pillow no disponibles; no se mostrará icono en bandeja.")
         return False
 
@@ -113,7 +184,7 @@ def start_tray_icon(on_quit_callback, title="GeForceNOW Presence"):
                 # 🔁 Refrescar presencia sin reiniciar el programa
                 if PRESENCE_INSTANCE is not None:
                     PRESENCE_INSTANCE.cookie_manager.env_cookie = val
-                    PRESENCE_INSTANCE.scraper = SteamScraper(val, PRESENCE_INSTANCE.test_rich_url)
+                    PRESENCE_INSTANCE.scraper.set_cookie(val)
                     logger.info("🔁 SteamScraper actualizado con nueva cookie.")
             else:
                 show_message("Error", "No se pudo obtener la cookie.", kind="error")
@@ -161,13 +232,18 @@ def start_tray_icon(on_quit_callback, title="GeForceNOW Presence"):
                     options.append((k, gm[k].get("client_id"), gm[k].get("executable_path")))
             else:
                 # Buscar en Discord
-                disc = PRESENCE_INSTANCE._find_discord_matches(game_name, max_candidates=5)
+                disc = PRESENCE_INSTANCE._find_discord_matches(game_name, max_candidates=5, block=False)
                 for c in disc:
                     options.append((c["name"], c["id"], c.get("exe")))
                     PRESENCE_INSTANCE._apply_discord_match(game_name, c)
 
             if not options:
-                show_message("Info", "Sin coincidencias en JSON ni Discord.")
+                if not candidates and DISCORD_APPS_CACHE.apps is None:
+                    # caché fría: la lista se descarga en el pool, no es que no haya coincidencias
+                    show_message("Info", "La lista de juegos de Discord aún se está descargando. "
+                                         "Vuelve a intentarlo en unos segundos.")
+                else:
+                    show_message("Info", "Sin coincidencias en JSON ni Discord.")
                 root.destroy()
                 return
 
@@ -214,39 +290,17 @@ def start_tray_icon(on_quit_callback, title="GeForceNOW Presence"):
 
             # --- Aplicar selección ---
             name, cid, exe = sel["v"]
-            
-            if cid:
-                # Desconectamos RPC temporalmente antes de forzar el nuevo juego
-                try:
-                    def reconnect_after_delay():
-                        time.sleep(11)  # esperar 11 segundos (intervalo desfasado)
-                    PRESENCE_INSTANCE.rpc.close()
-                    logger.info("📴 RPC desconectado temporalmente (modo forzar juego).")
-                except Exception:
-                    pass
-
-                try:
-                    PRESENCE_INSTANCE.client_id = cid
-                    PRESENCE_INSTANCE._connect_rpc(cid)
-                    logger.info(f"🔁 RPC reconectado con client_id forzado: {cid}")
-                except Exception as e:
-                    logger.error(f"❌ Error reconectando RPC tras forzar juego: {e}")
-                    threading.Thread(target=reconnect_after_delay, daemon=True).start()
-
-            if exe:
-                try:
-                    PRESENCE_INSTANCE.close_fake_executable()
-                except Exception as e:
-                    logger.debug(f"No se pudo cerrar ejecutable previo: {e}")
-                PRESENCE_INSTANCE.launch_fake_executable(exe)
-
             PRESENCE_INSTANCE.forced_game = {
                 "name": name,
                 "client_id": cid,
                 "executable_path": exe
             }
             PRESENCE_INSTANCE.last_game = dict(PRESENCE_INSTANCE.forced_game)
+            # directo en este hilo (el del tray): la elección del usuario no pasa por la
+            # cola del pool, donde podría descartarse o de-duplicarse con un forzado anterior
+            PRESENCE_INSTANCE._apply_forced_game(cid, exe)
             logger.info(f"🎮 Juego forzado activado: {name} (id={cid})")
+            refresh_tray_menu()
 
             show_message("OK", f"Juego forzado: {name}", kind="info")
 
@@ -286,16 +340,6 @@ def start_tray_icon(on_quit_callback, title="GeForceNOW Presence"):
         logger.error(f"No se pudo crear Icon pystray: {e}")
         return False
 
-    # Función para actualizar el menú periódicamente
-    def update_menu_periodically():
-        while not _tray_stop_event.is_set():
-            try:
-                if _tray_icon:
-                    _tray_icon.update_menu()
-            except Exception as e:
-                logger.debug(f"Error actualizando menú: {e}")
-            time.sleep(2)  # Actualizar cada 2 segundos
-
     # doble-click (si backend lo soporta)
     try:
         listener = getattr(icon, "_listener", None)
@@ -313,11 +357,6 @@ def start_tray_icon(on_quit_callback, title="GeForceNOW Presence"):
     _tray_icon = icon
     _tray_thread = threading.Thread(target=run_icon, daemon=True)
     _tray_thread.start()
-    
-    # Iniciar hilo para actualizar el menú periódicamente
-    menu_updater_thread = threading.Thread(target=update_menu_periodically, daemon=True)
-    menu_updater_thread.start()
-    
     return True
 def cleanup_orphaned_windows():
     """Intentar limpiar ventanas huérfanas de tkinter"""
@@ -345,14 +384,41 @@ LOG_FILE = LOGS_DIR / "geforce_presence.log"
 ENV_PATH = resource_path(".env")
 DISCORD_DETECTABLE_URL = "https://discord.com/api/v9/applications/detectable"
 DISCORD_CACHE_PATH = CONFIG_DIR / "discord_apps_cache.json"
+DISCORD_COMPACT_CACHE_PATH = CONFIG_DIR / "discord_apps_cache.msgpack"
 DISCORD_CACHE_TTL = 60 * 60
+DISCORD_RETRY_DELAY = 5 * 60
+DISCORD_INDEX_PATH = CONFIG_DIR / "discord_apps_index.msgpack"
+DISCORD_MIN_SCORE = 0.35
 DISCORD_AUTO_APPLY_THRESHOLD = 0.88  
 DISCORD_ASK_TIMEOUT = 30  
+DUMB_EXE_PATH = BASE_DIR / "tools" / "dumb.exe"
+FAKE_GAME_DIR = Path(tempfile.gettempdir()) / "discord_fake_game"
+FAKE_EXEC_STATE_PATH = CONFIG_DIR / "fake_executables.json"
+FAKE_EXEC_KEEP_RECENT = 8
+FAKE_EXEC_STOP_DEADLINE = 2.0
+STEAM_APPID_CACHE_PATH = CONFIG_DIR / "steam_appids.json"
+STEAM_APPID_NEGATIVE_TTL = 24 * 60 * 60
+STEAM_APPID_RETRY_DELAY = 5 * 60
 DEFAULT_ENV_CONTENT = """CLIENT_ID = '1095416975028650046'
 UPDATE_INTERVAL = 10
 CONFIG_PATH_FILE = ''
 TEST_RICH_URL = 'https://steamcommunity.com/dev/testrichpresence'
 STEAM_COOKIE=''
+TICK_ABSENT_INTERVAL = 30
+TICK_FAST_INTERVAL = 2
+TICK_FAST_WINDOW = 30
+STEAM_MAX_STALENESS = 30
+RPC_UPDATE_BURST = 5
+RPC_UPDATE_PERIOD = 20
+RPC_BACKOFF_BASE = 1
+RPC_BACKOFF_MAX = 60
+METRICS_PORT = 0
+TRANSITION_ENTER_DELAY = 3
+TRANSITION_SWITCH_DELAY = 5
+TRANSITION_LIBRARY_GRACE = 45
+WORKER_POOL_SIZE = 2
+WORKER_QUEUE_MAX = 16
+WORKER_DROP_POLICY = 'drop_oldest'
 """
 
 def get_lang_from_registry(default="en"):
@@ -436,8 +502,6 @@ try:
 except Exception:
     logger.debug("python-dotenv no disponible o .env no encontrado; usando variables de entorno del sistema")
 
-import tkinter as tk
-
 def ask_game_name(parent=None, title="Forzar juego", message="Nombre del juego:"):
     if parent:
         # Ocultar el padre completamente durante el diálogo
@@ -606,6 +670,11 @@ def show_message(title: str, message: str, kind: str = "info") -> None:
     
     return result
 def ensure_driver_executable(src_path: Path) -> str:
+    """
+    Copia msedgedriver a temp (el de recursos puede estar en una carpeta de solo
+    lectura o dentro del bundle). Si la copia ya coincide en tamaño y fecha no
+    se vuelve a copiar; la copia nueva se escribe aparte y se renombra.
+    """
     try:
         if not src_path.exists():
             logger.warning(f"msedgedriver no encontrado en recursos: {src_path}")
@@ -613,18 +682,35 @@ def ensure_driver_executable(src_path: Path) -> str:
         tmpdir = Path(tempfile.gettempdir()) / "geforce_driver"
         tmpdir.mkdir(parents=True, exist_ok=True)
         dest = tmpdir / src_path.name
-        shutil.copy2(str(src_path), str(dest))
+        src_st = src_path.stat()
         try:
-            dest.chmod(dest.stat().st_mode | stat.S_IEXEC)
+            dst_st = dest.stat()
+            if dst_st.st_size == src_st.st_size and abs(dst_st.st_mtime - src_st.st_mtime) < 2:
+                return str(dest)
+        except FileNotFoundError:
+            pass
+        tmp = dest.with_name(f"{dest.name}.{os.getpid()}.tmp")
+        shutil.copy2(str(src_path), str(tmp))
+        try:
+            tmp.chmod(tmp.stat().st_mode | stat.S_IEXEC)
         except Exception:
             pass
+        os.replace(tmp, dest)
+        logger.debug(f"msedgedriver preparado en {dest}")
         return str(dest)
     except Exception as e:
         logger.error(f"Error preparando msedgedriver: {e}")
         return str(src_path)
 
-driver_exec = ensure_driver_executable(Path(driver_path))
-service = EdgeService(executable_path=str(driver_exec))
+_edge_service = None
+
+def edge_driver_service():
+    """Service de Selenium para Edge; msedgedriver se prepara la primera vez que se pide."""
+    global _edge_service
+    if _edge_service is None:
+        from selenium.webdriver.edge.service import Service as EdgeService
+        _edge_service = EdgeService(executable_path=ensure_driver_executable(Path(driver_path)))
+    return _edge_service
 TEST_RICH_URL = os.getenv("TEST_RICH_URL", "").strip()
 CLIENT_ID = os.getenv("CLIENT_ID", "").strip() or None
 STEAM_COOKIE_ENV = os.getenv("STEAM_COOKIE", "").strip() or None
@@ -632,6 +718,23 @@ STEAM_COOKIE_ENV = os.getenv("STEAM_COOKIE", "").strip() or None
 CONFIG_PATH_FILE = CONFIG_DIR / "config_path.txt"
 
 UPDATE_INTERVAL = int(os.getenv("UPDATE_INTERVAL", "10"))
+TICK_ABSENT_INTERVAL = float(os.getenv("TICK_ABSENT_INTERVAL", "30"))
+TICK_FAST_INTERVAL = float(os.getenv("TICK_FAST_INTERVAL", "2"))
+TICK_FAST_WINDOW = float(os.getenv("TICK_FAST_WINDOW", "30"))
+STEAM_POLL_INTERVAL = float(os.getenv("STEAM_POLL_INTERVAL", str(UPDATE_INTERVAL)))
+STEAM_MAX_STALENESS = float(os.getenv("STEAM_MAX_STALENESS", "30"))
+RPC_UPDATE_BURST = int(os.getenv("RPC_UPDATE_BURST", "5"))
+RPC_UPDATE_PERIOD = float(os.getenv("RPC_UPDATE_PERIOD", "20"))
+RPC_BACKOFF_BASE = float(os.getenv("RPC_BACKOFF_BASE", "1"))
+RPC_BACKOFF_MAX = float(os.getenv("RPC_BACKOFF_MAX", "60"))
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0") or 0)
+METRICS_BIND = os.getenv("METRICS_BIND", "127.0.0.1").strip() or "127.0.0.1"
+TRANSITION_ENTER_DELAY = float(os.getenv("TRANSITION_ENTER_DELAY", "3"))
+TRANSITION_SWITCH_DELAY = float(os.getenv("TRANSITION_SWITCH_DELAY", "5"))
+TRANSITION_LIBRARY_GRACE = float(os.getenv("TRANSITION_LIBRARY_GRACE", "45"))
+WORKER_POOL_SIZE = int(os.getenv("WORKER_POOL_SIZE", "2"))
+WORKER_QUEUE_MAX = int(os.getenv("WORKER_QUEUE_MAX", "16"))
+WORKER_DROP_POLICY = os.getenv("WORKER_DROP_POLICY", "drop_oldest").strip().lower() or "drop_oldest"
 
 
 def acquire_lock() -> bool:
@@ -699,12 +802,23 @@ def save_cookie_to_env(cookie_value: str):
     except Exception as e:
         logger.error(f"❌ Error guardando cookie en .env: {e}")
 
-def save_json(obj, path: Path):
+def save_json(obj, path: Path) -> bool:
+    """Escribe el JSON en un temporal del mismo directorio y lo renombra (atómico). True si quedó escrito."""
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
     try:
-        with path.open("w", encoding="utf-8") as f:
+        with tmp.open("w", encoding="utf-8") as f:
             json.dump(obj, f, indent=4, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        return True
     except Exception as e:
         logger.error(f"Error guardando JSON {path}: {e}")
+        try:
+            tmp.unlink()
+        except Exception:
+            pass
+        return False
 
 # ----------------- Notifications -----------------
 def notify_background(message=None, title=None, timeout=5):
@@ -770,9 +884,24 @@ def _create_default_icon_image(size=64):
     return img
 
 
+def refresh_tray_menu():
+    """
+    Redibuja el menú del tray (texto de Force game). Se llama directamente: pystray
+    reconstruye el menú en su propio hilo de UI y la llamada es barata, así que ningún
+    cambio se pierde por deduplicado o descarte del pool.
+    """
+    icon = _tray_icon
+    if icon is None:
+        return
+    try:
+        icon.update_menu()
+    except Exception as e:
+        logger.debug(f"Error actualizando menú: {e}")
+
+
 def stop_tray_icon():
     global _tray_icon, _tray_thread
-    _tray_stop_event.set()  # Detener el hilo de actualización
+    _tray_stop_event.set()
     try:
         if _tray_icon:
             try:
@@ -783,14 +912,359 @@ def stop_tray_icon():
     except Exception:
         pass
 
+# ----------------- Process snapshot -----------------
+def _psutil_iter_processes():
+    for proc in psutil.process_iter(attrs=['pid', 'name', 'create_time']):
+        info = proc.info
+        yield info['pid'], info.get('name') or "", info.get('create_time') or 0.0
+
+def _psutil_process_info(pid: int) -> Optional[tuple[str, float]]:
+    try:
+        p = psutil.Process(pid)
+        return p.name(), p.create_time()
+    except Exception:
+        return None
+
+def _psutil_create_time(pid: int) -> Optional[float]:
+    try:
+        return psutil.Process(pid).create_time()
+    except Exception:
+        return None
+
+class ProcessSnapshot:
+    """
+    Una sola pasada por la tabla de procesos por tick: caché pid -> nombre validada
+    por create_time y PID de GeForce NOW rastreado (comprobación O(1) con pid_exists).
+    Las funciones de acceso al sistema se pueden inyectar para pruebas.
+    """
+    GEFORCE_MARKER = "geforcenow"
+
+    def __init__(self, iter_processes=None, pid_exists=None, process_info=None, create_time=None,
+                 max_age: float = 1.0):
+        self._iter_processes = iter_processes or _psutil_iter_processes
+        self._pid_exists = pid_exists or psutil.pid_exists
+        self._process_info = process_info or _psutil_process_info
+        # con process_info inyectado, el create_time se saca de él
+        self._create_time = create_time or (_psutil_create_time if process_info is None else None)
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._table: Dict[int, tuple[str, float]] = {}   # pid -> (nombre en minúsculas, create_time)
+        self._taken_at = 0.0
+        self.gfn_pid: Optional[int] = None
+        self._gfn_create_time: Optional[float] = None
+        self.snapshots_taken = 0
+
+    def begin_tick(self):
+        """Invalida la instantánea: la próxima consulta que la necesite hará una pasada nueva."""
+        with self._lock:
+            self._taken_at = 0.0
+
+    def refresh(self) -> Dict[int, tuple[str, float]]:
+        table = {}
+        gfn = None
+        try:
+            for pid, name, create_time in self._iter_processes():
+                name = (name or "").lower()
+                table[pid] = (name, create_time)
+                if gfn is None and self.GEFORCE_MARKER in name:
+                    gfn = (pid, create_time)
+        except Exception as e:
+            logger.debug(f"Error comprobando procesos: {e}")
+        with self._lock:
+            self._table = table
+            self._taken_at = time.monotonic()
+            self.snapshots_taken += 1
+            if gfn is not None:
+                self.gfn_pid, self._gfn_create_time = gfn
+            elif self.gfn_pid is not None and self.gfn_pid not in table:
+                self.gfn_pid = self._gfn_create_time = None
+        return table
+
+    def snapshot(self) -> Dict[int, tuple[str, float]]:
+        with self._lock:
+            if time.monotonic() - self._taken_at <= self.max_age:
+                return self._table
+        return self.refresh()
+
+    def create_time_of(self, pid: int) -> Optional[float]:
+        """create_time del proceso (identifica el pid frente a reutilizaciones) o None si no existe."""
+        if self._create_time is not None:
+            return self._create_time(pid)
+        info = self._process_info(pid)
+        return info[1] if info is not None else None
+
+    def name_of(self, pid: int, create_time: Optional[float] = None) -> Optional[str]:
+        """
+        Nombre (minúsculas) del proceso; usa la instantánea si es reciente o el create_time coincide.
+        Con create_time conocido, solo vale la entrada de ese mismo proceso.
+        """
+        with self._lock:
+            entry = self._table.get(pid)
+            fresh = time.monotonic() - self._taken_at <= self.max_age
+        if entry is not None and (entry[1] == create_time if create_time is not None else fresh):
+            return entry[0]
+        info = self._process_info(pid)
+        if info is None:
+            return None
+        name, create_time = (info[0] or "").lower(), info[1]
+        if entry is not None and entry[1] == create_time:
+            return entry[0]
+        with self._lock:
+            self._table[pid] = (name, create_time)
+        return name
+
+    def any_name(self, predicate) -> bool:
+        return any(predicate(name) for name, _ in self.snapshot().values())
+
+    def is_geforce_running(self) -> bool:
+        pid = self.gfn_pid
+        if pid is not None and self._pid_exists(pid):
+            info = self._process_info(pid)
+            if info is not None and info[1] == self._gfn_create_time:
+                return True
+        with self._lock:
+            self.gfn_pid = self._gfn_create_time = None
+        self.refresh()
+        return self.gfn_pid is not None
+
+PROCESSES = ProcessSnapshot()
+
+# ----------------- HTTP client -----------------
+STEAM_COOKIE_DOMAIN = "steamcommunity.com"
+
+class HttpClient:
+    """
+    Cliente HTTP compartido por Steam y Discord: una sola requests.Session con
+    un pool de conexiones keep-alive por host, Accept-Encoding con todo lo que
+    urllib3 sabe descomprimir (br / zstd si están instalados) y tiempos por host.
+    La sesión se crea en la primera petición (requests se importa en diferido).
+    Las cookies se cambian en el jar de la sesión, sin tocar las conexiones.
+    """
+    def __init__(self, pool_hosts: int = 4, pool_size: int = 4, timeout: float = 10, clock=time.perf_counter):
+        self.pool_hosts = pool_hosts
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._session = None
+        self._hosts: Dict[str, dict] = {}
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = self._new_session()
+        return self._session
+
+    def _new_session(self):
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.request import ACCEPT_ENCODING
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_hosts, pool_maxsize=self.pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers["Accept-Encoding"] = ", ".join(e.strip() for e in ACCEPT_ENCODING.split(","))
+        logger.debug(f"Sesión HTTP creada (Accept-Encoding: {session.headers['Accept-Encoding']})")
+        return session
+
+    def get(self, url: str, headers: Optional[dict] = None, timeout: Optional[float] = None,
+            stream: bool = False, cookies: Optional[dict] = None):
+        """
+        GET por el pool compartido. Con cookies=... la petición lleva solo esas
+        cookies (p. ej. validar una cookie candidata): va directa al adaptador,
+        sin las cookies de la sesión, sin seguir redirecciones y sin guardar
+        lo que devuelva Set-Cookie. El tiempo medido es hasta recibir las cabeceras.
+        """
+        session = self.session
+        timeout = self.timeout if timeout is None else timeout
+        host = urlsplit(url).hostname or ""
+        t0 = self._clock()
+        ok = False
+        try:
+            if cookies is None:
+                resp = session.get(url, headers=headers, timeout=timeout, stream=stream)
+            else:
+                req = requests.Request("GET", url, headers={**session.headers, **(headers or {})}, cookies=cookies)
+                # mismos proxies/verify que session.get: si no, urllib3 abre otro pool
+                settings = session.merge_environment_settings(url, {}, stream, None, None)
+                resp = session.get_adapter(url).send(req.prepare(), timeout=timeout, **settings)
+            ok = True
+            return resp
+        finally:
+            self._record(host, self._clock() - t0, ok)
+
+    def _record(self, host: str, seconds: float, ok: bool):
+        with self._lock:
+            entry = self._hosts.get(host)
+            if entry is None:
+                entry = self._hosts[host] = {"requests": 0, "errors": 0, "seconds": 0.0, "max_s": 0.0, "last_s": None}
+            entry["requests"] += 1
+            entry["seconds"] += seconds
+            entry["max_s"] = max(entry["max_s"], seconds)
+            entry["last_s"] = seconds
+            if not ok:
+                entry["errors"] += 1
+        if METRICS is not None:
+            METRICS.observe(f"http:{host}", seconds)
+
+    def set_cookie(self, name: str, value: Optional[str], domain: str = STEAM_COOKIE_DOMAIN):
+        """Sustituye (o borra, con value=None) la cookie en el jar compartido."""
+        jar = self.session.cookies
+        try:
+            jar.clear(domain, "/", name)
+        except KeyError:
+            pass
+        if value:
+            jar.set(name, value, domain=domain, path="/")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {host: dict(entry) for host, entry in self._hosts.items()}
+
+HTTP = HttpClient()
+
+# ----------------- Worker pool -----------------
+class WorkerPool:
+    """
+    Pool acotado para el trabajo de fondo (match de Discord, staging de
+    ejecutables falsos, refresco del menú del tray...): como mucho `workers`
+    hilos, creados al primer trabajo, y una cola de `max_queue` trabajos.
+    - submit(key, fn, ...): un trabajo por clave a la vez; si la misma clave
+      ya está en cola o en ejecución, se descarta (deduped)
+    - con la cola llena, policy="drop_oldest" descarta el trabajo más antiguo
+      en cola y policy="reject" descarta el nuevo
+    stats() expone profundidad de cola, hilos ocupados y descartes.
+    """
+    POLICIES = ("drop_oldest", "reject")
+
+    def __init__(self, workers: int = WORKER_POOL_SIZE, max_queue: int = WORKER_QUEUE_MAX,
+                 policy: str = WORKER_DROP_POLICY, name: str = "worker"):
+        if policy not in self.POLICIES:
+            logger.warning(f"⚠️ Política de descarte desconocida '{policy}', usando drop_oldest")
+            policy = "drop_oldest"
+        self.workers = max(1, int(workers))
+        self.max_queue = max(1, int(max_queue))
+        self.policy = policy
+        self.name = name
+        self._cond = threading.Condition()
+        self._queue = deque()  # (key, fn, args, kwargs)
+        self._keys = set()  # claves en cola o en ejecución
+        self._threads = []
+        self._idle = 0
+        self._busy = 0
+        self._stopping = False
+        self.submitted = 0
+        self.deduped = 0
+        self.dropped = 0
+        self.completed = 0
+        self.failed = 0
+        self.high_water = 0
+
+    def submit(self, key, fn, *args, **kwargs) -> bool:
+        """Encola fn(*args, **kwargs). False si se descartó (clave repetida, cola llena o pool parado)."""
+        with self._cond:
+            if self._stopping:
+                return False
+            if key is not None and key in self._keys:
+                self.deduped += 1
+                return False
+            if len(self._queue) >= self.max_queue:
+                self.dropped += 1
+                if self.policy == "reject":
+                    logger.debug(f"Cola de {self.name} llena: descartado {key!r}")
+                    return False
+                old_key = self._queue.popleft()[0]
+                self._keys.discard(old_key)
+                logger.debug(f"Cola de {self.name} llena: descartado {old_key!r}")
+            self._queue.append((key, fn, args, kwargs))
+            if key is not None:
+                self._keys.add(key)
+            self.submitted += 1
+            self.high_water = max(self.high_water, len(self._queue))
+            if self._idle == 0 and len(self._threads) < self.workers:
+                t = threading.Thread(target=self._work, name=f"{self.name}-{len(self._threads)}", daemon=True)
+                self._threads.append(t)
+                t.start()
+            else:
+                self._cond.notify()
+        return True
+
+    def pending(self, key) -> bool:
+        with self._cond:
+            return key in self._keys
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._stopping:
+                    self._idle += 1
+                    self._cond.wait()
+                    self._idle -= 1
+                if self._stopping:
+                    return
+                key, fn, args, kwargs = self._queue.popleft()
+                self._busy += 1
+            ok = False
+            try:
+                fn(*args, **kwargs)
+                ok = True
+            except Exception as e:
+                logger.debug(f"Trabajo {key!r} de {self.name} falló: {e}")
+            finally:
+                with self._cond:
+                    self._busy -= 1
+                    self._keys.discard(key)
+                    if ok:
+                        self.completed += 1
+                    else:
+                        self.failed += 1
+                    self._cond.notify_all()
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """Espera a que no quede nada en cola ni en ejecución. False si vence el plazo."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._queue or self._busy:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def stop(self):
+        """Descarta lo que quede en cola; los trabajos en curso terminan solos (hilos daemon)."""
+        with self._cond:
+            self._stopping = True
+            self.dropped += len(self._queue)
+            self._queue.clear()
+            self._keys.clear()
+            self._cond.notify_all()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "workers": len(self._threads),
+                "max_workers": self.workers,
+                "busy": self._busy,
+                "queued": len(self._queue),
+                "max_queue": self.max_queue,
+                "policy": self.policy,
+                "high_water": self.high_water,
+                "submitted": self.submitted,
+                "deduped": self.deduped,
+                "dropped": self.dropped,
+                "completed": self.completed,
+                "failed": self.failed,
+            }
+
+WORKERS = WorkerPool()
+
 # ----------------- AppMonitor, ConfigManager, CookieManager, etc. (copiado y adaptado) -----------------
 class AppMonitor:
     @staticmethod
     def is_process_running(name: str) -> bool:
-        for proc in psutil.process_iter(attrs=['name']):
-            if name.lower() in (proc.info['name'] or "").lower():
-                return True
-        return False
+        return PROCESSES.any_name(lambda n: name.lower() in n)
 
     @staticmethod
     def kill_process(name: str):
@@ -815,37 +1289,328 @@ class AppMonitor:
         subprocess.Popen([path_dumb])
         logger.info("🚀 dumb.exe iniciado.")
 
+# ----------------- Compiled catalog -----------------
+class CompiledCatalog:
+    """
+    Catálogo compilado desde games_config_merged.json y abierto con mmap.
+    Formato: cabecera | registros msgpack por entrada | índice [key, name, shortName] | tabla de offsets.
+    Las entradas solo se decodifican al consultarlas.
+    """
+    MAGIC = b"GFNCAT1\0"
+    VERSION = 1
+    HEADER = struct.Struct("<8sIIqqQQ")  # magic, version, count, src_mtime_ns, src_size, index_off, offsets_off
+    OFFSET = struct.Struct("<Q")
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._file = self.path.open("rb")
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, count, _, _, index_off, offsets_off = self.HEADER.unpack_from(self._mm, 0)
+            if magic != self.MAGIC or version != self.VERSION:
+                raise ValueError("formato de catálogo desconocido")
+            self._count = count
+            self._offsets_off = offsets_off
+            self._index_rows = msgpack.unpackb(self._mm[index_off:offsets_off], raw=False)
+            self._positions = {row[0]: i for i, row in enumerate(self._index_rows)}
+        except Exception:
+            self.close()
+            raise
+
+    @classmethod
+    def is_fresh(cls, path: Path, source: Path) -> bool:
+        """True si el compilado existe y corresponde a la versión actual del JSON."""
+        try:
+            st = source.stat()
+            with Path(path).open("rb") as f:
+                header = f.read(cls.HEADER.size)
+            magic, version, _, src_mtime_ns, src_size, _, _ = cls.HEADER.unpack(header)
+        except Exception:
+            return False
+        return (magic == cls.MAGIC and version == cls.VERSION
+                and src_mtime_ns == st.st_mtime_ns and src_size == st.st_size)
+
+    @classmethod
+    def build(cls, source: Path, path: Path, data: Optional[dict] = None) -> bool:
+        """Compila el JSON fuente (o data, si ya es su contenido) al formato binario (escritura atómica)."""
+        if data is None:
+            data = safe_json_load(source)
+        if not isinstance(data, dict):
+            return False
+        st = source.stat()
+        tmp = Path(path).with_name(f".{Path(path).name}.{os.getpid()}.tmp")
+        try:
+            rows, offsets = [], []
+            with tmp.open("wb") as f:
+                f.write(b"\0" * cls.HEADER.size)
+                pos = cls.HEADER.size
+                for key, entry in data.items():
+                    rec = msgpack.packb(entry, use_bin_type=True)
+                    offsets.append(pos)
+                    f.write(rec)
+                    pos += len(rec)
+                    if isinstance(entry, dict):
+                        rows.append([key, entry.get("name"), entry.get("shortName")])
+                    else:
+                        rows.append([key, None, None])
+                offsets.append(pos)
+                index_off = pos
+                blob = msgpack.packb(rows, use_bin_type=True)
+                f.write(blob)
+                offsets_off = index_off + len(blob)
+                f.write(b"".join(cls.OFFSET.pack(o) for o in offsets))
+                f.seek(0)
+                f.write(cls.HEADER.pack(cls.MAGIC, cls.VERSION, len(rows), st.st_mtime_ns,
+                                        st.st_size, index_off, offsets_off))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+            logger.info(f"🗜️ Catálogo compilado: {path} ({len(rows)} juegos)")
+            return True
+        except Exception as e:
+            logger.error(f"Error compilando catálogo {path}: {e}")
+            try:
+                tmp.unlink()
+            except Exception:
+                pass
+            return False
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, key):
+        return key in self._positions
+
+    def keys(self):
+        return self._positions.keys()
+
+    def index_rows(self):
+        """Filas (key, name, shortName) sin decodificar las entradas."""
+        return self._index_rows
+
+    def get(self, key, default=None):
+        i = self._positions.get(key)
+        if i is None:
+            return default
+        start, end = struct.unpack_from("<QQ", self._mm, self._offsets_off + i * self.OFFSET.size)
+        return msgpack.unpackb(self._mm[start:end], raw=False)
+
+    def close(self):
+        try:
+            self._mm.close()
+        except Exception:
+            pass
+        try:
+            self._file.close()
+        except Exception:
+            pass
+
 class ConfigManager:
+    """
+    Carga games_config_merged.json en un GameStore y registra los cambios en un
+    journal append-only (una línea JSON por upsert) que se reproduce al cargar y
+    se compacta en segundo plano sobre el JSON principal mediante rename atómico.
+    """
+    JOURNAL_COMPACT_THRESHOLD = 50
+
     def __init__(self, config_path_file: Path):
         self.config_path_file = Path(config_path_file)
-        self.games_config: Dict = {}
+        self.store = GameStore()
         self.games_config_path: Optional[Path] = None
+        self.journal_path: Optional[Path] = None
+        self._journal_lock = threading.Lock()
+        self._journal_entries = 0
         self._load()
 
     def _load(self):
 
         # Ruta fija al archivo que siempre queremos cargar
         fixed_path = CONFIG_DIR / "games_config_merged.json"
+        self.journal_path = fixed_path.with_name(fixed_path.name + ".journal")
 
         # Si no existe, mostrar error en logs pero NO abrir Tkinter
         if not fixed_path.exists():
             logger.error(f"❌ No se encontró {fixed_path}. Se cargará un JSON vacío.")
-            self.games_config = {}
+            self.store = GameStore()
+            self.games_config_path = fixed_path
+            self._replay_journal()
+            return
+
+        # Preferir el catálogo compilado (mmap); el JSON sigue siendo la fuente
+        catalog = self._open_compiled(fixed_path)
+        if catalog is not None:
+            self.store = GameStore(catalog)
             self.games_config_path = fixed_path
+            logger.info(f"✅ Catálogo compilado cargado: {catalog.path}")
+            self._replay_journal()
+            self._log_games_summary()
+            if self._journal_entries:
+                self.compact_in_background()
             return
 
         # Cargar JSON fijo directamente sin pedir nada al usuario
         data = safe_json_load(fixed_path)
         if isinstance(data, dict):
-            self.games_config = data
+            self.store = GameStore(data)
             self.games_config_path = fixed_path
             logger.info(f"✅ games_config_merged.json cargado automáticamente: {fixed_path}")
-            self._log_games_summary()
         else:
             logger.warning("⚠️ games_config_merged.json no contiene un objeto JSON válido.")
-            self.games_config = {}
+            self.store = GameStore()
             self.games_config_path = fixed_path
+        self._replay_journal()
+        self._log_games_summary()
+        if self._journal_entries:
+            self.compact_in_background()
+
+    def _open_compiled(self, source: Path) -> Optional[CompiledCatalog]:
+        """Abre el catálogo compilado, recompilándolo si el JSON es más reciente."""
+        if not MSGPACK_AVAILABLE:
+            return None
+        compiled_path = source.with_suffix(".catalog")
+        pending = compiled_path.with_name(compiled_path.name + ".new")
+        try:
+            if pending.exists():
+                # compilado por la última compactación cuando el anterior seguía mapeado
+                os.replace(pending, compiled_path)
+        except Exception as e:
+            logger.debug(f"No se pudo promover {pending}: {e}")
+        try:
+            if not CompiledCatalog.is_fresh(compiled_path, source):
+                if not CompiledCatalog.build(source, compiled_path):
+                    return None
+            return CompiledCatalog(compiled_path)
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo usar el catálogo compilado ({e}); se cargará el JSON.")
+            return None
+
+    def _replay_journal(self):
+        """Aplica los upserts pendientes del journal. Una última línea truncada se descarta."""
+        path = self.journal_path
+        if not path or not path.exists():
+            return
+        applied = 0
+        good_size = 0
+        pending = {}
+        try:
+            with path.open("rb") as f:
+                for raw in f:
+                    if not raw.endswith(b"\n"):
+                        logger.warning("⚠️ Journal con última línea incompleta; se descarta.")
+                        break
+                    try:
+                        rec = json.loads(raw.decode("utf-8"))
+                        key = rec["key"]
+                        entry = rec["entry"]
+                    except Exception:
+                        logger.debug(f"Línea de journal inválida ignorada: {raw[:80]!r}")
+                        good_size += len(raw)
+                        continue
+                    good_size += len(raw)
+                    if isinstance(entry, dict):
+                        pending[key] = entry
+                        applied += 1
+            if good_size != path.stat().st_size:
+                with path.open("r+b") as f:
+                    f.truncate(good_size)
+        except Exception as e:
+            logger.error(f"Error reproduciendo journal {path}: {e}")
+        self.store.put_many(pending)
+        self._journal_entries = applied
+        if applied:
+            logger.info(f"📝 Journal reproducido: {applied} cambios pendientes")
+
+    @property
+    def games_config(self) -> "GameMapSnapshot":
+        """Versión vigente del catálogo (inmutable)."""
+        return self.store.snapshot
+
+    def upsert_game(self, game_key: str, entry: dict):
+        """Guarda una entrada (en memoria y en el journal) sin reescribir el catálogo."""
+        self.store.put(game_key, entry)
+        self.persist_game(game_key)
+
+    def persist_game(self, game_key: str):
+        """
+        Registra en el journal la entrada ya publicada de game_key. Se lee dentro
+        del lock: con escritores concurrentes, la última línea es la versión vigente.
+        """
+        try:
+            with self._journal_lock:
+                entry = self.store.snapshot.get(game_key)
+                if not isinstance(entry, dict):
+                    return
+                line = json.dumps({"key": game_key, "entry": entry}, ensure_ascii=False) + "\n"
+                with self.journal_path.open("ab") as f:
+                    f.write(line.encode("utf-8"))
+                    f.flush()
+                    os.fsync(f.fileno())
+                self._journal_entries += 1
+                pending = self._journal_entries
+        except Exception as e:
+            logger.error(f"Error escribiendo journal {self.journal_path}: {e}")
+            return
+        if pending >= self.JOURNAL_COMPACT_THRESHOLD:
+            self.compact_in_background()
+
+    def compact_in_background(self):
+        # la clave fija deduplica: nunca hay dos compactaciones en cola o en marcha
+        WORKERS.submit("compact", self.compact)
+
+    def compact(self):
+        """Vuelca el catálogo completo al JSON principal y recorta el journal ya aplicado."""
+        try:
+            with self._journal_lock:
+                # todo lo que hay en el journal hasta offset está en esta versión
+                snapshot = self.store.snapshot
+                try:
+                    offset = self.journal_path.stat().st_size
+                except FileNotFoundError:
+                    offset = 0
+                compacted = self._journal_entries
+
+            data = snapshot.materialize()
+            if not save_json(data, self.games_config_path):
+                # el journal sigue siendo la única copia de esos cambios: no se recorta
+                logger.warning("⚠️ No se pudo escribir el catálogo; el journal se conserva.")
+                return
+            self._recompile(data)
+
+            with self._journal_lock:
+                # Conservar lo que se haya añadido al journal mientras se escribía el catálogo
+                try:
+                    with self.journal_path.open("rb") as f:
+                        f.seek(offset)
+                        tail = f.read()
+                except FileNotFoundError:
+                    tail = b""
+                tmp = self.journal_path.with_name(self.journal_path.name + ".tmp")
+                with tmp.open("wb") as f:
+                    f.write(tail)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp, self.journal_path)
+                self._journal_entries = max(0, self._journal_entries - compacted)
+            logger.debug(f"Catálogo compactado ({compacted} cambios del journal)")
+        except Exception as e:
+            logger.error(f"Error compactando catálogo: {e}")
 
+    def _recompile(self, data: dict):
+        """
+        Recompila el .catalog contra el JSON recién escrito para que el próximo
+        arranque no lo vea caducado. Si el compilado actual está mapeado y no se
+        puede reemplazar (Windows), queda en .catalog.new y se promueve al cargar.
+        """
+        if not MSGPACK_AVAILABLE:
+            return
+        compiled_path = self.games_config_path.with_suffix(".catalog")
+        pending = compiled_path.with_name(compiled_path.name + ".new")
+        if not CompiledCatalog.build(self.games_config_path, pending, data):
+            return
+        try:
+            os.replace(pending, compiled_path)
+        except OSError as e:
+            logger.debug(f"Catálogo compilado pendiente de promover ({e})")
 
     def _log_games_summary(self, verbose=False):
         count = len(self.games_config)
@@ -855,8 +1620,8 @@ class ConfigManager:
         
         logger.info(f"📦 Juegos cargados: {count}")
 
-    def get_game_mapping(self):
-        return self.games_config
+    def get_game_mapping(self) -> "GameStore":
+        return self.store
 
 class CookieManager:
     def __init__(self, env_cookie: Optional[str] = None, test_url: str = TEST_RICH_URL):
@@ -865,9 +1630,7 @@ class CookieManager:
 
     def validar_cookie(self, cookie_value: str) -> bool:
         try:
-            s = requests.Session()
-            s.cookies.set('steamLoginSecure', cookie_value)
-            r = s.get(self.test_url, timeout=10)
+            r = HTTP.get(self.test_url, timeout=10, cookies={'steamLoginSecure': cookie_value})
             if r.status_code == 200 and "Sign In" not in r.text and "login" not in r.url.lower():
                 return True
         except Exception as e:
@@ -909,6 +1672,13 @@ class CookieManager:
             logger.debug("No había procesos de Edge en ejecución.")
 
     def get_cookie_with_selenium(self, headless: bool = False, profile_dir: str = "Default") -> Optional[str]:
+        try:
+            from selenium import webdriver
+            from selenium.common.exceptions import WebDriverException
+            from selenium.webdriver.edge.options import Options
+        except ImportError as e:
+            logger.error(f"❌ Selenium no disponible: {e}")
+            return None
         try:
             res = self.ask_get_cookie()
             if not res:
@@ -947,7 +1717,7 @@ class CookieManager:
             if headless:
                 options.add_argument("--headless=new")
 
-            driver = webdriver.Edge(service=service, options=options)
+            driver = webdriver.Edge(service=edge_driver_service(), options=options)
             driver.get("https://steamcommunity.com")
             cookies = driver.get_cookies()
             for c in cookies:
@@ -1032,10 +1802,7 @@ class AppLauncher:
     @staticmethod
     def _is_process_running_by_name(target_name: str) -> bool:
         try:
-            for proc in psutil.process_iter(attrs=['name']):
-                name = (proc.info.get('name') or "").lower()
-                if name == target_name.lower() or target_name.lower() in name:
-                    return True
+            return PROCESSES.any_name(lambda name: target_name.lower() in name)
         except Exception:
             pass
         return False
@@ -1061,11 +1828,9 @@ class AppLauncher:
 
     @staticmethod
     def launch_discord():
-        for proc in psutil.process_iter(attrs=['name']):
-            name = (proc.info.get('name') or "").lower()
-            if "discord" in name and "update" not in name:
-                logger.info("💡 Discord ya está en ejecución")
-                return
+        if PROCESSES.any_name(lambda name: "discord" in name and "update" not in name):
+            logger.info("💡 Discord ya está en ejecución")
+            return
         updater = AppLauncher.find_discord()
         if updater:
             logger.info("🚀 Iniciando Discord...")
@@ -1073,14 +1838,120 @@ class AppLauncher:
         else:
             logger.warning("⚠️ No se encontró Discord instalado en la ruta por defecto.")
 
+class SteamPresenceParser(HTMLParser):
+    """
+    Parser incremental (una sola pasada) de la página testrichpresence de Steam.
+    Extrae el texto tras <b>Localized Rich Presence Result</b> y la fila
+    steam_player_group_size; `done` se activa en cuanto tiene ambos.
+    """
+    RESULT_RE = re.compile(r'Localized Rich Presence Result', re.IGNORECASE)
+    GROUP_KEY = 'steam_player_group_size'
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.rich_presence: Optional[str] = None
+        self.rich_found = False
+        self.group_size: Optional[int] = None
+        self.group_found = False
+        self.cells = []          # texto de todas las <td> (para la búsqueda alternativa)
+        self._b_text = None      # texto del <b> en curso
+        self._b_nested = False
+        self._sibling = None     # texto inmediatamente posterior al <b> del resultado
+        self._row = None
+        self._cell = None
+
+    @property
+    def done(self) -> bool:
+        return self.rich_found and self.group_found
+
+    def _end_sibling(self):
+        if self._sibling is not None:
+            self.rich_presence = "".join(self._sibling)
+            self.rich_found = True
+            self._sibling = None
+
+    def _end_cell(self):
+        if self._cell is not None:
+            text = "".join(self._cell).strip()
+            self.cells.append(text)
+            if self._row is not None:
+                self._row.append(text)
+            self._cell = None
+
+    def _end_row(self):
+        self._end_cell()
+        row, self._row = self._row, None
+        if row and len(row) >= 2 and not self.group_found and self.GROUP_KEY in row[0] and row[1].isdigit():
+            self.group_size = int(row[1])
+            self.group_found = True
+
+    def handle_starttag(self, tag, attrs):
+        self._end_sibling()
+        if self._b_text is not None:
+            self._b_nested = True
+        if tag == 'b' and not self.rich_found and self._b_text is None:
+            self._b_text = []
+            self._b_nested = False
+        elif tag == 'tr':
+            self._end_row()
+            self._row = []
+        elif tag == 'td':
+            self._end_cell()
+            self._cell = []
+
+    def handle_endtag(self, tag):
+        self._end_sibling()
+        if tag == 'b' and self._b_text is not None:
+            text = "".join(self._b_text)
+            self._b_text = None
+            if not self._b_nested and self.RESULT_RE.search(text):
+                self._sibling = []
+        elif tag == 'td':
+            self._end_cell()
+        elif tag == 'tr':
+            self._end_row()
+
+    def handle_data(self, data):
+        if self._b_text is not None:
+            self._b_text.append(data)
+        if self._sibling is not None:
+            self._sibling.append(data)
+        if self._cell is not None:
+            self._cell.append(data)
+
+    def close(self):
+        super().close()
+        self._end_sibling()
+        self._end_row()
+
+def parse_steam_presence(html: str, chunk_size: int = 16 * 1024) -> SteamPresenceParser:
+    """Alimenta el parser por bloques y se detiene en cuanto tiene resultado y group size."""
+    parser = SteamPresenceParser()
+    for i in range(0, len(html), chunk_size):
+        parser.feed(html[i:i + chunk_size])
+        if parser.done:
+            return parser
+    parser.close()
+    return parser
+
 class SteamScraper:
-    def __init__(self, steam_cookie: Optional[str], test_rich_url: str):
+    def __init__(self, steam_cookie: Optional[str], test_rich_url: str, http: Optional[HttpClient] = None):
         self.test_rich_url = test_rich_url
-        self.session = requests.Session()
+        self.http = http or HTTP
         if steam_cookie:
-            self.session.cookies.set('steamLoginSecure', steam_cookie)
+            self.http.set_cookie('steamLoginSecure', steam_cookie)
         self._last_presence = None
         self._last_group_size = None
+        # Huella de la última respuesta parseada y validadores HTTP
+        self._fingerprint: Optional[bytes] = None
+        self._cached_result: tuple[Optional[str], Optional[int]] = (None, None)
+        self._etag: Optional[str] = None
+        self._last_modified: Optional[str] = None
+        self.cache_hits = 0
+        self.cache_misses = 0
+        if METRICS is not None:
+            METRICS.instrument(self, "get_rich_presence", "steam_scrape")
+            METRICS.instrument(self, "parse", "steam_parse")
     
     def get_rich_presence(self) -> tuple[Optional[str], Optional[int]]:
         """
@@ -1091,7 +1962,16 @@ class SteamScraper:
             return None, None
         
         try:
-            resp = self.session.get(self.test_rich_url, timeout=10)
+            headers = {}
+            if self._fingerprint is not None:
+                if self._etag:
+                    headers["If-None-Match"] = self._etag
+                if self._last_modified:
+                    headers["If-Modified-Since"] = self._last_modified
+            resp = self.http.get(self.test_rich_url, headers=headers, timeout=10)
+            if resp.status_code == 304 and self._fingerprint is not None:
+                self.cache_hits += 1
+                return self._cached_result
             if resp.status_code != 200:
                 logger.debug("Status != 200 al obtener rich presence")
                 return None, None
@@ -1106,71 +1986,88 @@ class SteamScraper:
                     logger.info("✅ Sesión de Steam restaurada.")
                     self._steam_expired_warned = False
 
-            soup = BeautifulSoup(resp.text, 'html.parser')
-            
-            # 1. Obtener el texto de Rich Presence (filtrando los que contienen '#')
-            b = soup.find('b', string=re.compile(r'Localized Rich Presence Result', re.IGNORECASE))
-            rich_presence_text = None
-            if b:
-                text = (b.next_sibling or "").strip()
-                if text and "No rich presence keys set" not in text:
-                    # Filtrar texto que contiene '#'
-                    if '#' not in text:
-                        rich_presence_text = text
-                        if text != self._last_presence:
-                            self._last_presence = text
-                            logger.info(f"🎮 Rich Presence (nuevo): {text}")
-                    else:
-                        logger.debug(f"❌ Rich Presence filtrado (contiene '#'): {text}")
-                        rich_presence_text = None
-            
-            # 2. Extraer steam_player_group_size
-            group_size = self._extract_group_size(soup)
-            
-            return rich_presence_text, group_size
+            html = resp.text
+            fingerprint = self._fingerprint_of(html)
+            if fingerprint == self._fingerprint:
+                self.cache_hits += 1
+                return self._cached_result
+
+            self.cache_misses += 1
+            result = self.parse(html)
+            self._fingerprint = fingerprint
+            self._cached_result = result
+            self._etag = resp.headers.get("ETag")
+            self._last_modified = resp.headers.get("Last-Modified")
+            return result
             
         except Exception as e:
             logger.error(f"⚠️ Error scraping Steam: {e}")
             return None, None
-    
-    def _extract_group_size(self, soup) -> Optional[int]:
+
+    _TABLE_RE = re.compile(r'<table\b.*?</table\s*>', re.IGNORECASE | re.DOTALL)
+    _TABLE_END_RE = re.compile(r'</table\s*>', re.IGNORECASE)
+
+    @classmethod
+    def _fingerprint_of(cls, html: str) -> bytes:
         """
-        Extrae el valor de steam_player_group_size de la tabla HTML
+        Hash solo del bloque que lee el parser: desde el resultado de Rich Presence
+        hasta el final de la tabla de claves que lo sigue. Si falta el resultado o la
+        fila de group size, las tablas de la página (de donde sale la búsqueda
+        alternativa). Scripts, nonces e ids de sesión quedan fuera.
         """
-        try:
-            # Buscar la fila que contiene 'steam_player_group_size'
-            rows = soup.find_all('tr')
-            for row in rows:
-                cells = row.find_all('td')
-                if len(cells) >= 2:
-                    first_cell_text = cells[0].get_text().strip()
-                    if 'steam_player_group_size' in first_cell_text:
-                        # El valor está en la segunda celda
-                        group_size_text = cells[1].get_text().strip()
-                        if group_size_text.isdigit():
-                            group_size = int(group_size_text)
-                            if group_size != self._last_group_size:
-                                self._last_group_size = group_size
-                                logger.info(f"👥 Group size detectado: {group_size}")
-                            return group_size
-            
+        block = ""
+        m = SteamPresenceParser.RESULT_RE.search(html)
+        if m:
+            end = cls._TABLE_END_RE.search(html, m.end())
+            block = html[m.start():end.end() if end else len(html)]
+        if not m or SteamPresenceParser.GROUP_KEY not in block:
+            block += "".join(cls._TABLE_RE.findall(html))
+        return hashlib.blake2b(block.encode("utf-8", "replace"), digest_size=16).digest()
+
+    def cache_stats(self) -> dict:
+        return {"hits": self.cache_hits, "misses": self.cache_misses}
+
+    def set_cookie(self, steam_cookie: Optional[str]):
+        """Cambia la cookie sin recrear la sesión; la página cacheada era de la cookie anterior."""
+        self.http.set_cookie('steamLoginSecure', steam_cookie)
+        self._fingerprint = None
+        self._etag = self._last_modified = None
+        self._steam_expired_warned = False
+
+    def parse(self, html: str) -> tuple[Optional[str], Optional[int]]:
+        parsed = parse_steam_presence(html)
+
+        # 1. Obtener el texto de Rich Presence (filtrando los que contienen '#')
+        rich_presence_text = None
+        text = (parsed.rich_presence or "").strip()
+        if text and "No rich presence keys set" not in text:
+            if '#' not in text:
+                rich_presence_text = text
+                if text != self._last_presence:
+                    self._last_presence = text
+                    logger.info(f"🎮 Rich Presence (nuevo): {text}")
+            else:
+                logger.debug(f"❌ Rich Presence filtrado (contiene '#'): {text}")
+
+        # 2. Extraer steam_player_group_size
+        if parsed.group_found:
+            group_size = parsed.group_size
+            if group_size != self._last_group_size:
+                self._last_group_size = group_size
+                logger.info(f"👥 Group size detectado: {group_size}")
+        else:
             # Si no se encuentra steam_player_group_size, buscar patrones alternativos
-            group_size = self._find_alternative_group_size(soup)
-            return group_size
-            
-        except Exception as e:
-            logger.debug(f"Error extrayendo group size: {e}")
-            return None
-    
-    def _find_alternative_group_size(self, soup) -> Optional[int]:
+            group_size = self._find_alternative_group_size(parsed.cells)
+
+        return rich_presence_text, group_size
+
+    def _find_alternative_group_size(self, cells: list) -> Optional[int]:
         """
-        Busca el group size usando métodos alternativos (XPath simulation)
+        Busca el group size usando métodos alternativos sobre el texto de las celdas
         """
         try:
             # Método 1: Buscar en todas las celdas que puedan contener números de grupo
-            cells = soup.find_all('td')
-            for cell in cells:
-                text = cell.get_text().strip()
+            for text in cells:
                 # Buscar patrones como "1/4", "2 players", etc.
                 if '/' in text and text.replace('/', '').isdigit():
                     parts = text.split('/')
@@ -1180,8 +2077,7 @@ class SteamScraper:
                         return current_players
             
             # Método 2: Buscar números que representen cantidad de jugadores
-            for cell in cells:
-                text = cell.get_text().strip()
+            for text in cells:
                 if text.isdigit():
                     num = int(text)
                     if 1 <= num <= 16:  # Rango razonable para grupos de juego
@@ -1193,64 +2089,2878 @@ class SteamScraper:
             logger.debug(f"Error en búsqueda alternativa de group size: {e}")
             return None
             
-def find_steam_appid_by_name(game_name: str) -> Optional[str]:
-    try:
-        url = f"https://steamcommunity.com/actions/SearchApps/{game_name}"
-        resp = requests.get(url, timeout=10)
-        if resp.status_code == 200:
-            data = resp.json()
-            if data and isinstance(data, list):
-
-                for app in data:
-                    if app.get("name", "").lower() == game_name.lower():
-                        return str(app.get("appid"))
-                if data:    
-                    return str(data[0].get("appid"))
-    except Exception as e:
-        logger.error(f"Error buscando Steam AppID: {e}")
+class SteamPresencePoller:
+    """
+    Consulta Steam en un hilo propio (start) o como tarea del PresenceEngine
+    (run_async) y publica el último (texto, group_size) con su marca de tiempo.
+    El tick lee latest() sin bloquear; los valores más viejos que max_staleness
+    se descartan. reset() invalida el valor al cambiar de juego.
+    """
+    def __init__(self, get_scraper, interval: float = STEAM_POLL_INTERVAL,
+                 max_staleness: float = STEAM_MAX_STALENESS):
+        self._get_scraper = get_scraper
+        self.interval = interval
+        self.max_staleness = max_staleness
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._active = False
+        self._generation = 0
+        self._value: tuple[Optional[str], Optional[int]] = (None, None)
+        self._fetched_at: Optional[float] = None
+        self._thread: Optional[threading.Thread] = None
+        self._async_wake = None  # (loop, asyncio.Event) en modo run_async
+        self.fetches = 0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._kick()
+
+    def _kick(self):
+        self._wake.set()
+        if self._async_wake is not None:
+            loop, event = self._async_wake
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass  # loop ya cerrado
+
+    def set_active(self, active: bool):
+        """Solo se consulta Steam mientras el juego actual tiene steam_appid."""
+        if active and not self._active:
+            self._kick()
+        self._active = active
+
+    def reset(self):
+        with self._lock:
+            self._generation += 1
+            self._value = (None, None)
+            self._fetched_at = None
+        self._kick()
+
+    def latest(self) -> tuple[Optional[str], Optional[int]]:
+        with self._lock:
+            if self._fetched_at is not None and time.monotonic() - self._fetched_at <= self.max_staleness:
+                return self._value
+        return None, None
+
+    def age(self) -> Optional[float]:
+        with self._lock:
+            return None if self._fetched_at is None else time.monotonic() - self._fetched_at
+
+    def _fetch(self):
+        try:
+            return self._get_scraper().get_rich_presence()
+        except Exception as e:
+            logger.debug(f"Error en consulta de Steam en segundo plano: {e}")
+            return None
+
+    def _store(self, generation: int, value) -> bool:
+        """Publica value si sigue siendo del mismo juego. True si cambió el valor."""
+        self.fetches += 1
+        if value is None:
+            return False
+        with self._lock:
+            if generation != self._generation:
+                return False
+            changed = value != self._value or self._fetched_at is None
+            self._value = value
+            self._fetched_at = time.monotonic()
+        return changed
+
+    def _run(self):
+        while not self._stop.is_set():
+            if self._active:
+                with self._lock:
+                    generation = self._generation
+                self._store(generation, self._fetch())
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    async def run_async(self, on_change=None):
+        """El mismo bucle como tarea: la petición HTTP va a un hilo del executor."""
+        event = asyncio.Event()
+        self._async_wake = (asyncio.get_running_loop(), event)
+        try:
+            while not self._stop.is_set():
+                if self._active:
+                    with self._lock:
+                        generation = self._generation
+                    value = await asyncio.to_thread(self._fetch)
+                    if self._store(generation, value) and on_change is not None:
+                        on_change()
+                try:
+                    await asyncio.wait_for(event.wait(), self.interval)
+                except asyncio.TimeoutError:
+                    pass
+                event.clear()
+        finally:
+            self._async_wake = None
+
+def search_steam_appid(game_name: str) -> Optional[str]:
+    """Busca el AppID en Steam. None si no hay resultados; lanza en errores de red/HTTP."""
+    url = f"https://steamcommunity.com/actions/SearchApps/{quote(game_name, safe='')}"
+    resp = HTTP.get(url, timeout=10)
+    resp.raise_for_status()
+    data = resp.json()
+    if data and isinstance(data, list):
+
+        for app in data:
+            if app.get("name", "").lower() == game_name.lower():
+                return str(app.get("appid"))
+        if data:    
+            return str(data[0].get("appid"))
     return None
 
-class PresenceManager:
-    def __init__(self, client_id: str, games_map: dict, cookie_manager, test_rich_url: str,
-                 update_interval: int = 10, keep_alive: bool = False):
-        import atexit, signal, sys
+class SteamAppIdResolver:
+    """
+    Resolución nombre -> Steam AppID fuera del tick:
+    - caché persistente (STEAM_APPID_CACHE_PATH) por título normalizado
+    - los no encontrados se recuerdan STEAM_APPID_NEGATIVE_TTL segundos; los
+      errores de red solo en memoria, STEAM_APPID_RETRY_DELAY segundos
+    - cola de fondo con un solo hilo y sin duplicados; callback(name, appid)
+      cuando se resuelve
+    - títulos basura (biblioteca, vacíos, sin letras ni números) nunca consultan
+    """
 
-        self.client_id = client_id
-        self.games_map = games_map
-        self.cookie_manager = cookie_manager
-        self.test_rich_url = test_rich_url
-        self.update_interval = update_interval
-        self.keep_alive = keep_alive
-        self.fake_proc = None
-        self.fake_exec_path = None
-        self.last_log_message = None
-        self.rpc = Presence(self.client_id)
-        self._connect_rpc()
+    def __init__(self, path: Optional[Path] = STEAM_APPID_CACHE_PATH, search=None,
+                 negative_ttl: float = STEAM_APPID_NEGATIVE_TTL,
+                 retry_delay: float = STEAM_APPID_RETRY_DELAY, clock=time.time):
+        self.path = path
+        self._search = search or search_steam_appid
+        self.negative_ttl = negative_ttl
+        self.retry_delay = retry_delay
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._cache: Dict[str, dict] = {}  # título normalizado -> {"appid", "at"}
+        self._retry_at: Dict[str, float] = {}
+        self._queued: Dict[str, list] = {}  # título normalizado -> callbacks
+        self._queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._dirty = False
+        self.hits = 0
+        self.misses = 0
+        self.lookups = 0
+        self.errors = 0
+        self._load()
 
-        self.scraper = SteamScraper(self.cookie_manager.env_cookie, test_rich_url)
+    def _load(self):
+        if not self.path or not Path(self.path).exists():
+            return
+        data = safe_json_load(Path(self.path))
+        if isinstance(data, dict):
+            self._cache = {k: v for k, v in data.items() if isinstance(v, dict)}
 
-        self.last_game = None
-        self.forced_game = None
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            data = dict(self._cache)
+            self._dirty = False
+        save_json(data, Path(self.path))
 
+    @staticmethod
+    def is_junk(name: Optional[str]) -> bool:
+        key = normalize_title(name)
+        return is_library_title(key) or len(key) < 2 or not any(ch.isalnum() for ch in key)
 
-        atexit.register(self.close)
-        signal.signal(signal.SIGTERM, lambda s, f: sys.exit(0))
-        signal.signal(signal.SIGINT, lambda s, f: sys.exit(0))
+    def _fresh_entry(self, key: str) -> Optional[dict]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        if entry.get("appid") is None and self._clock() - entry.get("at", 0) >= self.negative_ttl:
+            return None
+        return entry
+
+    def get(self, name: Optional[str]) -> Optional[str]:
+        """AppID en caché (sin red). None si no se conoce, no existe o es basura."""
+        if self.is_junk(name):
+            return None
+        with self._lock:
+            entry = self._fresh_entry(normalize_title(name))
+        if entry is None:
+            return None
+        self.hits += 1
+        return entry.get("appid")
+
+    def known(self, name: Optional[str]) -> bool:
+        """True si no hace falta consultar: basura, en caché o reintento aún no vencido."""
+        if self.is_junk(name):
+            return True
+        key = normalize_title(name)
+        with self._lock:
+            return self._fresh_entry(key) is not None or self._retry_at.get(key, 0) > self._clock()
 
-    def _connect_rpc(self, client_id: Optional[str] = None):
+    def resolve_async(self, name: Optional[str], callback=None) -> bool:
+        """Encola la búsqueda si hace falta. True si quedó encolada (o ya lo estaba)."""
+        if self.known(name):
+            return False
+        key = normalize_title(name)
+        with self._lock:
+            if key in self._queued:
+                if callback:
+                    self._queued[key].append(callback)
+                return True
+            self._queued[key] = [callback] if callback else []
+        self.misses += 1
+        self._queue.put((key, name))
+        self.start()
+        return True
+
+    def resolve(self, name: Optional[str]) -> Optional[str]:
+        """Búsqueda bloqueante que pasa por la caché."""
+        if self.known(name):
+            return self.get(name)
+        return self._lookup(normalize_title(name), name)
+
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="steam-appids", daemon=True)
+            self._thread.start()
+
+    def _lookup(self, key: str, name: str) -> Optional[str]:
+        self.lookups += 1
         try:
-            try:
-                self.rpc.close()
+            appid = self._search(name)
+        except Exception as e:
+            self.errors += 1
+            logger.debug(f"Error buscando Steam AppID para '{name}': {e}")
+            with self._lock:
+                self._retry_at[key] = self._clock() + self.retry_delay
+            return None
+        with self._lock:
+            self._cache[key] = {"appid": appid, "at": self._clock()}
+            self._retry_at.pop(key, None)
+            self._dirty = True
+        return appid
+
+    def _run(self):
+        while True:
+            key, name = self._queue.get()
+            appid = self._lookup(key, name)
+            with self._lock:
+                callbacks = self._queued.pop(key, [])
+            for callback in callbacks:
+                try:
+                    callback(name, appid)
+                except Exception as e:
+                    logger.debug(f"Error en callback de AppID: {e}")
+            if self._queue.empty():
+                self.save()
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._queued)
+
+    def stats(self) -> dict:
+        with self._lock:
+            cached = len(self._cache)
+            negative = sum(1 for v in self._cache.values() if v.get("appid") is None)
+        return {
+            "cached": cached,
+            "negative": negative,
+            "pending": self.pending(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "lookups": self.lookups,
+            "errors": self.errors,
+        }
+
+# ----------------- Discord detectable matching -----------------
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+class DiscordApp:
+    """Registro compacto de una app detectable: solo los campos que usamos."""
+    __slots__ = ("id", "name", "aliases", "exe")
+
+    def __init__(self, id, name, aliases=(), exe=None):
+        self.id = id
+        self.name = name or ""
+        self.aliases = tuple(a for a in aliases or () if a)
+        self.exe = exe
+
+    @classmethod
+    def from_payload(cls, app: dict) -> "DiscordApp":
+        """Proyecta una app del JSON de Discord a id/name/aliases/primer exe win32."""
+        exe = None
+        for e in app.get("executables", []) or []:
+            if e.get("os") == "win32" and e.get("name"):
+                exe = e.get("name")
+                break
+        return cls(app.get("id"), app.get("name"), app.get("aliases") or (), exe)
+
+    @classmethod
+    def from_row(cls, row) -> "DiscordApp":
+        return cls(*row)
+
+    def to_row(self) -> list:
+        return [self.id, self.name, list(self.aliases), self.exe]
+
+def iter_json_array(chunks):
+    """Parsea en streaming un array JSON de nivel superior, produciendo cada elemento."""
+    decoder = json.JSONDecoder()
+    buf = ""
+    started = False
+    for chunk in chunks:
+        buf += chunk
+        pos = 0
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n,":
+                pos += 1
+            if pos >= len(buf):
+                break
+            if not started:
+                if buf[pos] != "[":
+                    raise ValueError("se esperaba un array JSON")
+                started = True
+                pos += 1
+                continue
+            if buf[pos] == "]":
+                return
+            try:
+                obj, pos_end = decoder.raw_decode(buf, pos)
+            except ValueError:
+                break  # elemento incompleto: esperar al siguiente chunk
+            yield obj
+            pos = pos_end
+        buf = buf[pos:]
+    if not started or buf.strip():
+        raise ValueError("array JSON incompleto")
+
+def iter_response_text(resp, chunk_size: int = 64 * 1024):
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    for chunk in resp.iter_content(chunk_size):
+        yield decoder.decode(chunk)
+    yield decoder.decode(b"", final=True)
+
+def save_discord_apps(path: Path, apps: list, meta: dict):
+    """Guarda las apps proyectadas en msgpack (comprimido con zstd si está disponible)."""
+    payload = dict(meta)
+    payload["apps"] = [a.to_row() for a in apps]
+    if not MSGPACK_AVAILABLE:
+        save_json(payload, path.with_suffix(".json"))
+        return
+    data = msgpack.packb(payload, use_bin_type=True)
+    if ZSTD_AVAILABLE:
+        data = zstandard.ZstdCompressor(level=10).compress(data)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        with tmp.open("wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except Exception as e:
+        logger.debug(f"No se pudo guardar caché de Discord: {e}")
+        try:
+            tmp.unlink()
+        except Exception:
+            pass
+
+def load_discord_apps(path: Path) -> Optional[dict]:
+    """Carga la caché compacta, o la caché JSON (antigua o de respaldo) proyectándola."""
+    payload = None
+    if MSGPACK_AVAILABLE and path.exists():
+        try:
+            data = path.read_bytes()
+            if data.startswith(ZSTD_MAGIC):
+                data = zstandard.ZstdDecompressor().decompress(data)
+            payload = msgpack.unpackb(data, raw=False)
+        except Exception as e:
+            logger.debug(f"Caché compacta de Discord inválida: {e}")
+    legacy = path.with_suffix(".json")
+    if payload is None and legacy.exists():
+        payload = safe_json_load(legacy)
+    if not isinstance(payload, dict) or not isinstance(payload.get("apps"), list):
+        return None
+    apps = []
+    for a in payload["apps"]:
+        apps.append(DiscordApp.from_payload(a) if isinstance(a, dict) else DiscordApp.from_row(a))
+    payload["apps"] = apps
+    return payload
+
+def normalize_exe_path(path: Optional[str]) -> str:
+    """Ruta de ejecutable comparable: minúsculas, '/' como separador, sin prefijos '>' ni '/'."""
+    return (path or "").strip().lower().replace("\\", "/").lstrip(">/")
+
+class DiscordExeIndex:
+    """Índice exacto ruta/nombre de ejecutable win32 -> DiscordApp."""
+    def __init__(self, apps: list, version: int = 0):
+        self.version = version
+        self.by_path: Dict[str, DiscordApp] = {}
+        self.by_name: Dict[str, Optional[DiscordApp]] = {}
+        for app in apps:
+            path = normalize_exe_path(app.exe)
+            if not path:
+                continue
+            self.by_path.setdefault(path, app)
+            base = path.rsplit("/", 1)[-1]
+            if base in self.by_name and self.by_name[base] is not app:
+                self.by_name[base] = None  # ambiguo: lo comparten varias apps
+            else:
+                self.by_name[base] = app
+
+    def lookup(self, executable_path: Optional[str]) -> Optional[DiscordApp]:
+        path = normalize_exe_path(executable_path)
+        if not path:
+            return None
+        app = self.by_path.get(path)
+        if app is not None:
+            return app
+        return self.by_name.get(path.rsplit("/", 1)[-1])
+
+def _discord_app_score(gnl: str, app: DiscordApp) -> float:
+    """Mejor ratio de difflib entre el nombre buscado (en minúsculas) y name/aliases."""
+    score = difflib.SequenceMatcher(None, gnl, app.name.lower()).ratio()
+    for a in app.aliases:
+        s = difflib.SequenceMatcher(None, gnl, a.lower()).ratio()
+        if s > score:
+            score = s
+    return score
+
+def _discord_candidate(app: DiscordApp, score: float) -> dict:
+    return {
+        "name": app.name,
+        "id": app.id,
+        "exe": app.exe,
+        "score": score,
+        "aliases": list(app.aliases)
+    }
+
+def find_discord_matches_full(apps: list, game_name: str, max_candidates: int = 5) -> list:
+    """Recorrido completo con difflib sobre todas las apps (referencia exacta)."""
+    gnl = (game_name or "").lower()
+    candidates = []
+    for app in apps:
+        score = _discord_app_score(gnl, app)
+        if score > DISCORD_MIN_SCORE:  # filtro mínimo para reducir ruido
+            candidates.append(_discord_candidate(app, score))
+    candidates.sort(key=lambda x: x["score"], reverse=True)
+    return candidates[:max_candidates]
+
+class DiscordMatchIndex:
+    """
+    Índice invertido de trigramas sobre name/aliases de las apps detectables de Discord.
+    Preselecciona candidatos por coeficiente de Dice y solo esos se puntúan con difflib.
+    """
+    VERSION = 1
+    MIN_POOL = 300
+    POOL_PER_RESULT = 30
+
+    def __init__(self, strings: list, owners: list, sizes: list, postings: dict, ts: int = 0):
+        self.strings = strings      # textos en minúsculas
+        self.owners = owners        # índice de app de cada texto
+        self.sizes = sizes          # nº de trigramas de cada texto
+        self.postings = postings    # trigrama -> [índices de texto]
+        self.ts = ts
+
+    @staticmethod
+    def _grams(text: str) -> set:
+        t = f"  {text} "
+        return {t[i:i + 3] for i in range(len(t) - 2)}
+
+    @classmethod
+    def build(cls, apps: list, ts: int = 0) -> "DiscordMatchIndex":
+        strings, owners, sizes, postings = [], [], [], {}
+        for ai, app in enumerate(apps):
+            seen = set()
+            for text in (app.name,) + app.aliases:
+                t = text.lower()
+                if not t or t in seen:
+                    continue
+                seen.add(t)
+                sid = len(strings)
+                grams = cls._grams(t)
+                strings.append(t)
+                owners.append(ai)
+                sizes.append(len(grams))
+                for g in grams:
+                    postings.setdefault(g, []).append(sid)
+        return cls(strings, owners, sizes, postings, ts)
+
+    def save(self, path: Path):
+        if not MSGPACK_AVAILABLE:
+            return
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        try:
+            payload = {"version": self.VERSION, "ts": self.ts, "strings": self.strings,
+                       "owners": self.owners, "sizes": self.sizes, "postings": self.postings}
+            with tmp.open("wb") as f:
+                f.write(msgpack.packb(payload, use_bin_type=True))
+            os.replace(tmp, path)
+        except Exception as e:
+            logger.debug(f"No se pudo guardar índice de Discord: {e}")
+            try:
+                tmp.unlink()
             except Exception:
                 pass
-            client_id = client_id or self.client_id
-            self.rpc = Presence(client_id)
-            self.rpc.connect()
+
+    @classmethod
+    def load(cls, path: Path, ts: int) -> Optional["DiscordMatchIndex"]:
+        """Carga el índice persistido si corresponde a la caché con marca de tiempo ts."""
+        if not MSGPACK_AVAILABLE or not path.exists():
+            return None
+        try:
+            data = msgpack.unpackb(path.read_bytes(), raw=False)
+            if data.get("version") != cls.VERSION or data.get("ts") != ts:
+                return None
+            return cls(data["strings"], data["owners"], data["sizes"], data["postings"], ts)
+        except Exception as e:
+            logger.debug(f"Índice de Discord inválido: {e}")
+            return None
+
+    def candidate_apps(self, gnl: str, limit: int) -> list:
+        """Índices de app con mayor similitud de trigramas (Dice) con gnl."""
+        q = self._grams(gnl)
+        counts = Counter()
+        for g in q:
+            postings = self.postings.get(g)
+            if postings:
+                counts.update(postings)
+        best: Dict[int, float] = {}
+        qlen = len(q)
+        for sid, shared in counts.items():
+            dice = 2.0 * shared / (qlen + self.sizes[sid])
+            ai = self.owners[sid]
+            if dice > best.get(ai, 0.0):
+                best[ai] = dice
+        return heapq.nlargest(limit, best, key=best.__getitem__)
+
+    def search(self, apps: list, game_name: str, max_candidates: int = 5) -> list:
+        gnl = (game_name or "").lower()
+        if len(gnl) < 3:
+            return find_discord_matches_full(apps, game_name, max_candidates)
+        pool = max(self.MIN_POOL, max_candidates * self.POOL_PER_RESULT)
+        candidates = []
+        # orden original de apps para desempatar igual que el recorrido completo
+        for ai in sorted(self.candidate_apps(gnl, pool)):
+            app = apps[ai]
+            score = _discord_app_score(gnl, app)
+            if score > DISCORD_MIN_SCORE:
+                candidates.append(_discord_candidate(app, score))
+        candidates.sort(key=lambda x: x["score"], reverse=True)
+        return candidates[:max_candidates]
+
+class DiscordAppsCache:
+    """
+    Caché de proceso de las apps detectables de Discord.
+    Mantiene la lista parseada en memoria y, cuando vence DISCORD_CACHE_TTL, la
+    revalida en segundo plano con ETag/If-Modified-Since mientras sirve la copia vieja.
+    Solo se bloquea en arranque en frío (sin memoria ni disco) y si se pide block=True.
+    Tras un fallo no se reintenta hasta pasado retry_delay.
+    """
+    def __init__(self, path: Path, url: str = DISCORD_DETECTABLE_URL, ttl: int = DISCORD_CACHE_TTL,
+                 index_path: Path = DISCORD_INDEX_PATH, retry_delay: int = DISCORD_RETRY_DELAY):
+        self.path = path
+        self.url = url
+        self.ttl = ttl
+        self.retry_delay = retry_delay
+        self.index_path = index_path
+        # última confirmación del servidor (304), para no revalidar en cada arranque
+        self.validated_path = path.with_suffix(".validated.json")
+        self.apps: Optional[list] = None
+        self.version = 0            # _ts de la descarga cuyo contenido se sirve
+        self.validated_at = 0.0     # última vez que el servidor confirmó el contenido
+        self.retry_at = 0.0         # tras un fallo, no revalidar antes de este instante
+        self.etag: Optional[str] = None
+        self.last_modified: Optional[str] = None
+        self._index: Optional[DiscordMatchIndex] = None
+        self._exe_index: Optional[DiscordExeIndex] = None
+        self._lock = threading.Lock()
+        self._fetch_lock = threading.Lock()
+        self._disk_checked = False
+
+    def get(self, block: bool = True) -> list:
+        """Lista de apps. Con block=False nunca espera a la red (en frío devuelve [])."""
+        with self._lock:
+            if self.apps is None and not self._disk_checked:
+                self._disk_checked = True
+                self._load_disk()
+            apps = self.apps
+            now = time.time()
+            stale = now - self.validated_at >= self.ttl and now >= self.retry_at
+        if apps is None:
+            # arranque en frío: no hay nada que servir todavía
+            if not stale:
+                return []
+            if not block:
+                self.refresh_in_background()
+                return []
+            self._revalidate()
+            return self.apps or []
+        if stale:
+            self.refresh_in_background()
+        return apps
+
+    def refresh_in_background(self):
+        WORKERS.submit("discord-refresh", self._revalidate)
+
+    def _load_disk(self):
+        data = load_discord_apps(self.path)
+        if data is not None:
+            self.apps = data["apps"]
+            self.version = data.get("_ts", 0)
+            self.validated_at = self.version
+            self.etag = data.get("_etag")
+            self.last_modified = data.get("_last_modified")
+            validated = safe_json_load(self.validated_path) if self.validated_path.exists() else None
+            if isinstance(validated, dict) and validated.get("_ts") == self.version:
+                self.validated_at = max(self.validated_at, validated.get("validated_at") or 0)
+
+    def _revalidate(self):
+        try:
+            with self._fetch_lock:
+                if self.apps is not None and time.time() - self.validated_at < self.ttl:
+                    return  # otro hilo ya revalidó
+                headers = {}
+                if self.apps is not None:
+                    if self.etag:
+                        headers["If-None-Match"] = self.etag
+                    if self.last_modified:
+                        headers["If-Modified-Since"] = self.last_modified
+                # stream=True: cerrar siempre la respuesta para devolver la conexión al pool
+                with HTTP.get(self.url, headers=headers, timeout=15, stream=True) as resp:
+                    if resp.status_code == 304 and self.apps is not None:
+                        now = time.time()
+                        with self._lock:
+                            self.validated_at = now
+                            version = self.version
+                        save_json({"_ts": version, "validated_at": now}, self.validated_path)
+                        logger.debug("Detectable de Discord sin cambios (304).")
+                        return
+                    if resp.status_code != 200:
+                        logger.debug(f"Detectable de Discord: status {resp.status_code}")
+                        self._failed()
+                        return
+                    # parseo en streaming, proyectando cada app a medida que llega
+                    apps = [DiscordApp.from_payload(a) for a in iter_json_array(iter_response_text(resp))
+                            if isinstance(a, dict)]
+                    etag = resp.headers.get("ETag")
+                    last_modified = resp.headers.get("Last-Modified")
+                now = int(time.time())
+                # índice de trigramas reconstruido junto con la caché
+                index = DiscordMatchIndex.build(apps, now)
+                with self._lock:
+                    self.apps = apps
+                    self.version = now
+                    self.validated_at = now
+                    self.etag = etag
+                    self.last_modified = last_modified
+                    self._index = index
+                save_discord_apps(self.path, apps, {"_ts": now, "_etag": etag, "_last_modified": last_modified})
+                index.save(self.index_path)
+                logger.info(f"🔄 Detectable de Discord actualizado ({len(apps)} apps)")
+        except Exception as e:
+            logger.debug(f"Error obteniendo detectable de Discord: {e}")
+            self._failed()
+
+    def _failed(self):
+        with self._lock:
+            self.retry_at = time.time() + self.retry_delay
+
+    def get_index(self, apps: list) -> DiscordMatchIndex:
+        """Índice de trigramas para la lista devuelta por get() (memoria, disco o reconstruido)."""
+        with self._lock:
+            if apps is not self.apps:
+                # la caché cambió entre get() y esta llamada
+                return DiscordMatchIndex.build(apps)
+            version, index = self.version, self._index
+        if index is not None and index.ts == version:
+            return index
+        index = DiscordMatchIndex.load(self.index_path, version)
+        if index is None:
+            index = DiscordMatchIndex.build(apps, version)
+            index.save(self.index_path)
+        with self._lock:
+            if self.version == version:
+                self._index = index
+        return index
+
+    def ready_exe_index(self) -> Optional[DiscordExeIndex]:
+        """
+        Índice de ejecutables ya construido para la versión vigente, sin cargar disco
+        ni construir nada aquí (se llama desde el paso del PresenceEngine). Si no lo
+        hay, lo prepara en el pool y devuelve None.
+        """
+        with self._lock:
+            loaded = self.apps is not None
+            index, version = self._exe_index, self.version
+        if loaded and index is not None and index.version == version:
+            self.get(block=False)  # en memoria: solo programa la revalidación si venció
+            return index
+        WORKERS.submit("discord-exe-index", self._warm_exe_index)
+        return None
+
+    def _warm_exe_index(self):
+        apps = self.get(block=False)
+        if apps:
+            self.get_exe_index(apps)
+
+    def get_exe_index(self, apps: list) -> DiscordExeIndex:
+        """Índice exacto de ejecutables para la lista devuelta por get()."""
+        with self._lock:
+            if apps is not self.apps:
+                return DiscordExeIndex(apps)
+            version, index = self.version, self._exe_index
+        if index is not None and index.version == version:
+            return index
+        index = DiscordExeIndex(apps, version)
+        with self._lock:
+            if self.version == version:
+                self._exe_index = index
+        return index
+
+DISCORD_APPS_CACHE = DiscordAppsCache(DISCORD_COMPACT_CACHE_PATH)
+
+# ----------------- Game index -----------------
+_TRADEMARK_RE = re.compile(r'[®™]')
+# Títulos de la biblioteca/menú de GeForce NOW (ya normalizados): no son juegos
+LIBRARY_TITLES = {"", "games", "juegos", "geforce now"}
+
+def normalize_title(text: Optional[str]) -> str:
+    """Normaliza un título para comparaciones: sin ®/™, NFKC, casefold y espacios colapsados."""
+    if not text:
+        return ""
+    text = _TRADEMARK_RE.sub('', str(text))
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return " ".join(text.split())
+
+def is_library_title(title: Optional[str]) -> bool:
+    return normalize_title(title) in LIBRARY_TITLES
+
+def clean_window_title(title: str) -> str:
+    """Quita el sufijo 'en/on GeForce NOW' y los ®/™ del título de la ventana."""
+    clean = re.sub(r'\s*(en|on|in|via)?\s*GeForce\s*NOW.*$', '', title, flags=re.IGNORECASE).strip()
+    return re.sub(r'[®™]', '', clean).strip()
+
+class GameIndex:
+    """
+    Índice hash de títulos normalizados -> clave en games_map.
+    Indexa la clave del dict y los campos 'name' y 'shortName' de cada entrada.
+    Las claves del dict tienen prioridad sobre name/shortName.
+    """
+    def __init__(self, games_map: Optional[dict] = None):
+        self._by_key: Dict[str, str] = {}
+        self._by_alias: Dict[str, str] = {}
+        if games_map:
+            self.rebuild(games_map)
+
+    def rebuild(self, games_map: dict):
+        self._by_key.clear()
+        self._by_alias.clear()
+        index_rows = getattr(games_map, "index_rows", None)
+        if index_rows is not None:
+            # CompiledCatalog: indexar sin decodificar cada entrada
+            for game_key, name, short_name in index_rows():
+                self._add_fields(game_key, name, short_name)
+            return
+        for game_key, entry in games_map.items():
+            self.add(game_key, entry)
+
+    def copy(self) -> "GameIndex":
+        other = GameIndex()
+        other._by_key = dict(self._by_key)
+        other._by_alias = dict(self._by_alias)
+        return other
+
+    def add(self, game_key: str, entry: Optional[dict]):
+        if isinstance(entry, dict):
+            self._add_fields(game_key, entry.get("name"), entry.get("shortName"))
+        else:
+            self._add_fields(game_key, None, None)
+
+    def _add_fields(self, game_key: str, name: Optional[str], short_name: Optional[str]):
+        self._by_key.setdefault(normalize_title(game_key), game_key)
+        for value in (name, short_name):
+            if value:
+                self._by_alias.setdefault(normalize_title(value), game_key)
+
+    def lookup(self, title: Optional[str]) -> Optional[str]:
+        """Devuelve la clave de games_map que corresponde al título, o None."""
+        norm = normalize_title(title)
+        if norm in self._by_key:
+            return self._by_key[norm]
+        return self._by_alias.get(norm)
+
+    def __len__(self):
+        return len(self._by_key)
+
+# ----------------- Game map snapshots -----------------
+class GameMapSnapshot(Mapping):
+    """
+    Versión inmutable de games_map: la base cargada al arrancar (dict o
+    CompiledCatalog, nunca se modifica) más un delta con las entradas
+    cambiadas desde entonces, cada parte con su GameIndex. Los lectores la
+    usan sin lock; GameStore publica una nueva en cada escritura.
+    Las entradas tampoco se modifican: quien quiera cambiar una crea otra.
+    """
+    def __init__(self, base, base_index: GameIndex, delta: Optional[dict] = None,
+                 delta_index: Optional[GameIndex] = None, version: int = 0, decoded: Optional[dict] = None):
+        self._base = base
+        self._base_index = base_index
+        self._delta = delta or {}
+        self._delta_index = delta_index or GameIndex()
+        self._extra = sum(1 for k in self._delta if k not in base)
+        # entradas del catálogo compilado ya decodificadas (compartido entre versiones)
+        self._decoded = {} if decoded is None else decoded
+        self.version = version
+
+    def evolve(self, entries: dict) -> "GameMapSnapshot":
+        """Nueva versión con entries aplicadas sobre el delta (copia del delta, no de la base)."""
+        delta = dict(self._delta)
+        delta.update(entries)
+        index = self._delta_index.copy()
+        for game_key, entry in entries.items():
+            index.add(game_key, entry)
+        return GameMapSnapshot(self._base, self._base_index, delta, index, self.version + 1, self._decoded)
+
+    def __getitem__(self, key):
+        if key in self._delta:
+            return self._delta[key]
+        if isinstance(self._base, dict):
+            return self._base[key]
+        entry = self._decoded.get(key)
+        if entry is None:
+            if key not in self._base:
+                raise KeyError(key)
+            entry = self._decoded[key] = self._base.get(key)
+        return entry
+
+    def __contains__(self, key):
+        return key in self._delta or key in self._base
+
+    def __iter__(self):
+        for key in self._base.keys():
+            yield key
+        for key in self._delta:
+            if key not in self._base:
+                yield key
+
+    def __len__(self):
+        return len(self._base) + self._extra
+
+    def lookup(self, title: Optional[str]) -> Optional[str]:
+        """Clave de games_map que corresponde al título en esta versión, o None."""
+        norm = normalize_title(title)
+        base, delta = self._base_index, self._delta_index
+        return (base._by_key.get(norm) or delta._by_key.get(norm)
+                or base._by_alias.get(norm) or delta._by_alias.get(norm))
+
+    def materialize(self) -> dict:
+        """Copia completa como dict normal (sin cachear las entradas decodificadas)."""
+        out = {}
+        for key in self:
+            if key in self._delta:
+                entry = self._delta[key]
+            elif isinstance(self._base, dict):
+                entry = self._base[key]
+            else:
+                entry = self._decoded.get(key) or self._base.get(key)
+            out[key] = dict(entry) if isinstance(entry, dict) else entry
+        return out
+
+    @property
+    def changed(self) -> int:
+        return len(self._delta)
+
+class GameStore:
+    """
+    Dueño de games_map. Las escrituras (tick, matches de Discord en el pool,
+    tray) se serializan entre sí y publican una GameMapSnapshot nueva con una
+    sola asignación; los lectores toman `snapshot` y no bloquean nunca.
+    Cada escritura es un delta (campos a cambiar) aplicado sobre la versión
+    vigente, así dos escritores de la misma entrada no se pisan.
+    """
+    def __init__(self, base=None):
+        base = {} if base is None else base
+        self._lock = threading.Lock()
+        self.snapshot = GameMapSnapshot(base, GameIndex(base))
+
+    def update(self, game_key: str, changes: dict, keep_existing: bool = False) -> dict:
+        """
+        Aplica changes a la entrada vigente (o a una vacía) y publica. Con
+        keep_existing solo se añaden los campos que la entrada no tenga.
+        Devuelve la entrada publicada.
+        """
+        with self._lock:
+            current = self.snapshot.get(game_key)
+            entry = dict(current) if isinstance(current, dict) else {}
+            if keep_existing:
+                for field, value in changes.items():
+                    entry.setdefault(field, value)
+            else:
+                entry.update(changes)
+            self.snapshot = self.snapshot.evolve({game_key: entry})
+        return entry
+
+    def put(self, game_key: str, entry: dict):
+        self.put_many({game_key: entry})
+
+    def put_many(self, entries: dict):
+        """Sustituye varias entradas en una sola versión."""
+        if not entries:
+            return
+        with self._lock:
+            self.snapshot = self.snapshot.evolve(entries)
+
+    def stats(self) -> dict:
+        snapshot = self.snapshot
+        return {"version": snapshot.version, "entries": len(snapshot), "changed": snapshot.changed}
+
+# ----------------- Window title sources -----------------
+def scan_geforce_window(processes: Optional[ProcessSnapshot] = None) -> tuple[Optional[int], Optional[str]]:
+    """Recorre las ventanas visibles y devuelve (hwnd, título) de la primera de GeForce NOW."""
+    try:
+        import win32gui, win32process # type: ignore
+    except ImportError:
+        return None, None
+    processes = processes or PROCESSES
+    hwnds = []
+    win32gui.EnumWindows(lambda h, p: p.append(h) if win32gui.IsWindowVisible(h) else None, hwnds)
+    for hwnd in hwnds:
+        try:
+            _, pid = win32process.GetWindowThreadProcessId(hwnd)
+            if pid == processes.gfn_pid:
+                return hwnd, win32gui.GetWindowText(hwnd)
+            proc_name = processes.name_of(pid) or ""
+        except Exception:
+            continue
+        if ProcessSnapshot.GEFORCE_MARKER in proc_name:
+            return hwnd, win32gui.GetWindowText(hwnd)
+    return None, None
+
+def scan_geforce_window_title(processes: Optional[ProcessSnapshot] = None) -> Optional[str]:
+    return scan_geforce_window(processes)[1]
+
+class WindowSource:
+    """
+    Fuente del título de la ventana de GeForce NOW.
+    Los backends publican los cambios con _publish(); el loop lee current_title()
+    y puede dormir en wait_for_change() hasta que llegue uno.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._changed = threading.Event()
+        self._title: Optional[str] = None
+        self._listeners = []
+        self.poll_on_read = False  # True: current_title() sondea antes de leer
+
+    def start(self):
+        pass
+
+    def poll(self):
+        """Sondea el título si el backend lo necesita (bloqueante). Los de eventos no hacen nada."""
+
+    def stop(self):
+        self._changed.set()
+
+    def wake(self):
+        """Despierta a quien esté en wait_for_change() sin cambiar el título."""
+        self._changed.set()
+
+    def add_listener(self, callback):
+        """callback(title) se invoca en el hilo del backend en cada cambio de título."""
+        self._listeners.append(callback)
+
+    def current_title(self) -> Optional[str]:
+        with self._lock:
+            return self._title
+
+    def wait_for_change(self, timeout: float) -> bool:
+        changed = self._changed.wait(timeout)
+        self._changed.clear()
+        return changed
+
+    def _publish(self, title: Optional[str]):
+        with self._lock:
+            if title == self._title:
+                return
+            self._title = title
+        self._changed.set()
+        for callback in list(self._listeners):
+            try:
+                callback(title)
+            except Exception as e:
+                logger.debug(f"Error en listener de ventana: {e}")
+
+class PollingWindowSource(WindowSource):
+    """Respaldo: enumera ventanas (EnumWindows) cada vez que se pide el título."""
+    def __init__(self, scan=None, processes: Optional[ProcessSnapshot] = None):
+        super().__init__()
+        self._scan = scan or (lambda: scan_geforce_window_title(processes))
+        self.poll_on_read = True  # PresenceEngine lo desactiva y sondea en un hilo antes de cada paso
+
+    def poll(self):
+        self._publish(self._scan())
+
+    def current_title(self) -> Optional[str]:
+        if self.poll_on_read:
+            self.poll()
+        return super().current_title()
+
+    def wait_for_change(self, timeout: float) -> bool:
+        # los cambios se descubren al sondear; solo stop() despierta antes
+        self._changed.clear()
+        return self._changed.wait(timeout)
+
+class WinEventWindowSource(WindowSource):
+    """
+    Backend de Windows basado en SetWinEventHook: cambios de nombre, primer plano,
+    aparición y destrucción de ventanas. Un hilo propio bombea los mensajes y solo
+    reescanea cuando el evento afecta a una ventana de nivel superior.
+    """
+    EVENT_SYSTEM_FOREGROUND = 0x0003
+    EVENT_OBJECT_DESTROY = 0x8001
+    EVENT_OBJECT_SHOW = 0x8002
+    EVENT_OBJECT_HIDE = 0x8003
+    EVENT_OBJECT_NAMECHANGE = 0x800C
+    WINEVENT_OUTOFCONTEXT = 0x0000
+    WINEVENT_SKIPOWNPROCESS = 0x0002
+    OBJID_WINDOW = 0
+    WM_QUIT = 0x0012
+
+    PID_CACHE_LIMIT = 4096
+    PID_RECENT_TTL = 2.0  # segundos en que un pid ya visto se da por el mismo proceso
+
+    def __init__(self, scan=None, processes: Optional[ProcessSnapshot] = None):
+        super().__init__()
+        self._processes = processes or PROCESSES
+        self._scan = scan or (lambda: scan_geforce_window(self._processes))
+        self._hwnd = None
+        self._thread: Optional[threading.Thread] = None
+        self._thread_id = None
+        self._pid_is_gfn: Dict[int, tuple[float, bool, float]] = {}  # pid -> (create_time, es GFN, visto)
+        self._ready = threading.Event()
+
+    def start(self):
+        self._refresh()
+        self._thread = threading.Thread(target=self._pump, daemon=True)
+        self._thread.start()
+        self._ready.wait(2)
+
+    def stop(self):
+        super().stop()
+        if self._thread_id:
+            try:
+                import ctypes
+                ctypes.windll.user32.PostThreadMessageW(self._thread_id, self.WM_QUIT, 0, 0)
+            except Exception:
+                pass
+
+    def _refresh(self):
+        self._hwnd, title = self._scan()
+        self._publish(title)
+
+    def _is_gfn_pid(self, pid: int) -> bool:
+        if pid == self._processes.gfn_pid:
+            return True
+        now = time.monotonic()
+        cached = self._pid_is_gfn.get(pid)
+        if cached is not None and now - cached[2] <= self.PID_RECENT_TTL:
+            return cached[1]
+        # un pid reutilizado tiene otro create_time: no hereda la clasificación anterior
+        create_time = self._processes.create_time_of(pid)
+        if create_time is None:
+            self._pid_is_gfn.pop(pid, None)
+            return False
+        if cached is not None and cached[0] == create_time:
+            is_gfn = cached[1]
+        else:
+            name = self._processes.name_of(pid, create_time)
+            if name is None:
+                return False
+            is_gfn = ProcessSnapshot.GEFORCE_MARKER in name
+            if len(self._pid_is_gfn) >= self.PID_CACHE_LIMIT:
+                self._pid_is_gfn.clear()
+        self._pid_is_gfn[pid] = (create_time, is_gfn, now)
+        return is_gfn
+
+    def _pump(self):
+        import ctypes
+        from ctypes import wintypes
+        user32 = ctypes.windll.user32
+        self._thread_id = ctypes.windll.kernel32.GetCurrentThreadId()
+        WinEventProc = ctypes.WINFUNCTYPE(None, wintypes.HANDLE, wintypes.DWORD, wintypes.HWND,
+                                          wintypes.LONG, wintypes.LONG, wintypes.DWORD, wintypes.DWORD)
+        user32.SetWinEventHook.restype = wintypes.HANDLE
+
+        def callback(hook, event, hwnd, id_object, id_child, thread_id, ms_time):
+            if id_object != self.OBJID_WINDOW or id_child != 0 or not hwnd:
+                return
+            if event in (self.EVENT_OBJECT_DESTROY, self.EVENT_OBJECT_HIDE):
+                if hwnd == self._hwnd:
+                    self._pid_is_gfn.clear()  # el pid pudo terminar
+                    self._refresh()
+                return
+            pid = wintypes.DWORD()
+            user32.GetWindowThreadProcessId(hwnd, ctypes.byref(pid))
+            if self._is_gfn_pid(pid.value):
+                self._refresh()
+
+        self._proc = WinEventProc(callback)  # mantener referencia viva
+        flags = self.WINEVENT_OUTOFCONTEXT | self.WINEVENT_SKIPOWNPROCESS
+        hooks = [user32.SetWinEventHook(ev_min, ev_max, 0, self._proc, 0, 0, flags) for ev_min, ev_max in (
+            (self.EVENT_SYSTEM_FOREGROUND, self.EVENT_SYSTEM_FOREGROUND),
+            (self.EVENT_OBJECT_DESTROY, self.EVENT_OBJECT_HIDE),
+            (self.EVENT_OBJECT_NAMECHANGE, self.EVENT_OBJECT_NAMECHANGE),
+        )]
+        self._ready.set()
+        try:
+            msg = wintypes.MSG()
+            while user32.GetMessageW(ctypes.byref(msg), 0, 0, 0) > 0:
+                user32.TranslateMessage(ctypes.byref(msg))
+                user32.DispatchMessageW(ctypes.byref(msg))
+        finally:
+            for h in hooks:
+                if h:
+                    user32.UnhookWinEvent(h)
+
+class FakeWindowSource(WindowSource):
+    """Backend programable para pruebas (sin Windows): push() o un guion de (segundos, título)."""
+    def __init__(self, title: Optional[str] = None, script: Optional[list] = None):
+        super().__init__()
+        self._title = title
+        self._script = list(script or [])
+        self._stop = threading.Event()
+
+    def push(self, title: Optional[str]):
+        self._publish(title)
+
+    def start(self):
+        if self._script:
+            threading.Thread(target=self._play, daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+        super().stop()
+
+    def _play(self):
+        for delay, title in self._script:
+            if self._stop.wait(delay):
+                return
+            self._publish(title)
+
+def create_window_source(kind: Optional[str] = None, processes: Optional[ProcessSnapshot] = None) -> WindowSource:
+    """WINDOW_SOURCE=auto|events|polling (auto: hooks en Windows, sondeo en otro caso)."""
+    kind = (kind or os.getenv("WINDOW_SOURCE", "auto")).strip().lower()
+    if kind in ("auto", "events") and sys.platform == "win32":
+        return WinEventWindowSource(processes=processes)
+    return PollingWindowSource(processes=processes)
+
+# ----------------- Metrics -----------------
+class StageHistogram:
+    """Histograma de duraciones con buckets fijos (segundos), al estilo Prometheus."""
+    BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # el último es +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, n in zip(self.buckets + (float("inf"),), self.counts):
+            total += n
+            yield bound, total
+
+class MetricsRegistry:
+    """
+    Histogramas por etapa y contadores, exportados en formato de texto de Prometheus.
+    Las etapas se miden envolviendo métodos con instrument() solo cuando las
+    métricas están activas (METRICS_PORT): desactivadas no hay ni un if en el tick.
+    Los contadores que ya llevan las clases (caché de Steam, RPC, AppIDs...) se
+    leen en cada scrape con add_collector(), sin duplicarlos.
+    """
+    PREFIX = "geforce_presence"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages: Dict[str, StageHistogram] = {}
+        self._collectors = []
+
+    def observe(self, stage: str, seconds: float):
+        with self._lock:
+            hist = self._stages.get(stage)
+            if hist is None:
+                hist = self._stages[stage] = StageHistogram()
+            hist.observe(seconds)
+
+    def timed(self, stage: str, fn):
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.observe(stage, time.perf_counter() - t0)
+        wrapper.__wrapped__ = fn
+        wrapper.metrics_stage = stage
+        return wrapper
+
+    def instrument(self, obj, attr: str, stage: str):
+        """Sustituye obj.attr (método ligado) por su versión cronometrada (una sola vez)."""
+        fn = getattr(obj, attr)
+        if getattr(fn, "metrics_stage", None) == stage:
+            return
+        setattr(obj, attr, self.timed(stage, fn))
+
+    def add_collector(self, collect):
+        """collect() -> iterable de (nombre, tipo, ayuda, valor[, etiquetas])."""
+        self._collectors.append(collect)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {k: {"count": h.count, "sum": h.sum} for k, h in self._stages.items()}
+
+    @staticmethod
+    def _labels(labels: Optional[dict]) -> str:
+        if not labels:
+            return ""
+        body = ",".join(f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+                        for k, v in labels.items())
+        return "{" + body + "}"
+
+    def render(self) -> str:
+        p = self.PREFIX
+        lines = [
+            f"# HELP {p}_stage_seconds Duración de cada etapa del loop de presencia.",
+            f"# TYPE {p}_stage_seconds histogram",
+        ]
+        with self._lock:
+            stages = {k: (list(h.cumulative()), h.sum, h.count) for k, h in sorted(self._stages.items())}
+        for stage, (buckets, total, count) in stages.items():
+            for bound, n in buckets:
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{p}_stage_seconds_bucket{{stage="{stage}",le="{le}"}} {n}')
+            lines.append(f'{p}_stage_seconds_sum{{stage="{stage}"}} {total}')
+            lines.append(f'{p}_stage_seconds_count{{stage="{stage}"}} {count}')
+        declared = set()
+        for collect in list(self._collectors):
+            try:
+                samples = list(collect())
+            except Exception as e:
+                logger.debug(f"Error en colector de métricas: {e}")
+                continue
+            for sample in samples:
+                name, kind, help_text, value = sample[:4]
+                labels = sample[4] if len(sample) > 4 else None
+                if value is None:
+                    continue
+                full = f"{p}_{name}"
+                if full not in declared:
+                    declared.add(full)
+                    lines.append(f"# HELP {full} {help_text}")
+                    lines.append(f"# TYPE {full} {kind}")
+                lines.append(f"{full}{self._labels(labels)} {float(value)}")
+        return "\n".join(lines) + "\n"
+
+class MetricsServer:
+    """Endpoint HTTP local (GET /metrics) en un hilo daemon."""
+
+    def __init__(self, registry: MetricsRegistry, port: int, host: str = METRICS_BIND):
+        registry_ref = registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = registry_ref.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, fmt, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="metrics-http", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        try:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+        except Exception:
+            pass
+
+METRICS: Optional[MetricsRegistry] = None
+METRICS_SERVER: Optional[MetricsServer] = None
+
+def enable_metrics(port: int = METRICS_PORT, host: str = METRICS_BIND) -> Optional[MetricsRegistry]:
+    """Activa el registro global y el endpoint. Llamar antes de crear PresenceManager."""
+    global METRICS, METRICS_SERVER
+    if METRICS is None:
+        METRICS = MetricsRegistry()
+    if METRICS_SERVER is None and port:
+        try:
+            METRICS_SERVER = MetricsServer(METRICS, port, host).start()
+            logger.info(f"📈 Métricas en http://{host}:{METRICS_SERVER.port}/metrics")
+        except OSError as e:
+            logger.error(f"❌ No se pudo abrir el endpoint de métricas en {host}:{port}: {e}")
+    return METRICS
+
+# ----------------- Tick scheduler -----------------
+class TickScheduler:
+    """
+    Decide cuánto dormir entre ticks según el estado:
+    - absent: GeForce NOW no está en ejecución (cadencia lenta)
+    - fast: durante fast_window segundos tras un cambio de título
+    - stable: mismo título desde hace rato (cadencia normal)
+    Guarda las últimas decisiones y los despertares por estado.
+    """
+    ABSENT, FAST, STABLE = "absent", "fast", "stable"
+
+    def __init__(self, stable: float = UPDATE_INTERVAL, absent: float = TICK_ABSENT_INTERVAL,
+                 fast: float = TICK_FAST_INTERVAL, fast_window: float = TICK_FAST_WINDOW,
+                 clock=time.monotonic, history: int = 256):
+        self.intervals = {self.ABSENT: absent, self.FAST: fast, self.STABLE: stable}
+        self.fast_window = fast_window
+        self._clock = clock
+        self._last_title = None
+        self._changed_at: Optional[float] = None
+        self.decisions = deque(maxlen=history)
+        self.wakeups = Counter()
+        self.title_changes = 0
+
+    def next_interval(self, gfn_running: bool, title: Optional[str] = None) -> float:
+        now = self._clock()
+        if not gfn_running:
+            state = self.ABSENT
+            self._last_title = None
+        else:
+            if title != self._last_title:
+                self._last_title = title
+                self._changed_at = now
+                self.title_changes += 1
+            if self._changed_at is not None and now - self._changed_at < self.fast_window:
+                state = self.FAST
+            else:
+                state = self.STABLE
+        interval = self.intervals[state]
+        self.wakeups[state] += 1
+        self.decisions.append({"at": now, "state": state, "interval": interval, "title": title})
+        return interval
+
+    def stats(self) -> dict:
+        return {
+            "wakeups": dict(self.wakeups),
+            "total_wakeups": sum(self.wakeups.values()),
+            "title_changes": self.title_changes,
+            "intervals": dict(self.intervals),
+        }
+
+class TransitionDebouncer:
+    """
+    Filtro entre find_active_game y update_presence: un cambio de juego (que
+    cierra/lanza ejecutables falsos y corta la conexión RPC) solo se confirma
+    cuando el título nuevo se mantiene estable:
+    - desde la biblioteca o sin juego: el juego nuevo tiene que verse
+      enter_delay segundos seguidos
+    - de un juego a otro: switch_delay segundos; los títulos de biblioteca
+      entre medias (pantallas de carga) no reinician la espera
+    - de un juego a la biblioteca ("Games", "GeForce NOW" a secas) o sin
+      ventana: la sesión se mantiene library_grace segundos; si el juego
+      vuelve antes, no ha pasado nada
+    Mientras un cambio está pendiente observe() devuelve el juego confirmado.
+    Con todos los plazos a 0 deja pasar todo (comportamiento anterior).
+    """
+
+    def __init__(self, enter_delay: float = TRANSITION_ENTER_DELAY, switch_delay: float = TRANSITION_SWITCH_DELAY,
+                 library_grace: float = TRANSITION_LIBRARY_GRACE, clock=time.monotonic):
+        self.enter_delay = enter_delay
+        self.switch_delay = switch_delay
+        self.library_grace = library_grace
+        self._clock = clock
+        self.committed: Optional[dict] = None
+        self._candidate: Optional[dict] = None
+        self._candidate_since: Optional[float] = None
+        self._candidate_seen: Optional[float] = None
+        self._showing_candidate = False
+        self._away_since: Optional[float] = None
+        self.observations = 0
+        self.commits = 0
+        self.held = 0
+        self.abandoned = 0
+
+    @staticmethod
+    def is_game(game: Optional[dict]) -> bool:
+        # image "lib": biblioteca o título basura sin entrada en el catálogo
+        return (bool(game) and game.get("name") is not None and game.get("image") != "lib"
+                and not is_library_title(game.get("name")))
+
+    @staticmethod
+    def _key(game: Optional[dict]) -> Optional[str]:
+        return None if not game or game.get("name") is None else normalize_title(game.get("name"))
+
+    def _delay(self) -> float:
+        return self.switch_delay if self.is_game(self.committed) else self.enter_delay
+
+    def observe(self, game: Optional[dict]) -> Optional[dict]:
+        """Juego detectado en este tick -> juego con el que actualizar la presencia."""
+        now = self._clock()
+        self.observations += 1
+        self._showing_candidate = False
+        committed = self.committed
+        if self.is_game(game):
+            self._away_since = None
+            if self._key(game) == self._key(committed):
+                self._drop_candidate()
+                self.committed = game  # misma sesión, datos más recientes
+                return game
+            delay = self._delay()
+            # otro juego, o el candidato lleva más del plazo sin verse: la espera empieza de nuevo
+            if (self._candidate is None or self._key(self._candidate) != self._key(game)
+                    or now - self._candidate_seen > delay):
+                self._drop_candidate()
+                self._candidate_since = now
+            self._candidate = game
+            self._candidate_seen = now
+            if now - self._candidate_since >= delay:
+                self._drop_candidate(committed=True)
+                return self._commit(game)
+            self._showing_candidate = True
+            self.held += 1
+            return committed
+        if not self.is_game(committed):
+            # nada que proteger (biblioteca -> biblioteca o sin juego); el candidato sigue esperando
+            return self._commit(game)
+        if self._away_since is None:
+            self._away_since = now
+        if now - self._away_since >= self.library_grace:
+            self._drop_candidate()
+            return self._commit(game)
+        self.held += 1
+        return committed
+
+    def _commit(self, game: Optional[dict]) -> Optional[dict]:
+        if self._key(game) != self._key(self.committed):
+            self.commits += 1
+        self.committed = game
+        self._away_since = None
+        return game
+
+    def _drop_candidate(self, committed: bool = False):
+        if self._candidate is not None and not committed:
+            self.abandoned += 1
+        self._candidate = self._candidate_since = self._candidate_seen = None
+
+    def seconds_until_commit(self) -> Optional[float]:
+        """Cuánto falta para confirmar el cambio que se está viendo ahora (None si no hay)."""
+        now = self._clock()
+        if self._showing_candidate:
+            return max(0.0, self._candidate_since + self._delay() - now)
+        if self._away_since is not None:
+            return max(0.0, self._away_since + self.library_grace - now)
+        return None
+
+    def reset(self):
+        """GeForce NOW cerrado: sin sesión que proteger."""
+        self.committed = None
+        self._candidate = self._candidate_since = self._candidate_seen = None
+        self._showing_candidate = False
+        self._away_since = None
+
+    def stats(self) -> dict:
+        return {
+            "committed": (self.committed or {}).get("name"),
+            "pending": (self._candidate or {}).get("name"),
+            "away": self._away_since is not None,
+            "observations": self.observations,
+            "commits": self.commits,
+            "held": self.held,
+            "abandoned": self.abandoned,
+        }
+
+# ----------------- Fake executables -----------------
+class FakeExecutableManager:
+    """
+    Ejecutables falsos para que Discord detecte el juego: dumb.exe con la ruta
+    relativa que Discord espera, dentro de FAKE_GAME_DIR.
+    - stage(): deja el archivo listo por adelantado (hardlink a dumb.exe; copia
+      si el hardlink no es posible, p.ej. otro volumen)
+    - launch(): arranca el staged y recuerda el PID lanzado
+    - stop(): termina los PIDs propios en paralelo con un plazo total; sin
+      esperar, el reaper de fondo los remata al vencer el plazo
+    - collect_garbage(): borra del staging lo que no es reciente ni está en uso
+    Los PIDs lanzados y los juegos recientes se guardan en FAKE_EXEC_STATE_PATH
+    para limpiar huérfanos de una sesión anterior sin recorrer todos los procesos.
+    """
+
+    def __init__(self, source: Path = DUMB_EXE_PATH, root: Path = FAKE_GAME_DIR,
+                 state_path: Optional[Path] = FAKE_EXEC_STATE_PATH, keep_recent: int = FAKE_EXEC_KEEP_RECENT,
+                 deadline: float = FAKE_EXEC_STOP_DEADLINE, popen=subprocess.Popen,
+                 process_info=None, workers: Optional[WorkerPool] = None):
+        self.source = Path(source)
+        self.root = Path(root)
+        self.state_path = state_path
+        self.keep_recent = keep_recent
+        self.deadline = deadline
+        self._popen = popen
+        self._process_info = process_info or _psutil_process_info
+        self.workers = workers or WORKERS
+        self._lock = threading.Lock()
+        self._running: Dict[int, tuple] = {}  # pid -> (Popen, ruta, create_time)
+        self._recent = []  # rutas relativas, la más reciente primero
+        self._reaping = []  # (Popen, instante límite) terminados sin esperar
+        self._reaper: Optional[threading.Thread] = None
+        self.links = 0
+        self.copies = 0
+        self.launches = 0
+        self.killed = 0
+        self._load_state()
+
+    # ---- estado persistente ----
+    def _load_state(self):
+        if not self.state_path or not Path(self.state_path).exists():
+            self._orphans = []
+            return
+        data = safe_json_load(Path(self.state_path)) or {}
+        self._recent = [p for p in data.get("recent", []) if isinstance(p, str)][: self.keep_recent]
+        self._orphans = [tuple(x) for x in data.get("pids", []) if isinstance(x, list) and len(x) == 2]
+
+    def _save_state(self):
+        if not self.state_path:
+            return
+        with self._lock:
+            data = {
+                "recent": list(self._recent),
+                "pids": [[pid, info[2]] for pid, info in self._running.items() if info[2] is not None],
+            }
+        save_json(data, Path(self.state_path))
+
+    # ---- staging ----
+    def path_for(self, executable_path: str) -> Path:
+        rel = Path(executable_path.replace("\\", "/").lstrip("/"))
+        return self.root / rel
+
+    def _is_fresh(self, target: Path) -> bool:
+        try:
+            t, s = target.stat(), self.source.stat()
+        except OSError:
+            return False
+        if (t.st_dev, t.st_ino) == (s.st_dev, s.st_ino):
+            return True
+        return t.st_size == s.st_size and int(t.st_mtime) == int(s.st_mtime)
+
+    def stage(self, executable_path: str) -> Optional[Path]:
+        """Deja preparado el ejecutable (sin lanzarlo). None si no se pudo."""
+        target = self.path_for(executable_path)
+        if self._is_fresh(target):
+            return target
+        if not self.source.exists():
+            logger.error(f"❌ dumb.exe no encontrado en {self.source}")
+            return None
+        try:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            tmp = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+            try:
+                tmp.unlink()
+            except FileNotFoundError:
+                pass
+            try:
+                os.link(self.source, tmp)
+                self.links += 1
+            except OSError:
+                shutil.copy2(self.source, tmp)
+                self.copies += 1
+            os.replace(tmp, target)
+            return target
+        except OSError as e:
+            # p.ej. una versión anterior sigue en ejecución y está bloqueada
+            if target.exists():
+                logger.debug(f"No se pudo renovar {target}: {e}")
+                return target
+            logger.error(f"❌ No se pudo preparar ejecutable falso {target}: {e}")
+            return None
+
+    def stage_in_background(self, executable_paths):
+        for p in executable_paths:
+            if p:
+                self.workers.submit(("fake-exec-stage", p), self.stage, p)
+
+    def start(self):
+        """Al arrancar: cerrar huérfanos de la sesión anterior, limpiar y preparar recientes."""
+        def _work():
+            self.reap_orphans()
+            self.collect_garbage()
+            for p in list(self._recent):
+                self.stage(p)
+        self.workers.submit("fake-exec-start", _work)
+
+    # ---- procesos ----
+    def is_running(self, executable_path: str) -> bool:
+        target = self.path_for(executable_path)
+        with self._lock:
+            return any(path == target and proc.poll() is None for proc, path, _ in self._running.values())
+
+    def launch(self, executable_path: str) -> Optional[int]:
+        if self.is_running(executable_path):
+            logger.debug(f"🚀 Ejecutable ya en ejecución: {self.path_for(executable_path)}")
+            return None
+        target = self.stage(executable_path)
+        if target is None:
+            return None
+        logger.info(f"🚀 Ejecutando ejecutable falso: {target}")
+        proc = self._popen([str(target)], cwd=str(target.parent))
+        info = self._process_info(proc.pid)
+        with self._lock:
+            self._running[proc.pid] = (proc, target, info[1] if info else None)
+            rel = str(target.relative_to(self.root))
+            if rel in self._recent:
+                self._recent.remove(rel)
+            self._recent.insert(0, rel)
+            evicted = self._recent[self.keep_recent:]
+            del self._recent[self.keep_recent:]
+            self.launches += 1
+        self._save_state()
+        for rel in evicted:
+            self._remove_staged(self.root / rel)
+        return proc.pid
+
+    def stop(self, wait: bool = False, deadline: Optional[float] = None) -> int:
+        """
+        Termina todos los ejecutables lanzados. Con wait=False vuelve enseguida y
+        el reaper de fondo hace kill() a los que sigan vivos al vencer el plazo;
+        con wait=True espera como mucho `deadline` segundos en total.
+        """
+        deadline = self.deadline if deadline is None else deadline
+        with self._lock:
+            procs = [proc for proc, _, _ in self._running.values()]
+            self._running.clear()
+        alive = []
+        for proc in procs:
+            if proc.poll() is None:
+                logger.info(f"🛑 Cerrando ejecutable falso (PID {proc.pid})")
+                try:
+                    proc.terminate()
+                except Exception as e:
+                    logger.debug(f"terminate() falló para PID {proc.pid}: {e}")
+                alive.append(proc)
+        if procs:
+            self._save_state()
+        if not alive:
+            return 0
+        end = time.monotonic() + deadline
+        if wait:
+            self._await(alive, end)
+        else:
+            with self._lock:
+                self._reaping.extend((proc, end) for proc in alive)
+                if self._reaper is None or not self._reaper.is_alive():
+                    self._reaper = threading.Thread(target=self._reap_loop, name="fake-exec-reaper", daemon=True)
+                    self._reaper.start()
+        return len(alive)
+
+    def _await(self, procs, end: float):
+        # todos recibieron terminate() a la vez: el plazo es común, no por proceso
+        for proc in procs:
+            try:
+                proc.wait(timeout=max(0.0, end - time.monotonic()))
+            except Exception:
+                try:
+                    proc.kill()
+                    self.killed += 1
+                except Exception:
+                    pass
+
+    def _reap_loop(self):
+        while True:
+            with self._lock:
+                pending, self._reaping = self._reaping, []
+                if not pending:
+                    self._reaper = None
+                    return
+            self._await([proc for proc, _ in pending], max(end for _, end in pending))
+            self.collect_garbage()
+
+    def reap_orphans(self):
+        """Cierra los ejecutables falsos que dejó una sesión anterior (PIDs guardados)."""
+        orphans, self._orphans = self._orphans, []
+        for pid, create_time in orphans:
+            info = self._process_info(pid)
+            if info is None or info[1] != create_time:
+                continue
+            try:
+                p = psutil.Process(pid)
+                if not str(p.exe()).lower().startswith(str(self.root).lower()):
+                    continue
+                p.kill()
+                self.killed += 1
+                logger.info(f"🛑 Ejecutable falso huérfano cerrado (PID {pid})")
+            except Exception as e:
+                logger.debug(f"No se pudo cerrar huérfano {pid}: {e}")
+        if orphans:
+            self._save_state()
+
+    # ---- limpieza del staging ----
+    def _remove_staged(self, path: Path):
+        with self._lock:
+            if any(p == path for _, p, _ in self._running.values()):
+                return
+        try:
+            path.unlink()
+        except OSError:
+            return
+        parent = path.parent
+        while parent != self.root and self.root in parent.parents:
+            try:
+                parent.rmdir()
+            except OSError:
+                break
+            parent = parent.parent
+
+    def collect_garbage(self) -> int:
+        """Borra archivos del staging que no son recientes ni están en uso."""
+        if not self.root.exists():
+            return 0
+        with self._lock:
+            keep = {self.root / rel for rel in self._recent}
+            keep.update(p for _, p, _ in self._running.values())
+        removed = 0
+        for dirpath, dirnames, filenames in os.walk(self.root, topdown=False):
+            for name in filenames:
+                path = Path(dirpath) / name
+                if path in keep:
+                    continue
+                try:
+                    path.unlink()
+                    removed += 1
+                except OSError:
+                    pass  # en uso (Windows no deja borrar un .exe en ejecución)
+            if Path(dirpath) != self.root:
+                try:
+                    os.rmdir(dirpath)
+                except OSError:
+                    pass
+        if removed:
+            logger.debug(f"🧹 Staging de ejecutables falsos: {removed} archivos borrados")
+        return removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "running": len(self._running),
+                "reaping": len(self._reaping),
+                "recent": list(self._recent),
+                "links": self.links,
+                "copies": self.copies,
+                "launches": self.launches,
+                "killed": self.killed,
+            }
+
+# ----------------- Discord RPC connections -----------------
+def is_rpc_connection_error(e: BaseException) -> bool:
+    """Errores que indican que el pipe/socket con Discord ya no sirve."""
+    if isinstance(e, (OSError, EOFError)):
+        return True
+    msg = str(e).lower()
+    return "pipe was closed" in msg or "socket.send()" in msg or "event loop is closed" in msg
+
+class RpcConnectionManager:
+    """
+    Conexiones con el IPC de Discord gestionadas desde un hilo propio:
+    - use(client_id): pide el corte a ese client_id; si ya hay una conexión
+      en espera (standby) para él, el corte es inmediato. Si no, se abre en
+      segundo plano y la conexión actual sigue sirviendo hasta entonces.
+    - prepare(client_id): abre por adelantado la conexión de un client_id que
+      se va a necesitar pronto (una sola en espera).
+    - call(fn): ejecuta fn(presence) sobre la conexión activa; si falla por
+      socket/pipe la marca como caída y se reconecta con backoff exponencial
+      y jitter, sin bloquear al que llama.
+    La conexión sustituida se limpia (clear) y queda en espera para volver
+    rápido a ella; la que ocupaba la espera se cierra.
+    """
+
+    def __init__(self, factory=Presence, backoff_base: float = RPC_BACKOFF_BASE,
+                 backoff_max: float = RPC_BACKOFF_MAX, jitter: float = 0.5,
+                 rng=random.random, clock=time.monotonic):
+        self._factory = factory
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.jitter = jitter
+        self._rng = rng
+        self._clock = clock
+        self._lock = threading.Lock()
+        # serializa el uso de los clientes pypresence (no son thread-safe)
+        self._io_lock = threading.RLock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+        self._active = None  # (client_id, presence)
+        self._standby = None  # (client_id, presence)
+        self._target: Optional[str] = None
+        self._wanted_standby: Optional[str] = None
+        self._retired = []
+        self._failures = 0
+        self._retry_at = 0.0
+        self._listeners = []
+        self.connects = 0
+        self.connect_failures = 0
+        self.cutovers = 0
+        self.standby_hits = 0
+        self.drops = 0
+
+    # ---- ciclo de vida ----
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="rpc-connections", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0):
+        self._stopped = True
+        self._signal()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        with self._lock:
+            entries = [e for e in (self._active, self._standby) if e] + self._retired
+            self._active = self._standby = None
+            self._retired = []
+        for entry in entries:
+            self._close(entry)
+
+    def add_listener(self, callback):
+        """callback(client_id) en el hilo de conexiones cada vez que cambia la activa."""
+        self._listeners.append(callback)
+
+    # ---- estado ----
+    @property
+    def client(self):
+        entry = self._active
+        return entry[1] if entry else None
+
+    @property
+    def client_id(self) -> Optional[str]:
+        entry = self._active
+        return entry[0] if entry else None
+
+    @property
+    def connected(self) -> bool:
+        return self._active is not None
+
+    @property
+    def target(self) -> Optional[str]:
+        return self._target
+
+    def wait_connected(self, client_id: Optional[str] = None, timeout: float = 5.0) -> bool:
+        deadline = self._clock() + timeout
+        while True:
+            entry = self._active
+            if entry and (client_id is None or entry[0] == client_id):
+                return True
+            if self._clock() >= deadline:
+                return False
+            time.sleep(0.05)
+
+    # ---- peticiones ----
+    def use(self, client_id: str) -> bool:
+        """Pide el corte a client_id. True si ya es la conexión activa."""
+        client_id = str(client_id)
+        with self._lock:
+            self._target = client_id
+            if self._active and self._active[0] == client_id:
+                return True
+            standby = self._standby
+            if standby and standby[0] == client_id:
+                self._standby = None
+                if self._wanted_standby == client_id:
+                    self._wanted_standby = None
+                self._install(standby)
+                self.standby_hits += 1
+                cut = True
+            else:
+                cut = False
+        self._signal()
+        if cut:
+            self._notify(client_id)
+        return cut
+
+    def prepare(self, client_id: Optional[str]):
+        """Abre en segundo plano una conexión en espera para client_id."""
+        if not client_id:
+            return
+        client_id = str(client_id)
+        with self._lock:
+            if (self._active and self._active[0] == client_id) or (self._standby and self._standby[0] == client_id):
+                return
+            self._wanted_standby = client_id
+        self._signal()
+
+    def disconnect(self):
+        """Cierra la conexión activa sin reconectar (hasta el próximo use())."""
+        with self._lock:
+            self._target = None
+            entry, self._active = self._active, None
+            if entry:
+                self._retired.append(entry)
+        self._signal()
+
+    def call(self, fn):
+        """fn(presence) sobre la conexión activa. Lanza ConnectionError si no hay."""
+        with self._io_lock:
+            entry = self._active
+            if entry is None:
+                raise ConnectionError("Discord RPC no conectado")
+            try:
+                return fn(entry[1])
+            except Exception as e:
+                if is_rpc_connection_error(e):
+                    self._mark_broken(entry)
+                raise
+
+    def _mark_broken(self, entry):
+        with self._lock:
+            if self._active is not entry:
+                return
+            self._active = None
+            self._retired.append(entry)
+            self.drops += 1
+        logger.warning(f"⚠️ Conexión con Discord RPC perdida (client_id={entry[0]}), reconectando en segundo plano")
+        self._signal()
+
+    # ---- hilo de conexiones ----
+    def _signal(self):
+        self._wake.set()
+
+    def _install(self, entry):
+        """Con _lock tomado: entry pasa a ser la activa (la anterior se retira)."""
+        old, self._active = self._active, entry
+        if old is not None:
+            self.cutovers += 1
+            self._retired.append(old)
+
+    def backoff_delay(self, failures: int) -> float:
+        delay = min(self.backoff_max, self.backoff_base * (2 ** max(0, failures - 1)))
+        return delay * (1 - self.jitter * self._rng())
+
+    def _next_job(self):
+        with self._lock:
+            if self._target and (self._active is None or self._active[0] != self._target):
+                return "active", self._target
+            wanted = self._wanted_standby
+            if wanted and not (self._active and self._active[0] == wanted) \
+                    and not (self._standby and self._standby[0] == wanted):
+                return "standby", wanted
+            return None, None
+
+    def _run(self):
+        while not self._stopped:
+            self._retire_pending()
+            kind, client_id = self._next_job()
+            if kind is None:
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            wait = self._retry_at - self._clock()
+            if wait > 0:
+                self._wake.wait(wait)
+                self._wake.clear()
+                continue
+            try:
+                presence = self._factory(client_id)
+                presence.connect()
+            except Exception as e:
+                self._failures += 1
+                self.connect_failures += 1
+                delay = self.backoff_delay(self._failures)
+                self._retry_at = self._clock() + delay
+                logger.error(f"❌ Error conectando a Discord RPC ({client_id}): {e} — reintento en {delay:.1f}s")
+                continue
+            self._failures = 0
+            self._retry_at = 0.0
+            self.connects += 1
+            self._adopt(kind, (client_id, presence))
+
+    def _adopt(self, kind: str, entry):
+        client_id = entry[0]
+        installed = False
+        with self._lock:
+            if self._stopped:
+                self._retired.append(entry)
+            elif self._target == client_id and (self._active is None or self._active[0] != client_id):
+                self._install(entry)
+                installed = True
+            else:
+                if self._standby is not None:
+                    self._retired.append(self._standby)
+                self._standby = entry
+        if installed:
             logger.info(f"✅ Conectado a Discord RPC con client_id={client_id}")
+            self._notify(client_id)
+        else:
+            logger.debug(f"Conexión RPC en espera lista para client_id={client_id}")
+
+    def _retire_pending(self):
+        """Las conexiones sustituidas se limpian y pasan a espera (o se cierran)."""
+        with self._lock:
+            retired, self._retired = self._retired, []
+        for entry in retired:
+            keep = False
+            try:
+                with self._io_lock:
+                    entry[1].clear()
+                keep = not self._stopped
+            except Exception as e:
+                logger.debug(f"clear() en conexión retirada falló: {e}")
+            entry = self._keep_as_standby(entry) if keep else entry
+            if entry is not None:
+                self._close(entry)
+
+    def _keep_as_standby(self, entry):
+        """La retirada (ya limpia) pasa a espera. Devuelve la conexión que sobra, para cerrarla."""
+        with self._lock:
+            same_as_active = self._active is not None and self._active[0] == entry[0]
+            standby = self._standby
+            # la retirada sustituye a la que esperaba salvo que esa sea la pedida con prepare()
+            if not same_as_active and (standby is None or standby[0] != self._wanted_standby):
+                self._standby, entry = entry, standby
+        return entry
+
+    def _close(self, entry):
+        try:
+            with self._io_lock:
+                entry[1].close()
         except Exception as e:
-            logger.error(f"❌ Error conectando a Discord RPC: {e}")
-            self.rpc = None
-    
+            logger.debug(f"Error cerrando conexión RPC ({entry[0]}): {e}")
+
+    def _notify(self, client_id: str):
+        for callback in list(self._listeners):
+            try:
+                callback(client_id)
+            except Exception as e:
+                logger.debug(f"Error en listener de conexión RPC: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "client_id": self.client_id,
+            "target": self._target,
+            "standby": self._standby[0] if self._standby else None,
+            "connects": self.connects,
+            "connect_failures": self.connect_failures,
+            "cutovers": self.cutovers,
+            "standby_hits": self.standby_hits,
+            "drops": self.drops,
+            "backoff_failures": self._failures,
+        }
+
+class AioRpcConnectionManager(RpcConnectionManager):
+    """
+    La misma política que RpcConnectionManager (corte, espera, backoff) con
+    AioPresence dentro del event loop del PresenceEngine: conectar, update y
+    clear no ocupan ningún hilo. call() no bloquea: encola la petición en el
+    loop (en orden, una a la vez por el socket) y devuelve el futuro.
+    Los métodos públicos se pueden llamar desde cualquier hilo (bandeja);
+    la tarea de conexiones arranca con attach(loop).
+    """
+
+    def __init__(self, factory=AioPresence, **kwargs):
+        super().__init__(factory=factory, **kwargs)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._aio_wake: Optional[asyncio.Event] = None
+        self._aio_lock: Optional[asyncio.Lock] = None
+        self._calls = set()
+        self.call_failures = 0
+
+    # ---- ciclo de vida ----
+    def start(self):
+        self._stopped = False
+
+    def attach(self, loop: asyncio.AbstractEventLoop):
+        """Desde el loop: crea la tarea de conexiones (use() previos ya cuentan)."""
+        self._loop = loop
+        self._aio_wake = asyncio.Event()
+        self._aio_lock = asyncio.Lock()
+        self._task = loop.create_task(self._run_async(), name="rpc-connections")
+
+    def _in_loop(self) -> bool:
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    def _signal(self):
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        if self._in_loop():
+            self._aio_wake.set()
+        else:
+            loop.call_soon_threadsafe(self._aio_wake.set)
+
+    def stop(self, timeout: float = 2.0):
+        self._stopped = True
+        task, loop = self._task, self._loop
+        if task is not None and not task.done():
+            if self._in_loop():
+                task.cancel()
+            elif loop is not None and not loop.is_closed():
+                loop.call_soon_threadsafe(task.cancel)
+        with self._lock:
+            entries = [e for e in (self._active, self._standby) if e] + self._retired
+            self._active = self._standby = None
+            self._retired = []
+        for entry in entries:
+            self._close(entry)
+
+    async def aclose(self, timeout: float = 2.0):
+        """Espera las llamadas en curso (p. ej. el clear final) y cierra."""
+        pending = [t for t in self._calls if not t.done()]
+        if pending:
+            await asyncio.wait(pending, timeout=timeout)
+        self.stop()
+
+    # ---- peticiones ----
+    def call(self, fn):
+        """Encola fn(presence) (corutina o no) sobre la conexión activa y devuelve el futuro."""
+        entry = self._active
+        loop = self._loop
+        if entry is None or loop is None or loop.is_closed():
+            raise ConnectionError("Discord RPC no conectado")
+        if self._in_loop():
+            future = loop.create_task(self._call_async(entry, fn))
+            self._calls.add(future)
+            future.add_done_callback(self._calls.discard)
+        else:
+            future = asyncio.run_coroutine_threadsafe(self._call_async(entry, fn), loop)
+        future.add_done_callback(self._consume)
+        return future
+
+    @staticmethod
+    def _consume(future):
+        # el error ya se registró en _call_async; esto evita "exception was never retrieved"
+        if not future.cancelled():
+            future.exception()
+
+    async def _call_async(self, entry, fn):
+        async with self._aio_lock:
+            if self._active is not entry:
+                # hubo un corte mientras esperaba: el próximo tick reenvía a la nueva
+                return None
+            try:
+                result = fn(entry[1])
+                if inspect.isawaitable(result):
+                    result = await result
+                return result
+            except Exception as e:
+                self.call_failures += 1
+                if is_rpc_connection_error(e):
+                    self._mark_broken(entry)
+                else:
+                    logger.debug(f"Llamada RPC fallida ({entry[0]}): {e}")
+                raise
+
+    # ---- tarea de conexiones ----
+    async def _wait_wake(self, timeout: Optional[float] = None):
+        try:
+            await asyncio.wait_for(self._aio_wake.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._aio_wake.clear()
+
+    async def _run_async(self):
+        while not self._stopped:
+            await self._retire_pending_async()
+            kind, client_id = self._next_job()
+            if kind is None:
+                await self._wait_wake()
+                continue
+            wait = self._retry_at - self._clock()
+            if wait > 0:
+                await self._wait_wake(wait)
+                continue
+            try:
+                presence = self._factory(client_id, loop=self._loop)
+                await presence.connect()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._failures += 1
+                self.connect_failures += 1
+                delay = self.backoff_delay(self._failures)
+                self._retry_at = self._clock() + delay
+                logger.error(f"❌ Error conectando a Discord RPC ({client_id}): {e} — reintento en {delay:.1f}s")
+                continue
+            self._failures = 0
+            self._retry_at = 0.0
+            self.connects += 1
+            self._adopt(kind, (client_id, presence))
+
+    async def _retire_pending_async(self):
+        with self._lock:
+            retired, self._retired = self._retired, []
+        for entry in retired:
+            keep = False
+            try:
+                async with self._aio_lock:
+                    await entry[1].clear()
+                keep = not self._stopped
+            except asyncio.CancelledError:
+                self._close(entry)
+                raise
+            except Exception as e:
+                logger.debug(f"clear() en conexión retirada falló: {e}")
+            entry = self._keep_as_standby(entry) if keep else entry
+            if entry is not None:
+                self._close(entry)
+
+    def _close(self, entry):
+        # AioPresence.close() cierra también el event loop: aquí solo se cierra el socket
+        presence = entry[1]
+        try:
+            if presence.sock_writer is not None:
+                presence.send_data(2, {"v": 1, "client_id": entry[0]})
+                presence.sock_writer.close()
+        except Exception as e:
+            logger.debug(f"Error cerrando conexión RPC ({entry[0]}): {e}")
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        stats["call_failures"] = self.call_failures
+        stats["calls_in_flight"] = sum(1 for t in self._calls if not t.done())
+        return stats
+
+# ----------------- Presence update coalescer -----------------
+class PresenceUpdateCoalescer:
+    """
+    Filtra y agrupa los SET_ACTIVITY hacia Discord:
+    - no reenvía un payload idéntico al último enviado (suppressed)
+    - si llegan varios cambios seguidos sin token disponible, solo el último
+      queda pendiente (coalesced)
+    - límite de `burst` envíos en cualquier ventana de `period` segundos
+      (Discord ignora en silencio lo que pase de 5 cada 20 s). Es un token
+      bucket que recupera cada token `period` segundos después de gastarlo,
+      así no se supera nunca la ventana deslizante.
+    El pendiente sale en el siguiente flush() con token; seconds_until_flush()
+    indica cuándo habrá uno.
+    """
+
+    def __init__(self, send, burst: int = RPC_UPDATE_BURST, period: float = RPC_UPDATE_PERIOD,
+                 clock=time.monotonic):
+        self._send = send
+        self.burst = max(1, int(burst))
+        self.period = max(0.0, float(period))
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._spent = deque()  # instantes en que se gastó cada token
+        self.last_sent: Optional[dict] = None
+        self.pending: Optional[dict] = None
+        self.activity_set = False
+        self.sent = 0
+        self.suppressed = 0
+        self.coalesced = 0
+        self.throttled = 0
+        self.failed = 0
+
+    @staticmethod
+    def normalize(payload: dict) -> dict:
+        return {k: v for k, v in payload.items() if v}
+
+    def submit(self, payload: dict) -> bool:
+        """Encola el payload y lo envía si hay token. True si se envió ahora."""
+        payload = self.normalize(payload)
+        with self._lock:
+            if self.pending is None:
+                if payload == self.last_sent:
+                    self.suppressed += 1
+                    return False
+            elif payload == self.pending:
+                self.suppressed += 1
+            else:
+                # el pendiente anterior nunca llegará a Discord
+                self.coalesced += 1
+                if payload == self.last_sent:
+                    self.pending = None
+                    return False
+            self.pending = payload
+            return self._flush_locked()
+
+    def flush(self) -> bool:
+        with self._lock:
+            return self._flush_locked()
+
+    def _refill(self) -> float:
+        now = self._clock()
+        while self._spent and now - self._spent[0] >= self.period:
+            self._spent.popleft()
+        return now
+
+    def _spend(self, now: float):
+        self._spent.append(now)
+        while len(self._spent) > self.burst:
+            self._spent.popleft()
+
+    def _take_token(self) -> bool:
+        now = self._refill()
+        if len(self._spent) >= self.burst:
+            return False
+        self._spend(now)
+        return True
+
+    def _flush_locked(self) -> bool:
+        if self.pending is None:
+            return False
+        if not self._take_token():
+            self.throttled += 1
+            return False
+        payload, self.pending = self.pending, None
+        self.activity_set = True
+        try:
+            self._send(payload)
+        except Exception:
+            # sin last_sent: el siguiente tick lo vuelve a intentar
+            self.failed += 1
+            self.last_sent = None
+            raise
+        self.last_sent = payload
+        self.sent += 1
+        return True
+
+    def seconds_until_flush(self) -> Optional[float]:
+        """None si no hay nada pendiente; si no, segundos hasta tener token."""
+        with self._lock:
+            if self.pending is None:
+                return None
+            now = self._refill()
+            if len(self._spent) < self.burst:
+                return 0.0
+            return max(0.0, self._spent[0] + self.period - now)
+
+    def clear(self, send_clear) -> bool:
+        """
+        Borra la actividad con send_clear() salvo que ya esté vacía. El clear
+        no espera token (no se debe retrasar) pero sí lo gasta.
+        """
+        with self._lock:
+            self.pending = None
+            self.last_sent = None
+            if not self.activity_set:
+                self.suppressed += 1
+                return False
+            self._spend(self._refill())
+            send_clear()
+            self.activity_set = False
+            self.sent += 1
+            return True
+
+    def forget(self, payload: dict):
+        """Un envío asíncrono de payload falló después de contarlo: que no se suprima al repetirlo."""
+        with self._lock:
+            self.failed += 1
+            if self.last_sent == payload:
+                self.last_sent = None
+
+    def reset(self):
+        """Conexión nueva: Discord no tiene actividad de este cliente."""
+        with self._lock:
+            self.pending = None
+            self.last_sent = None
+            self.activity_set = False
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._refill()
+            return {
+                "sent": self.sent,
+                "suppressed": self.suppressed,
+                "coalesced": self.coalesced,
+                "throttled": self.throttled,
+                "failed": self.failed,
+                "pending": self.pending is not None,
+                "activity_set": self.activity_set,
+                "tokens": self.burst - len(self._spent),
+            }
+
+# ----------------- Presence engine -----------------
+class PresenceEngine:
+    """
+    Reactor asyncio que sustituye al while/sleep de run_loop. Cada fuente es una
+    tarea (o un listener de otro hilo) que publica eventos en una cola; una sola
+    tarea, la máquina de estados, los consume y ejecuta el paso de presencia
+    (PresenceManager._tick) con lo último de cada fuente:
+    - processes: escanea procesos en un hilo del executor y avisa cuando
+      GeForce NOW aparece o desaparece
+    - window: cambios de título publicados por WindowSource
+    - steam: SteamPresencePoller.run_async, avisa cuando cambia el rich presence
+    - catalog: escribe en el journal las altas/cambios de juegos fuera del paso
+    - io: lanza/cierra los ejecutables falsos (Popen, staging, estado con fsync)
+      en orden y en un hilo; el sondeo de ventanas también va a un hilo, así
+      el paso no hace llamadas al sistema bloqueantes
+    - rpc: AioRpcConnectionManager (si es el gestor de conexiones) corre en el
+      mismo loop; al conectar, PresenceManager._wake_loop publica el evento
+    Las ráfagas de eventos se agrupan en un paso. stop() cancela todo enseguida,
+    borra la presencia y cierra las conexiones.
+    """
+
+    def __init__(self, presence: "PresenceManager", process_interval: float = TICK_FAST_INTERVAL,
+                 absent_interval: float = TICK_ABSENT_INTERVAL):
+        self.pm = presence
+        self.process_interval = process_interval
+        self.absent_interval = absent_interval
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.gfn_running: Optional[bool] = None
+        self._events: Optional[asyncio.Queue] = None
+        self._writes: Optional[asyncio.Queue] = None
+        self._io: Optional[asyncio.Queue] = None
+        self._poll_window = False
+        self._stopping: Optional[asyncio.Event] = None
+        self._in_step = False
+        self._done = threading.Event()
+        self.steps = 0
+        self.events = Counter()
+
+    # ---- desde cualquier hilo ----
+    def post(self, kind: str):
+        loop = self.loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            if asyncio.get_running_loop() is loop:
+                # cambios descubiertos por el propio paso (sondeo de ventana): ya están procesados
+                if not (self._in_step and kind == "window"):
+                    self._events.put_nowait(kind)
+                return
+        except RuntimeError:
+            pass
+        try:
+            loop.call_soon_threadsafe(self._events.put_nowait, kind)
+        except RuntimeError:
+            pass  # loop cerrándose
+
+    def persist(self, game_key: str):
+        """Encola la escritura de una entrada del catálogo (la hace la tarea catalog)."""
+        loop = self.loop
+        item = game_key
+        try:
+            if asyncio.get_running_loop() is loop:
+                self._writes.put_nowait(item)
+                return
+        except RuntimeError:
+            pass
+        try:
+            loop.call_soon_threadsafe(self._writes.put_nowait, item)
+        except RuntimeError:
+            self._write_catalog([item])
+
+    def submit_io(self, fn, *args) -> bool:
+        """
+        Encola E/S bloqueante (ejecutables falsos) para la tarea io, que la ejecuta
+        en un hilo y en orden de llegada. False si el engine no corre: hacerla en el sitio.
+        """
+        loop = self.loop
+        if loop is None or loop.is_closed() or self._done.is_set() or self._io is None:
+            return False
+        item = (fn, args)
+        try:
+            if asyncio.get_running_loop() is loop:
+                self._io.put_nowait(item)
+                return True
+        except RuntimeError:
+            pass
+        try:
+            loop.call_soon_threadsafe(self._io.put_nowait, item)
+            return True
+        except RuntimeError:
+            return False
+
+    def stop(self, timeout: float = 3.0):
+        """Pide la parada; desde otro hilo espera a que el engine termine (como mucho timeout)."""
+        loop = self.loop
+        if loop is None or loop.is_closed() or self._done.is_set():
+            return
+        try:
+            if asyncio.get_running_loop() is loop:
+                self._stopping.set()
+                self._events.put_nowait("stop")
+                return
+        except RuntimeError:
+            pass
+        try:
+            loop.call_soon_threadsafe(self._stopping.set)
+            loop.call_soon_threadsafe(self._events.put_nowait, "stop")
+        except RuntimeError:
+            return
+        self._done.wait(timeout)
+
+    @property
+    def running(self) -> bool:
+        return self.loop is not None and not self._done.is_set()
+
+    # ---- reactor ----
+    async def run(self):
+        pm = self.pm
+        self.loop = asyncio.get_running_loop()
+        self._events = asyncio.Queue()
+        self._writes = asyncio.Queue()
+        self._io = asyncio.Queue()
+        self._stopping = asyncio.Event()
+        self._done.clear()
+        attach = getattr(pm.connections, "attach", None)
+        if attach is not None:
+            attach(self.loop)
+        pm.window_source.add_listener(lambda title: self.post("window"))
+        self._poll_window = pm.window_source.poll_on_read
+        pm.window_source.poll_on_read = False  # se sondea en un hilo antes del paso
+        pm.engine = self
+        sources = [
+            asyncio.create_task(self._watch_processes(), name="source-processes"),
+            asyncio.create_task(pm.steam_poller.run_async(lambda: self.post("steam")), name="source-steam"),
+            asyncio.create_task(self._persist_catalog(), name="source-catalog"),
+            asyncio.create_task(self._run_io(), name="io"),
+        ]
+        try:
+            await self._state_machine()
+        finally:
+            for task in sources:
+                task.cancel()
+            await asyncio.gather(*sources, return_exceptions=True)
+            await self._shutdown()
+
+    async def _shutdown(self):
+        pm = self.pm
+        pm.engine = None
+        pm.window_source.poll_on_read = self._poll_window
+        pm.steam_poller.stop()
+        self._drain_writes()
+        # lanzamientos pendientes ya no hacen falta: PresenceManager.close() cierra todo
+        while not self._io.empty():
+            self._io.get_nowait()
+        try:
+            pm._clear_presence()
+        except Exception as e:
+            logger.debug(f"No se pudo limpiar la presencia al parar: {e}")
+        aclose = getattr(pm.connections, "aclose", None)
+        try:
+            if aclose is not None:
+                await aclose()
+            else:
+                pm.connections.stop()
+        except Exception as e:
+            logger.debug(f"Error cerrando conexiones RPC: {e}")
+        self._done.set()
+
+    async def _state_machine(self):
+        interval = 0.0
+        while not self._stopping.is_set():
+            try:
+                kind = await asyncio.wait_for(self._events.get(), interval)
+                self.events[kind] += 1
+            except asyncio.TimeoutError:
+                self.events["timer"] += 1
+            while not self._events.empty():
+                self.events[self._events.get_nowait()] += 1
+            if self._stopping.is_set():
+                return
+            if self.gfn_running is None:
+                # todavía sin primer escaneo: esperar al watcher de procesos
+                interval = self.process_interval
+                continue
+            if self._poll_window and self.gfn_running:
+                try:
+                    await asyncio.to_thread(self.pm.window_source.poll)
+                except Exception as e:
+                    logger.debug(f"Error sondeando ventanas: {e}")
+                # el cambio que acaba de descubrir el sondeo lo procesa este mismo paso
+                while not self._events.empty():
+                    self.events[self._events.get_nowait()] += 1
+                if self._stopping.is_set():
+                    return
+            self._in_step = True
+            try:
+                interval = self.pm._tick(running=self.gfn_running)
+            except Exception as e:
+                logger.error(f"❌ Error inesperado en el paso de presencia: {e}")
+                interval = self.pm.update_interval
+            finally:
+                self._in_step = False
+            self.steps += 1
+
+    # ---- fuentes ----
+    def _scan_processes(self) -> bool:
+        processes = self.pm.processes
+        processes.begin_tick()
+        return processes.is_geforce_running()
+
+    async def _watch_processes(self):
+        while True:
+            try:
+                running = await asyncio.to_thread(self._scan_processes)
+            except Exception as e:
+                logger.debug(f"Error comprobando procesos: {e}")
+                running = bool(self.gfn_running)
+            if running != self.gfn_running:
+                self.gfn_running = running
+                self.post("processes")
+            await asyncio.sleep(self.process_interval if running else self.absent_interval)
+
+    async def _run_io(self):
+        while True:
+            fn, args = await self._io.get()
+            try:
+                await asyncio.to_thread(fn, *args)
+            except Exception as e:
+                logger.error(f"❌ Error en E/S de fondo del engine: {e}")
+
+    async def _persist_catalog(self):
+        while True:
+            batch = [await self._writes.get()]
+            while not self._writes.empty():
+                batch.append(self._writes.get_nowait())
+            await asyncio.to_thread(self._write_catalog, batch)
+
+    def _drain_writes(self):
+        batch = []
+        while self._writes is not None and not self._writes.empty():
+            batch.append(self._writes.get_nowait())
+        if batch:
+            self._write_catalog(batch)
+
+    def _write_catalog(self, batch: list):
+        config_manager = self.pm.config_manager
+        if config_manager is None:
+            return
+        # varias escrituras de la misma clave en la ráfaga: una línea, con la versión vigente
+        for game_key in dict.fromkeys(batch):
+            try:
+                config_manager.persist_game(game_key)
+            except Exception as e:
+                logger.error(f"❌ Error guardando '{game_key}' en el catálogo: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "steps": self.steps,
+            "events": dict(self.events),
+            "gfn_running": self.gfn_running,
+            "pending_writes": self._writes.qsize() if self._writes is not None else 0,
+        }
+
+class PresenceManager:
+    def __init__(self, client_id: str, games_map, cookie_manager, test_rich_url: str,
+                 update_interval: int = 10, keep_alive: bool = False,
+                 config_manager: Optional[ConfigManager] = None,
+                 window_source: Optional["WindowSource"] = None,
+                 processes: Optional[ProcessSnapshot] = None,
+                 scheduler: Optional[TickScheduler] = None,
+                 rpc_connections: Optional[RpcConnectionManager] = None,
+                 fake_executables: Optional[FakeExecutableManager] = None,
+                 appid_resolver: Optional[SteamAppIdResolver] = None,
+                 metrics: Optional[MetricsRegistry] = None,
+                 workers: Optional[WorkerPool] = None,
+                 transitions: Optional[TransitionDebouncer] = None):
+        import atexit, signal, sys
+
+        self.client_id = client_id
+        self.config_manager = config_manager
+        if isinstance(games_map, GameStore):
+            self.games = games_map
+        elif config_manager is not None:
+            self.games = config_manager.store  # el mismo store que escribe el journal
+        else:
+            self.games = GameStore(games_map)
+        self.appids = appid_resolver or SteamAppIdResolver()
+        self.cookie_manager = cookie_manager
+        self.test_rich_url = test_rich_url
+        self.update_interval = update_interval
+        self.scheduler = scheduler or TickScheduler(stable=update_interval)
+        self.transitions = transitions or TransitionDebouncer()
+        self.keep_alive = keep_alive
+        self.workers = workers or WORKERS
+        # diálogos de match en un carril propio de un hilo: el diálogo espera al usuario hasta
+        # 30 s y, en el pool compartido, dejaría sin hueco a compactación, descargas y
+        # ejecutables falsos; aquí va uno a la vez y "reject" nunca descarta uno ya abierto
+        self.dialogs = WorkerPool(workers=1, max_queue=WORKER_QUEUE_MAX, policy="reject", name="match-dialog")
+        # títulos nuevos cuyo match de Discord aún no se ha ejecutado (descartado por el pool
+        # o pendiente): se vuelve a encolar en la próxima detección
+        self._unmatched: set = set()
+        self.fake_execs = fake_executables or FakeExecutableManager(workers=self.workers)
+        self.fake_execs.start()
+        self.last_log_message = None
+        self.processes = processes or PROCESSES
+        self.presence_updates = PresenceUpdateCoalescer(self._send_activity)
+        self.connections = rpc_connections or RpcConnectionManager()
+        self.connections.add_listener(self._on_rpc_connected)
+        self.connections.start()
+        self._connect_rpc()
+
+        self.scraper = SteamScraper(self.cookie_manager.env_cookie, test_rich_url)
+        # el poller siempre usa el scraper actual
+        self.steam_poller = SteamPresencePoller(lambda: self.scraper)
+        self.engine: Optional[PresenceEngine] = None
+
+        self.last_game = None
+        self.forced_game = None
+
+        self.window_source = window_source or create_window_source(processes=self.processes)
+        self.window_source.add_listener(self._prepare_for_title)
+        self.window_source.start()
+
+        self.metrics = metrics or METRICS
+        if self.metrics is not None:
+            self._instrument(self.metrics)
+
+        atexit.register(self.close)
+        signal.signal(signal.SIGTERM, lambda s, f: sys.exit(0))
+        signal.signal(signal.SIGINT, lambda s, f: sys.exit(0))
+
+    def _instrument(self, metrics: MetricsRegistry):
+        """Cronometra las etapas del tick y expone los contadores que ya llevan los componentes."""
+        metrics.instrument(self, "_tick", "tick")
+        metrics.instrument(self, "find_active_game", "title_resolution")
+        metrics.instrument(self, "update_presence", "presence_update")
+        metrics.instrument(self, "_clear_presence", "rpc_clear")
+        metrics.instrument(self, "_save_game", "config_write")
+        metrics.instrument(self.presence_updates, "_send", "rpc_update")
+        metrics.instrument(self.processes, "refresh", "process_scan")
+        metrics.add_collector(self._collect_metrics)
+
+    def _collect_metrics(self):
+        scraper = self.scraper
+        yield ("steam_cache_hits_total", "counter", "Respuestas de Steam sin cambios (304 o misma huella).",
+               getattr(scraper, "cache_hits", None))
+        yield ("steam_cache_misses_total", "counter", "Páginas de Steam parseadas.",
+               getattr(scraper, "cache_misses", None))
+        yield ("steam_fetches_total", "counter", "Consultas del poller de Steam.", self.steam_poller.fetches)
+        age = self.steam_poller.age()
+        yield ("steam_presence_age_seconds", "gauge", "Antigüedad del último rich presence de Steam.", age)
+        updates = self.presence_updates.stats()
+        for key in ("sent", "suppressed", "coalesced", "throttled", "failed"):
+            yield ("rpc_updates_total", "counter", "SET_ACTIVITY por resultado.", updates[key], {"result": key})
+        rpc = self.connections.stats()
+        yield ("rpc_connected", "gauge", "1 si hay conexión activa con Discord.", 1 if self.connections.connected else 0)
+        for key in ("connects", "connect_failures", "drops", "cutovers"):
+            if key in rpc:
+                yield ("rpc_connection_events_total", "counter", "Eventos de conexión con Discord.", rpc[key], {"event": key})
+        appids = self.appids.stats()
+        for key in ("cached", "negative", "pending"):
+            yield ("steam_appids", "gauge", "Entradas del resolvedor de Steam AppIDs.", appids[key], {"kind": key})
+        for key in ("hits", "misses", "lookups", "errors"):
+            yield ("steam_appid_events_total", "counter", "Consultas al resolvedor de Steam AppIDs.",
+                   appids[key], {"event": key})
+        yield ("process_snapshots_total", "counter", "Recorridos de la tabla de procesos.",
+               getattr(self.processes, "snapshots_taken", None))
+        for state, count in self.scheduler.stats().get("wakeups", {}).items():
+            yield ("tick_wakeups_total", "counter", "Ticks por estado del planificador.", count, {"state": state})
+        transitions = self.transitions.stats()
+        for key in ("commits", "held", "abandoned"):
+            yield ("game_transitions_total", "counter", "Cambios de juego confirmados, retenidos o descartados.",
+                   transitions[key], {"result": key})
+        games = self.games.stats()
+        yield ("game_map_version", "gauge", "Versiones de games_map publicadas desde el arranque.", games["version"])
+        yield ("game_map_changed_entries", "gauge", "Entradas de games_map cambiadas desde el arranque.",
+               games["changed"])
+        for pool in (self.workers, self.dialogs):
+            workers = pool.stats()
+            for key in ("queued", "busy", "workers"):
+                yield ("worker_pool_jobs", "gauge", "Estado del pool de trabajo de fondo.", workers[key],
+                       {"pool": pool.name, "state": key})
+            for key in ("submitted", "deduped", "dropped", "completed", "failed"):
+                yield ("worker_pool_events_total", "counter", "Trabajos de fondo por resultado.",
+                       workers[key], {"pool": pool.name, "result": key})
+        engine = self.engine
+        if engine is not None:
+            for kind, count in list(engine.events.items()):
+                yield ("engine_events_total", "counter", "Eventos recibidos por la máquina de estados.",
+                       count, {"source": kind})
+
+    @property
+    def games_map(self) -> GameMapSnapshot:
+        """Versión vigente del catálogo: tomarla una vez por operación y leer de ella sin lock."""
+        return self.games.snapshot
+
+    @property
+    def rpc(self):
+        """Cliente pypresence de la conexión activa (None si no hay)."""
+        return self.connections.client
+
+    def _connect_rpc(self, client_id: Optional[str] = None) -> bool:
+        """
+        Pide el corte a client_id sin bloquear. True si ya está activo (o había
+        conexión en espera); si no, la conexión actual sigue sirviendo hasta
+        que el hilo de conexiones termine.
+        """
+        return self.connections.use(client_id or self.client_id)
+
+    def _on_rpc_connected(self, client_id: str):
+        # conexión nueva: Discord no tiene actividad suya, reenviar en el próximo tick
+        self.presence_updates.reset()
+        self._wake_loop("rpc")
+
+    def _wake_loop(self, reason: str):
+        """Adelanta el próximo paso: evento para el PresenceEngine o wake() de la ventana."""
+        engine = getattr(self, "engine", None)
+        if engine is not None:
+            engine.post(reason)
+            return
+        source = getattr(self, "window_source", None)
+        if source is not None:
+            source.wake()
+
+    def _prepare_for_title(self, title: Optional[str]):
+        """
+        Al cambiar la ventana, abrir ya la conexión del client_id del juego nuevo
+        y preparar su ejecutable falso, antes del próximo tick.
+        """
+        if not title:
+            return
+        games = self.games_map
+        game_key = games.lookup(clean_window_title(title))
+        if game_key is None:
+            return
+        info = games[game_key]
+        client_id = info.get("client_id")
+        if client_id and client_id != self.connections.client_id:
+            self.connections.prepare(client_id)
+        if info.get("executable_path"):
+            self.fake_execs.stage_in_background([info["executable_path"]])
+
+    def _send_activity(self, payload: dict):
+        pending = self.connections.call(lambda rpc: rpc.update(**payload))
+        if hasattr(pending, "add_done_callback"):
+            # AioRpcConnectionManager: el resultado llega después
+            pending.add_done_callback(
+                lambda f: f.cancelled() or f.exception() is None or self.presence_updates.forget(payload))
+
+    def _clear_presence(self):
+        """clear() solo si hay actividad enviada; si no, no gasta un SET_ACTIVITY."""
+        self.presence_updates.clear(lambda: self.connections.call(lambda rpc: rpc.clear()))
+
+    def _apply_forced_game(self, client_id: Optional[str], executable_path: Optional[str]):
+        """Tras forzar un juego desde el tray: corte de RPC (sin bloquear) y ejecutable falso."""
+        if client_id:
+            # corte en segundo plano; la conexión anterior se limpia al cortar
+            try:
+                self.client_id = client_id
+                self._connect_rpc(client_id)
+                logger.info(f"🔁 RPC cambiando a client_id forzado: {client_id}")
+            except Exception as e:
+                logger.error(f"❌ Error reconectando RPC tras forzar juego: {e}")
+        if executable_path:
+            self.close_fake_executable()
+            self.launch_fake_executable(executable_path)
+        self._wake_loop("forced")
+
     def stop_force_game(self):
         """Detiene el forzado de juego y vuelve a la detección automática"""
         if self.forced_game:
@@ -1265,13 +4975,7 @@ class PresenceManager:
             # Cerrar el ejecutable falso
             self.close_fake_executable()
             
-            # Desconectar RPC para reconectar con el client_id por defecto
-            try:
-                self.rpc.close()
-            except Exception:
-                pass
-            
-            # Reconectar con el client_id por defecto
+            # Volver al client_id por defecto (el corte limpia la conexión del forzado)
             self.client_id = "1095416975028650046"  # Client ID por defecto
             self._connect_rpc(self.client_id)
             
@@ -1279,165 +4983,126 @@ class PresenceManager:
             self._force_stop_time = time.time()
             
             logger.info("🔄 Volviendo a detección automática de juegos")
+            refresh_tray_menu()
 
     def _disconnect_rpc_temporarily(self):
         """Desconecta el RPC temporalmente (sin limpiar presencia)."""
         try:
-            if self.rpc:
-                self.rpc.close()
-                self.rpc = None
+            if self.connections.connected:
+                self.connections.disconnect()
                 logger.info("📴 RPC desconectado temporalmente (modo forzar juego activo).")
         except Exception as e:
             logger.debug(f"Error al desconectar RPC temporalmente: {e}")
 
-    def wait_for_file_release(self, path: Path, timeout: float = 3.0) -> bool:
-        start = time.time()
-        if not path.exists():
-            return True
-        while time.time() - start < timeout:
-            try:
-                with open(path, "rb"):
-                    return True
-            except PermissionError:
-                time.sleep(0.1)
-            except Exception:
-                return False
-        return False
+    def close_fake_executable(self, wait: bool = False):
+        """
+        Cierra los ejecutables falsos lanzados. En un cambio de juego no espera
+        (el reaper los remata en segundo plano); al salir, wait=True con plazo total.
+        Con el PresenceEngine en marcha se hace en su tarea io, en orden con los lanzamientos.
+        """
+        engine = self.engine
+        if not wait and engine is not None and engine.submit_io(self._close_fake_executable, False):
+            return
+        self._close_fake_executable(wait)
 
-    def close_fake_executable(self):
+    def _close_fake_executable(self, wait: bool):
         try:
-            temp_dir_str = str(Path(tempfile.gettempdir()) / "discord_fake_game").lower()
-            closed_any = False
-            if self.fake_proc and self.fake_proc.poll() is None:
-                logger.info(f"🛑 Cerrando ejecutable falso (PID {self.fake_proc.pid})")
-                self.fake_proc.terminate()
-                try:
-                    self.fake_proc.wait(timeout=3)
-                except Exception:
-                    self.fake_proc.kill()
-                closed_any = True
-            for proc in psutil.process_iter(["exe", "pid"]):
-                exe = proc.info.get("exe")
-                if exe and exe.lower().startswith(temp_dir_str):
-                    #logger.info(f"🛑 Cerrando ejecutable falso ({exe})")
-                    proc.terminate()
-                    try:
-                        proc.wait(timeout=3)
-                    except psutil.TimeoutExpired:
-                        proc.kill()
-                    closed_any = True
-            if closed_any:
-                
-                time.sleep(0.35)
+            closed = self.fake_execs.stop(wait=wait)
+            if closed and wait:
                 logger.info("✅ Ejecutable falso cerrado")
-                
         except Exception as e:
             logger.error(f"❌ Error cerrando ejecutable falso: {e}")
-        finally:
-            self.fake_proc = None
-            self.fake_exec_path = None
 
     def launch_fake_executable(self, executable_path: str):
-        try:
-            temp_dir = Path(tempfile.gettempdir()) / "discord_fake_game"
-            exec_full_path = temp_dir / executable_path
-            exec_full_path.parent.mkdir(parents=True, exist_ok=True)
+        engine = self.engine
+        if engine is not None and engine.submit_io(self._launch_fake_executable, executable_path):
+            return
+        self._launch_fake_executable(executable_path)
 
-            if self.fake_exec_path == exec_full_path and self.fake_proc and self.fake_proc.poll() is None:
-                logger.debug(f"🚀 Ejecutable ya en ejecución: {exec_full_path}")
-                return
-            dumb_path = BASE_DIR / "tools" / "dumb.exe"
-            if not dumb_path.exists():
-                logger.error(f"❌ dumb.exe no encontrado en {dumb_path}")
-                return
-            if not exec_full_path.exists():
-                shutil.copy2(dumb_path, exec_full_path)
-            else:
-                if not self.wait_for_file_release(exec_full_path, timeout=3.0):
-                    logger.error(f"❌ El archivo {exec_full_path} sigue bloqueado por otro proceso")
-                    return
-            logger.info(f"🚀 Ejecutando ejecutable falso: {exec_full_path}")
-            proc = subprocess.Popen([str(exec_full_path)], cwd=str(exec_full_path.parent))
-            self.fake_proc = proc
-            self.fake_exec_path = exec_full_path
+    def _launch_fake_executable(self, executable_path: str):
+        try:
+            self.fake_execs.launch(executable_path)
         except Exception as e:
             logger.error(f"❌ Error creando/ejecutando ejecutable falso: {e}")
 
-    def _fetch_discord_apps_cached(self):
-        """Devuelve la lista de apps desde caché o descarga si expiró."""
+    def _fetch_discord_apps_cached(self, block: bool = True):
+        """Devuelve la lista de apps desde la caché de proceso (revalidada en segundo plano)."""
         try:
-            if DISCORD_CACHE_PATH.exists():
-                data = safe_json_load(DISCORD_CACHE_PATH)
-                if data and isinstance(data, dict):
-                    ts = data.get("_ts", 0)
-                    if time.time() - ts < DISCORD_CACHE_TTL:
-                        return data.get("apps", [])
-
-            resp = requests.get(DISCORD_DETECTABLE_URL, timeout=15)
-            if resp.status_code == 200:
-                apps = resp.json()
-                to_save = {"_ts": int(time.time()), "apps": apps}
-                try:
-                    save_json(to_save, DISCORD_CACHE_PATH)
-                except Exception:
-                    pass
-                return apps
+            return DISCORD_APPS_CACHE.get(block=block)
         except Exception as e:
             logger.debug(f"Error obteniendo detectable de Discord: {e}")
         return []
 
-    def _find_discord_matches(self, game_name: str, max_candidates: int = 5):
-        """Busca coincidencias por name o aliases y devuelve lista ordenada (name, id, exe, score)."""
-        apps = self._fetch_discord_apps_cached()
-        candidates = []
-        gnl = (game_name or "").lower()
-        for app in apps:
-            name = app.get("name", "") or ""
-            aliases = app.get("aliases", []) or []
-            score_name = difflib.SequenceMatcher(None, gnl, name.lower()).ratio()
-            # score por alias más alta
-            score_alias = 0.0
-            for a in aliases:
-                s = difflib.SequenceMatcher(None, gnl, (a or "").lower()).ratio()
-                if s > score_alias:
-                    score_alias = s
-            score = max(score_name, score_alias)
-            if score > 0.35:  # filtro mínimo para reducir ruido
-                # buscar ejecutable win32 si existe
-                exe = None
-                for e in app.get("executables", []) or []:
-                    if e.get("os") == "win32" and e.get("name"):
-                        exe = e.get("name")
-                        break
-                candidates.append({
-                    "name": name,
-                    "id": app.get("id"),
-                    "exe": exe,
-                    "score": score,
-                    "aliases": aliases
-                })
-        candidates.sort(key=lambda x: x["score"], reverse=True)
-        return candidates[:max_candidates]
+    def _match_by_executable(self, executable_path: Optional[str]) -> Optional[DiscordApp]:
+        """
+        Coincidencia exacta por ejecutable contra las apps detectables de Discord.
+        Corre en el paso: hasta que el índice esté listo (se carga en el pool) devuelve None
+        y el próximo paso lo vuelve a intentar.
+        """
+        if not executable_path:
+            return None
+        try:
+            index = DISCORD_APPS_CACHE.ready_exe_index()
+            if index is None:
+                return None
+            return index.lookup(executable_path)
+        except Exception as e:
+            logger.debug(f"Error buscando ejecutable en Discord: {e}")
+            return None
+
+    def _find_discord_matches(self, game_name: str, max_candidates: int = 5, block: bool = True):
+        """
+        Busca coincidencias por name o aliases y devuelve lista ordenada (name, id, exe, score).
+        Desde la GUI se llama con block=False: en frío no hay apps y la descarga sigue en segundo plano.
+        """
+        apps = self._fetch_discord_apps_cached(block=block)
+        if not apps:
+            return []
+        try:
+            return DISCORD_APPS_CACHE.get_index(apps).search(apps, game_name, max_candidates)
+        except Exception as e:
+            logger.debug(f"Índice de Discord no disponible, recorrido completo: {e}")
+            return find_discord_matches_full(apps, game_name, max_candidates)
+
+    def _save_game(self, game_key: str, changes: dict, keep_existing: bool = False) -> dict:
+        """
+        Publica los cambios de la entrada (nueva versión de games_map) y la registra
+        en el journal del catálogo. Devuelve la entrada publicada.
+        """
+        entry = self.games.update(game_key, changes, keep_existing=keep_existing)
+        if self.engine is not None:
+            self.engine.persist(game_key)
+        elif self.config_manager is not None:
+            self.config_manager.persist_game(game_key)
+        return entry
+
+    def _resolve_appid_later(self, game_key: str, title: str):
+        """Encola la búsqueda del AppID; al resolverse se guarda y se despierta el loop."""
+        self.appids.resolve_async(title, lambda name, appid: self._on_appid_resolved(game_key, appid))
+
+    def _on_appid_resolved(self, game_key: str, appid: Optional[str]):
+        if not appid:
+            return
+        info = self.games_map.get(game_key)
+        if info is None or info.get("steam_appid"):
+            return
+        self._save_game(game_key, {"steam_appid": appid})
+        logger.info(f"✅ Steam AppID actualizado en JSON para: {game_key} -> {appid}")
+        self._wake_loop("appid")
 
     def _apply_discord_match(self, game_key: str, match: dict):
-        """Aplica (guarda) la coincidencia al games_config.json y al self.games_map en memoria."""
+        """Aplica (guarda) la coincidencia al games_config.json y a games_map en memoria."""
         try:
             if not match or "id" not in match:
                 return False
-            config_path = CONFIG_PATH_FILE.read_text(encoding="utf-8").strip()
-            config_path = Path(config_path)
-            games_config = safe_json_load(config_path) or {}
-
-            entry = games_config.get(game_key, {}) or {}
 
+            changes = {}
             if match.get("exe"):
-                entry.setdefault("executable_path", match["exe"])
+                changes["executable_path"] = match["exe"]
             if match.get("id"):
-                entry.setdefault("client_id", match["id"])
-            games_config[game_key] = entry
-            save_json(games_config, config_path)
-            # actualizar en memoria
-            self.games_map = games_config
+                changes["client_id"] = match["id"]
+            # solo completa: lo que la entrada ya tenga no se pisa
+            self._save_game(game_key, changes, keep_existing=True)
             logger.info(f"✅ Discord match aplicado para '{game_key}': id={match.get('id')}, exe={match.get('exe')}")
             return True
         except Exception as e:
@@ -1491,14 +5156,27 @@ class PresenceManager:
             logger.debug(f"Error en dialog match: {e}")
         return selected["value"]
 
+    def _queue_discord_match(self, game_key: str):
+        """
+        Encola el match de Discord de un título nuevo. Si el pool lo descarta (cola
+        llena), sigue en _unmatched y find_active_game lo reintenta al volver a verlo.
+        """
+        self._unmatched.add(game_key)
+        key = ("discord-match", game_key)
+        if not self.workers.pending(key):
+            self.workers.submit(key, self._ask_discord_match_for_new_game, game_key)
+
     def _ask_discord_match_for_new_game(self, game_key: str):
         """
-        Hilo que busca coincidencias en Discord y aplica/consulta:
+        Trabajo del WorkerPool que busca coincidencias en Discord y aplica/consulta:
         - Si top score >= DISCORD_AUTO_APPLY_THRESHOLD -> aplica sin preguntar
-        - Si hay candidatos pero score < threshold -> pregunta al usuario mediante ventana
+        - Si hay candidatos pero score < threshold -> encola la ventana en el hilo de diálogos
         - Si no hay candidatos -> no hace nada
         """
+        self._unmatched.discard(game_key)
         try:
+            # Sin ejecutable: la ventana es la de GeForceNOW.exe (el juego corre en la nube);
+            # las entradas del catálogo con executable_path ya se resuelven en update_presence.
             candidates = self._find_discord_matches(game_key, max_candidates=6)
             if not candidates:
                 logger.info(f"ℹ️ No se encontraron matches en Discord para '{game_key}'")
@@ -1512,50 +5190,39 @@ class PresenceManager:
                     logger.info(f"🔁 Aplicado automaticamente match Discord: {top.get('name')} (score {top.get('score'):.2f})")
                 return
 
-            sel = self._show_match_dialog(game_key, candidates, timeout=DISCORD_ASK_TIMEOUT)
-            if sel:
-                self._apply_discord_match(game_key, sel)
-            else:
-                logger.info(f"ℹ️ Usuario ignoró/timeout match Discord para '{game_key}'")
+            # la ventana bloquea hasta DISCORD_ASK_TIMEOUT: fuera del pool compartido
+            dialog = ("match-dialog", game_key)
+            if (not self.dialogs.submit(dialog, self._ask_user_for_match, game_key, candidates)
+                    and not self.dialogs.pending(dialog)):
+                self._unmatched.add(game_key)  # demasiados diálogos pendientes: se reintenta
         except Exception as e:
             logger.debug(f"Error en ask_discord_match_for_new_game: {e}")
 
+    def _ask_user_for_match(self, game_key: str, candidates: list):
+        """Trabajo del hilo de diálogos: pregunta al usuario y aplica su elección."""
+        sel = self._show_match_dialog(game_key, candidates, timeout=DISCORD_ASK_TIMEOUT)
+        if sel:
+            self._apply_discord_match(game_key, sel)
+        else:
+            logger.info(f"ℹ️ Usuario ignoró/timeout match Discord para '{game_key}'")
+
     def run_loop(self):
         logger.info("🟢 Iniciando monitor de presencia...")
         try:
-            while True:
-                if not self.is_geforce_running():
-                    if getattr(self, "forced_game", None):
-                        logger.info("Modo forzado desactivado ...")
-                        self.forced_game = None
-                    if self.last_game is not None:
-                        logger.info("⚠️ GeForce NOW no está en ejecución — limpiando presencia.")
-                        try:
-                            self.rpc.clear()
-                        except Exception:
-                            pass
-                        self.close_fake_executable()
-                        self.last_game = None
-                        self.last_log_message = None
-                    time.sleep(self.update_interval)
-                    continue
-
-                game = self.find_active_game()
-                self.update_presence(game)
-                time.sleep(self.update_interval)
+            asyncio.run(PresenceEngine(self).run())
 
         except KeyboardInterrupt:
             logger.info("🔴 Detenido por usuario")
             try:
-                self.rpc.clear()
+                self._clear_presence()
             except Exception:
                 pass
             try:
-                self.rpc.close()
+                self.connections.stop()
                 logger.info("🔴 Discord RPC cerrado correctamente.")
             except Exception:
                 pass
-            self.close_fake_executable()
+            self.close_fake_executable(wait=True)
             sys.exit(0)
 
         except Exception as e:
@@ -1565,106 +5232,119 @@ class PresenceManager:
             ):
                 logger.error(f"❌ Error inesperado en el loop principal: {e}")
             try:
-                self.rpc.clear()
+                self._clear_presence()
             except Exception:
                 pass
             try:
-                self.rpc.close()
+                self.connections.stop()
             except Exception:
                 pass
-            self.close_fake_executable()
+            self.close_fake_executable(wait=True)
             sys.exit(1)
 
-    def find_active_game(self) -> Optional[dict]:
-        try:
-            import win32gui, win32process # type: ignore
-            hwnds = []
-            win32gui.EnumWindows(lambda h, p: p.append(h) if win32gui.IsWindowVisible(h) else None, hwnds)
-            last_title = getattr(self, "_last_window_title", None)
-            title = None
-            for hwnd in hwnds:
+    def _tick(self, running: Optional[bool] = None) -> float:
+        """
+        Una pasada del loop. Devuelve cuánto esperar hasta la siguiente.
+        running: estado de GeForce NOW ya comprobado (PresenceEngine); si no, se comprueba aquí.
+        """
+        if running is None:
+            self.processes.begin_tick()
+            running = self.is_geforce_running()
+        if not running:
+            self.transitions.reset()
+            if getattr(self, "forced_game", None):
+                logger.info("Modo forzado desactivado ...")
+                self.forced_game = None
+                refresh_tray_menu()
+            if self.last_game is not None:
+                logger.info("⚠️ GeForce NOW no está en ejecución — limpiando presencia.")
                 try:
-                    _, pid = win32process.GetWindowThreadProcessId(hwnd)
-                    proc_name = psutil.Process(pid).name().lower()
+                    self._clear_presence()
                 except Exception:
-                    continue
-                if "geforcenow" not in proc_name:
-                    continue
-                title = win32gui.GetWindowText(hwnd)
-                if title == last_title:
-                
                     pass
-                else:
-                    setattr(self, "_last_window_title", title)
-                if title == None:
-                    self.log_once("⚠️ GeForce NOW no está abierto")
-                #if title and title.strip() == "GeForce NOW":
-                    #return {
-                    #    "name": "GeForce NOW",
-                    #   "client_id": "1421154726023532544",
-                    #  "executable_path": "ea sports fc 26/fc26.exe",
-                    #   "image": "geforce_default"
-                    #}
-
-                clean = re.sub(r'\s*(en|on|in|via)?\s*GeForce\s*NOW.*$', '', title, flags=re.IGNORECASE).strip()
-                clean = re.sub(r'[®™]', '', clean).strip()
-                #if clean.lower() not in ["geforce now", "games", ""]:
-                #    logger.debug(f"|: {clean}")
-
-                
-                last_clean = getattr(self, "_last_clean_title", None)
-                if clean != last_clean:
-                    setattr(self, "_last_clean_title", clean)
-                appid = None 
-                for game_name, info in self.games_map.items():
-                    if clean.lower() == game_name.lower():
-                        if not info.get("steam_appid"):
-                            appid = find_steam_appid_by_name(clean)
-                            if appid:
-                                info["steam_appid"] = appid
-                                config_path = CONFIG_PATH_FILE.read_text(encoding="utf-8").strip()
-                                config_path = Path(config_path)
-                                games_config = safe_json_load(config_path) or {}
-                                games_config[game_name]["steam_appid"] = appid
-                                save_json(games_config, config_path)
-                                logger.info(f"✅ Steam AppID actualizado en JSON para: {game_name} -> {appid}")
-                                self.games_map = games_config
-                        return info
-                appid = find_steam_appid_by_name(clean)
-                new_game = {
-                    "name": clean,
-                    "steam_appid": appid,
-                    "image": "steam"
-                }
-                self.games_map[clean] = new_game
-                config_path = CONFIG_PATH_FILE.read_text(encoding="utf-8").strip()
-                config_path = Path(config_path)
-                games_config = safe_json_load(config_path) or {}
-                games_config[clean] = new_game
-                save_json(games_config, config_path)
-                updated = self.games_map.get(clean)
-                if updated:
-                    new_game = updated
-                logger.info(f"🆕 Juego agregado a config: {clean} (AppID: {appid})")
-                self.games_map = games_config
-
-                try:
-                    threading.Thread(
-                        target=self._ask_discord_match_for_new_game,
-                        args=(clean,),
-                        daemon=True
-                    ).start()
-                except Exception as e:
-                    logger.debug(f"no se pudo iniciar hilo de discord-match: {e}")
-                return new_game
+                self.close_fake_executable()
+                self.last_game = None
+                self.last_log_message = None
+            return self.scheduler.next_interval(False)
+
+        game = self._add_committed_game(self.transitions.observe(self.find_active_game()))
+        self.update_presence(game)
+        interval = self.scheduler.next_interval(True, getattr(self, "_last_window_title", None))
+        # cambio de juego pendiente: volver justo cuando se confirmaría
+        commit_in = self.transitions.seconds_until_commit()
+        if commit_in is not None:
+            interval = min(interval, max(commit_in, 0.1))
+        # update retenido por el rate limit: volver en cuanto haya token
+        flush_in = self.presence_updates.seconds_until_flush()
+        if flush_in is not None:
+            interval = min(interval, max(flush_in, 0.5))
+        return interval
 
-            
-            return {'name': title, 'image': 'geforce_default', 'client_id': self.client_id}
+    def find_active_game(self) -> Optional[dict]:
+        try:
+            title = self.window_source.current_title()
+            if title is None:
+                return {'name': None, 'image': 'geforce_default', 'client_id': self.client_id}
+            if title != getattr(self, "_last_window_title", None):
+                setattr(self, "_last_window_title", title)
+
+            clean = clean_window_title(title)
+
+            last_clean = getattr(self, "_last_clean_title", None)
+            if clean != last_clean:
+                setattr(self, "_last_clean_title", clean)
+            games = self.games_map
+            game_key = games.lookup(clean)
+            if is_library_title(clean):
+                # Biblioteca / menú de GeForce NOW: sin búsquedas de AppID ni alta en config
+                if game_key is not None:
+                    return games[game_key]
+                return {"name": clean, "image": "lib"}
+            if game_key is None and self.appids.is_junk(clean):
+                # títulos basura ("-", una letra, solo símbolos): transitorios, como la biblioteca
+                return {"name": clean, "image": "lib"}
+
+            if game_key is not None:
+                info = games[game_key]
+                if game_key in self._unmatched:
+                    self._queue_discord_match(game_key)
+                if not info.get("steam_appid"):
+                    appid = self.appids.get(clean)
+                    if appid:
+                        info = self._save_game(game_key, {"steam_appid": appid})
+                        logger.info(f"✅ Steam AppID actualizado en JSON para: {game_key} -> {appid}")
+                    else:
+                        self._resolve_appid_later(game_key, clean)
+                return info
+
+            # Título nuevo: entrada provisional. El alta en config y los trabajos de fondo
+            # esperan a que el TransitionDebouncer lo confirme (_add_committed_game).
+            return {
+                "name": clean,
+                "steam_appid": self.appids.get(clean),
+                "image": "steam"
+            }
         except Exception as e:
-            if str(e) == "cannot access local variable 'title' where it is not associated with a value":
-                self.log_once(f"⚠️ GeForce NOW está cerrado")
-            else:
-                logger.error(f"⚠️ Error detectando juego activo: {e}")
+            logger.error(f"⚠️ Error detectando juego activo: {e}")
+
+    def _add_committed_game(self, game: Optional[dict]) -> Optional[dict]:
+        """
+        Da de alta el juego confirmado por el TransitionDebouncer si aún no está en
+        games_map. Los títulos que solo se ven de paso (pantallas de carga, tienda)
+        no llegan al catálogo ni encolan AppID ni match de Discord.
+        """
+        if not TransitionDebouncer.is_game(game) or self.games_map.lookup(game["name"]) is not None:
+            return game
+        clean = game["name"]
+        appid = game.get("steam_appid") or self.appids.get(clean)
+        new_game = self._save_game(clean, {"name": clean, "steam_appid": appid, "image": "steam"})
+        logger.info(f"🆕 Juego agregado a config: {clean} (AppID: {appid})")
+        if not appid:
+            self._resolve_appid_later(clean, clean)
+
+        # un solo match por título en vuelo; si la cola lo descarta se reintenta al volver a verlo
+        self._queue_discord_match(clean)
+        return new_game
 
     def log_once(self, msg, level="info"):
         if msg != self.last_log_message:
@@ -1672,19 +5352,13 @@ class PresenceManager:
             self.last_log_message = msg
 
     def is_geforce_running(self) -> bool:
-        try:
-            for proc in psutil.process_iter(attrs=['name']):
-                name = (proc.info.get('name') or "").lower()
-                if "geforcenow" in name:
-                    return True
-        except Exception as e:
-            logger.debug(f"Error comprobando procesos: {e}")
-        return False
+        return self.processes.is_geforce_running()
     
     def clear_forced_game(self):
         if self.forced_game:
             logger.info(f"🧹 Modo forzado desactivado: {self.forced_game.get('name')}")
             self.forced_game = None
+            refresh_tray_menu()
 
     def update_presence(self, game_info: Optional[dict]):
         # Si hay un juego forzado, usarlo en lugar del juego detectado
@@ -1708,7 +5382,7 @@ class PresenceManager:
                 logger.debug(f"⏸️  Evitando reconexión automática a {game_info.get('name')} tras detener forzado")
                 # Limpiar presencia temporalmente
                 try:
-                    self.rpc.clear()
+                    self._clear_presence()
                 except Exception:
                     pass
                 self.last_game = None
@@ -1717,21 +5391,37 @@ class PresenceManager:
         current_game = game_info or None
         game_changed = not self.is_same_game(self.last_game, current_game)
         
-        # Obtener rich presence y group size
+        # Obtener rich presence y group size (último valor del poller, sin bloquear)
+        if game_changed:
+            self.steam_poller.reset()
         status, group_size = None, None
         if current_game and current_game.get("steam_appid"):
-            status, group_size = self.scraper.get_rich_presence()
+            self.steam_poller.set_active(True)
+            status, group_size = self.steam_poller.latest()
+        else:
+            self.steam_poller.set_active(False)
         
-        if current_game and current_game.get("name") in self.games_map:
-            defaults = self.games_map[current_game["name"]]
+        games = self.games_map
+        game_key = games.lookup(current_game["name"]) if current_game and current_game.get("name") is not None else None
+        if game_key is not None:
+            defaults = games[game_key]
             merged = {**defaults, **current_game}
             current_game = merged
 
+        # client_id por coincidencia exacta de ejecutable (sin difflib ni diálogo)
+        if current_game and not current_game.get("client_id") and current_game.get("executable_path"):
+            app = self._match_by_executable(current_game["executable_path"])
+            if app is not None and app.id:
+                current_game = {**current_game, "client_id": app.id}
+                if game_key is not None and not self.forced_game:
+                    self._save_game(game_key, {"client_id": app.id})
+                logger.info(f"🔗 client_id por ejecutable: {current_game.get('name')} -> {app.id}")
+
         if current_game and current_game.get("name") is None:
             self.log_once("🛑 GeForce NOW está cerrado")
             self.close_fake_executable()
             try:
-                self.rpc.clear()
+                self._clear_presence()
             except Exception:
                 pass
             self.last_game = None
@@ -1745,7 +5435,7 @@ class PresenceManager:
         if not current_game:
             if self.last_game is not None:
                 try:
-                    self.rpc.clear()
+                    self._clear_presence()
                 except Exception:
                     pass
                 self.last_game = None
@@ -1765,15 +5455,12 @@ class PresenceManager:
                 should_change_client = False
                 client_id = self.client_id  # Usar client_id por defecto
 
-        if getattr(self.rpc, "client_id", None) != client_id and should_change_client:
-            try:
-                self.rpc.clear()
-                self.rpc.close()
-            except Exception:
-                pass
-            if client_id:
-                self._connect_rpc(client_id)
+        if client_id and self.connections.target != client_id and should_change_client:
+            # corte sin bloquear: la conexión actual sigue sirviendo hasta que la nueva esté lista
+            if self._connect_rpc(client_id):
                 self.log_once(f"🔁 Cambiado client_id a {client_id}")
+            else:
+                self.log_once(f"⏳ Abriendo conexión RPC para client_id={client_id}")
 
         # Procesar el estado dinámicamente basado en group_size
         def split_status(s):
@@ -1793,8 +5480,7 @@ class PresenceManager:
                 state = TEXTS.get("playing_in_group", f"On a Group") #+ f" ({group_size} players)"
         
         if not details and not current_game.get("client_id"):
-            rn = current_game.get('name', '').strip().lower()
-            if rn in ["geforce now", "Games", ""]:
+            if current_game.get("image") == "lib" or is_library_title(current_game.get('name')):
                 current_game["image"] = "lib"
                 details = TEXTS.get("menu", "Iddlinng...")
 
@@ -1819,18 +5505,16 @@ class PresenceManager:
         if party_size_data:
             presence_data["party_size"] = party_size_data
 
-        try:
-            self.rpc.update(**{k: v for k, v in presence_data.items() if v})
-        except Exception as e:
-            msg = str(e).lower()
-            logger.error(f"❌ Error actualizando Presence: {e}")
-            if "pipe was closed" in msg or "socket.send()" in msg:
-                try:
-                    time.sleep(5) 
-                    self._connect_rpc(client_id)
-                    logger.info("🔁 Reconectado con Discord RPC tras error de socket")
-                except Exception as e2:
-                    logger.error(f"❌ Falló la reconexión a Discord RPC: {e2}")
+        if not self.connections.connected:
+            # el hilo de conexiones reintenta con backoff; el payload sale en el tick siguiente
+            self.log_once("⏳ Esperando conexión con Discord RPC...")
+        else:
+            try:
+                self.presence_updates.submit(presence_data)
+            except Exception as e:
+                logger.error(f"❌ Error actualizando Presence: {e}")
+                if is_rpc_connection_error(e):
+                    logger.info("🔁 Reconectando con Discord RPC en segundo plano")
 
         self.last_game = dict(current_game) if isinstance(current_game, dict) else current_game
         
@@ -1853,16 +5537,31 @@ class PresenceManager:
         return True
     
     def close(self):
-        if self.rpc:
+        engine = self.engine
+        if engine is not None:
+            # limpia la presencia y cierra RPC desde su loop
+            engine.stop()
+        # lo que quede en cola (staging, matches, diálogos) ya no hace falta
+        self.workers.stop()
+        self.dialogs.stop()
+        try:
+            self.window_source.stop()
+            self.steam_poller.stop()
+        except Exception:
+            pass
+        if self.connections.connected:
             try:
-                self.rpc.clear()
-                self.rpc.close()
-                self.close_fake_executable()
-                
-                
+                self._clear_presence()
+            except Exception:
+                pass
+            try:
+                self.connections.stop()
                 logger.info("🔴 Discord RPC cerrado correctamente.")
             except Exception:
                 pass
+        else:
+            self.connections.stop()
+        self.close_fake_executable(wait=True)
 
 # ----------------- MAIN -----------------
 def main():
@@ -1871,7 +5570,8 @@ def main():
     if not acquire_lock():
         show_message("Error", TEXTS.get('already_running', 'Another instance of the program is already running.'), kind="error")
         return
-    use_tray = PYSTRAY_AVAILABLE
+    use_tray = tray_available()
+    tray_started = False
     if use_tray:
         try:
             tray_started = start_tray_icon(on_quit_callback=lambda: presence.close())
@@ -1891,8 +5591,12 @@ def main():
     parser.add_argument("--verbose", action="store_true", help="Mostrar lista completa de juegos en carga")
     parser.add_argument("--no-keepalive", action="store_true", help="Desactivar keep-alive (si está activado)")
     parser.add_argument("--tray", action="store_true", help="Forzar uso de icono en bandeja (si está disponible)")
+    parser.add_argument("--metrics-port", type=int, default=METRICS_PORT,
+                        help="Puerto local para /metrics (Prometheus); 0 = desactivado")
     args = parser.parse_args()
 
+    if args.metrics_port:
+        enable_metrics(args.metrics_port)
 
     cfgm = ConfigManager(CONFIG_PATH_FILE)
     games = cfgm.get_game_mapping()
@@ -1906,7 +5610,9 @@ def main():
     presence = PresenceManager(client_id=CLIENT_ID, games_map=games, cookie_manager=cookie_mgr,
                            test_rich_url=TEST_RICH_URL, update_interval=UPDATE_INTERVAL,
                            keep_alive=(not args.no_keepalive),
-                            )
+                           config_manager=cfgm,
+                           rpc_connections=AioRpcConnectionManager(),
+                           )
 
     global PRESENCE_INSTANCE, COOKIE_MANAGER
     PRESENCE_INSTANCE = presence